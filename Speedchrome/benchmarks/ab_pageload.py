@@ -0,0 +1,599 @@
+"""Comparación A/B de carga de páginas y memoria con y sin las optimizaciones.
+
+Lanza un navegador Chromium instalado en modo headless contra un corpus de
+páginas servido por ``http.server`` en 127.0.0.1 (sin red externa), una vez
+sin cambios (``baseline``), una con lo que aplicaría SpeedChrome por
+defecto (``speedchrome``) y una por cada optimización por separado. De
+cada corrida registra los tiempos de navegación de cada página (Navigation
+Timing, reportados por la propia página al servidor), el pico y la memoria
+estable del árbol de procesos y el tiempo de CPU consumido.
+
+Las políticas no se pueden instalar sin privilegios, así que cada
+optimización se traduce a su equivalente de línea de comandos o de
+preferencia del perfil; las que no tienen equivalente medible en headless
+se informan como omitidas. Las variantes se intercalan en cada repetición
+para que la deriva del equipo afecte a todas por igual.
+
+Uso::
+
+    python Speedchrome/benchmarks/ab_pageload.py --repeat 10 --output ab.json
+    python Speedchrome/benchmarks/ab_pageload.py --browser Edge --corpus mis_paginas/
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+import threading
+import statistics
+import subprocess
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import psutil
+from browser_manager import BrowserManager
+from optimizations import OPTIMIZATIONS_BY_ID, default_options
+
+# Script que cada página carga al final: reporta sus tiempos y navega a la siguiente
+HARNESS_SCRIPT = b"""
+addEventListener('load', () => setTimeout(() => {
+  const nav = performance.getEntriesByType('navigation')[0];
+  const paint = {};
+  performance.getEntriesByType('paint').forEach(entry => { paint[entry.name] = entry.startTime; });
+  fetch('/__report', {method: 'POST', body: JSON.stringify({
+    page: location.pathname, nav: nav ? nav.toJSON() : {}, paint: paint
+  })}).then(response => response.text()).then(next => { if (next) location.replace(next); });
+}, 0));
+"""
+HARNESS_TAG = b'<script src="/__harness.js"></script>'
+
+# Métricas por navegación: nombre -> función sobre el reporte de la página (ms)
+NAVIGATION_METRICS: Dict[str, Callable[[Dict], Optional[float]]] = {
+    'ttfb_ms': lambda report: report['nav'].get('responseStart'),
+    'fcp_ms': lambda report: report['paint'].get('first-contentful-paint'),
+    'dom_content_loaded_ms': lambda report: report['nav'].get('domContentLoadedEventEnd'),
+    'load_ms': lambda report: report['nav'].get('loadEventEnd'),
+}
+RUN_METRICS = ('peak_rss_mb', 'steady_rss_mb', 'cpu_seconds', 'wall_seconds')
+
+# Equivalente de cada optimización para un perfil temporal en headless:
+# args (línea de comandos), features (--enable-features), prefs (Preferences
+# del perfil) y local_state (Local State). None = sin equivalente medible.
+AB_EQUIVALENTS: Dict[str, Optional[Callable[[int], Dict]]] = {
+    # El límite de memoria lo hace cumplir un contenedor del sistema, no un flag
+    'memory_limit': None,
+    'renderer_process_limit': lambda value: {'args': [f'--renderer-process-limit={value}']},
+    # El ahorro de memoria y las pestañas suspendidas descartan pestañas en segundo
+    # plano: con una sola pestaña headless no hay nada que medir
+    'memory_saver': None,
+    'sleeping_tabs': None,
+    'disable_background_mode': lambda value: {'local_state': {'background_mode': {'enabled': False}}},
+    'wakeup_throttling': lambda value: {'features': ['IntensiveWakeUpThrottling']},
+    'disable_preload': lambda value: {'prefs': {'net': {'network_prediction_options': 2}}},
+    'disable_hardware': lambda value: {'args': ['--disable-gpu']},
+    'disk_cache_size': lambda value: {'args': [f'--disk-cache-size={value * 1024 * 1024}']},
+}
+
+
+def build_corpus(directory: str, pages: int = 12, seed: int = 1) -> List[str]:
+    """Genera un sitio estático sintético (DOM, CSS, SVG y algo de JS por página).
+
+    Retorna las rutas de las páginas, en el orden de navegación.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'style.css'), 'w', encoding='utf-8') as f:
+        f.write(''.join(
+            f'.c{i} {{ color: #{rng.randrange(0xffffff):06x}; padding: {i % 7}px; '
+            f'border: 1px solid #{rng.randrange(0xffffff):06x}; }}\n'
+            for i in range(400)
+        ))
+    paths = []
+    for index in range(pages):
+        rows = 200 + rng.randrange(800)
+        svg = ''.join(
+            f'<circle cx="{rng.randrange(400)}" cy="{rng.randrange(200)}" r="{rng.randrange(3, 30)}" '
+            f'fill="#{rng.randrange(0xffffff):06x}"/>' for _ in range(150)
+        )
+        table = ''.join(
+            f'<tr class="c{row % 400}"><td>{row}</td><td>{rng.random():.6f}</td>'
+            f'<td>{"lorem ipsum " * (row % 5 + 1)}</td></tr>' for row in range(rows)
+        )
+        html = (
+            f'<!doctype html><html><head><meta charset="utf-8"><title>Página {index}</title>'
+            f'<link rel="stylesheet" href="/style.css"></head><body>'
+            f'<h1>Página {index}</h1><svg width="400" height="200">{svg}</svg>'
+            f'<table>{table}</table>'
+            f'<script>let x = 0; for (let i = 0; i < {50000 + rng.randrange(200000)}; i++) '
+            f'{{ x = (x * 31 + i) % 1000003; }} document.title += " " + x;</script>'
+            f'</body></html>'
+        )
+        name = f'page{index:03d}.html'
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            f.write(html)
+        paths.append('/' + name)
+    return paths
+
+
+def corpus_pages(directory: str) -> List[str]:
+    """Páginas HTML de un corpus existente, en orden alfabético."""
+    pages = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.endswith(('.html', '.htm')):
+                relative = os.path.relpath(os.path.join(root, name), directory)
+                pages.append('/' + relative.replace(os.sep, '/'))
+    return sorted(pages)
+
+
+class CorpusServer(ThreadingHTTPServer):
+    """Servidor del corpus que además recibe los reportes de las páginas.
+
+    Cada corrida recorre ``pages`` en orden: la respuesta a cada reporte es
+    la URL de la siguiente página (vacía al terminar, y entonces se activa
+    ``done``).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self.pages: List[str] = []
+        self.reports: List[Dict] = []
+        self.done = threading.Event()
+        super().__init__(('127.0.0.1', 0), CorpusHandler)
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def begin_run(self, pages: List[str]) -> str:
+        """Prepara una corrida y retorna la URL de su primera página."""
+        with self._lock:
+            self.pages = list(pages)
+            self.reports = []
+            self.done.clear()
+        return self.base_url + pages[0]
+
+    def report(self, payload: Dict) -> str:
+        with self._lock:
+            payload['received'] = time.perf_counter()
+            self.reports.append(payload)
+            if len(self.reports) >= len(self.pages):
+                self.done.set()
+                return ''
+            return self.pages[len(self.reports)]
+
+
+class CorpusHandler(SimpleHTTPRequestHandler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=args[2].directory, **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+    def end_headers(self):
+        # Cada corrida usa un perfil nuevo; sin caché HTTP entre páginas de la misma corrida
+        self.send_header('Cache-Control', 'no-store')
+        super().end_headers()
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/__harness.js':
+            self._send(HARNESS_SCRIPT, 'application/javascript')
+        elif path.endswith(('.html', '.htm')):
+            local = self.translate_path(path)
+            try:
+                with open(local, 'rb') as f:
+                    body = f.read()
+            except OSError:
+                self.send_error(404)
+                return
+            # El script se inserta en cada página (también en corpus propios)
+            if b'</body>' in body:
+                body = body.replace(b'</body>', HARNESS_TAG + b'</body>', 1)
+            else:
+                body += HARNESS_TAG
+            self._send(body, 'text/html; charset=utf-8')
+        else:
+            super().do_GET()
+
+    def do_POST(self):
+        if self.path != '/__report':
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.send_error(400)
+            return
+        next_page = self.server.report(payload)
+        self._send((self.server.base_url + next_page if next_page else '').encode('utf-8'),
+                   'text/plain')
+
+    def _send(self, body: bytes, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _merge(target: Dict, source: Dict) -> None:
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+
+
+def launch_settings(options: Dict) -> Tuple[Dict, List[str]]:
+    """Traduce opciones de SpeedChrome a argumentos y preferencias del perfil.
+
+    Retorna ({args, features, prefs, local_state}, optimizaciones omitidas).
+    """
+    settings = {'args': [], 'features': [], 'prefs': {}, 'local_state': {}}
+    skipped = []
+    for opt_id, value in options.items():
+        if not value or opt_id not in OPTIMIZATIONS_BY_ID:
+            continue
+        equivalent = AB_EQUIVALENTS.get(opt_id)
+        if equivalent is None:
+            skipped.append(opt_id)
+            continue
+        translated = equivalent(value)
+        settings['args'].extend(translated.get('args', []))
+        settings['features'].extend(translated.get('features', []))
+        _merge(settings['prefs'], translated.get('prefs', {}))
+        _merge(settings['local_state'], translated.get('local_state', {}))
+    return settings, skipped
+
+
+def build_variants(options: Dict, only: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Variantes a comparar: sin cambios, todo lo activado y cada optimización sola."""
+    enabled = {opt_id: value for opt_id, value in options.items() if value}
+    variants = {'baseline': {}, 'speedchrome': enabled}
+    for opt_id, value in enabled.items():
+        if only and opt_id not in only:
+            continue
+        if AB_EQUIVALENTS.get(opt_id) is not None:
+            variants[opt_id] = {opt_id: value}
+    return variants
+
+
+def find_executable(browser: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """(navegador, ejecutable) de un navegador instalado de ``BROWSER_PATHS``."""
+    installations = BrowserManager.discover_installations()['installations']
+    for record in installations:
+        if record['browser'] not in BrowserManager.BROWSER_PATHS:
+            continue
+        if browser and record['browser'] != browser:
+            continue
+        if record['executable'] and os.path.isfile(record['executable']):
+            return record['browser'], record['executable']
+    return browser, None
+
+
+def prepare_profile(directory: str, settings: Dict) -> None:
+    """Perfil temporal con las preferencias de la variante."""
+    os.makedirs(os.path.join(directory, 'Default'), exist_ok=True)
+    if settings['prefs']:
+        with open(os.path.join(directory, 'Default', 'Preferences'), 'w', encoding='utf-8') as f:
+            json.dump(settings['prefs'], f)
+    if settings['local_state']:
+        with open(os.path.join(directory, 'Local State'), 'w', encoding='utf-8') as f:
+            json.dump(settings['local_state'], f)
+
+
+def browser_command(executable: str, profile: str, settings: Dict, url: str) -> List[str]:
+    command = [
+        executable, '--headless=new', f'--user-data-dir={profile}',
+        '--no-first-run', '--no-default-browser-check', '--disable-sync',
+        # Sin tráfico fuera de la máquina: solo el servidor local del corpus
+        '--disable-background-networking', '--disable-component-update',
+        '--metrics-recording-only', '--no-proxy-server',
+    ]
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        command.append('--no-sandbox')
+    command.extend(settings['args'])
+    if settings['features']:
+        command.append(f"--enable-features={','.join(settings['features'])}")
+    command.append(url)
+    return command
+
+
+class TreeSampler:
+    """Muestrea memoria (RSS total) y CPU del árbol de procesos de un navegador."""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.root = psutil.Process(pid)
+        self.interval = interval
+        self.samples: List[Tuple[float, int]] = []
+        self._cpu: Dict[int, float] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='speedchrome-ab-sampler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def sample(self) -> None:
+        try:
+            processes = [self.root] + self.root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return
+        rss = 0
+        for proc in processes:
+            try:
+                with proc.oneshot():
+                    rss += proc.memory_info().rss
+                    times = proc.cpu_times()
+                # CPU acumulada: se conserva el último valor de los procesos que ya terminaron
+                self._cpu[proc.pid] = times.user + times.system
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        self.samples.append((time.perf_counter(), rss))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def cpu_seconds(self) -> float:
+        return sum(self._cpu.values())
+
+    def peak(self) -> int:
+        return max((rss for _, rss in self.samples), default=0)
+
+    def steady(self, since: float) -> int:
+        """Mediana de la memoria desde ``since`` (el navegador ya en reposo)."""
+        values = [rss for stamp, rss in self.samples if stamp >= since]
+        return int(statistics.median(values)) if values else 0
+
+
+def terminate_tree(pid: int, timeout: float = 5.0) -> None:
+    try:
+        root = psutil.Process(pid)
+        processes = root.children(recursive=True) + [root]
+    except psutil.NoSuchProcess:
+        return
+    for proc in processes:
+        try:
+            proc.terminate()
+        except psutil.NoSuchProcess:
+            pass
+    _, alive = psutil.wait_procs(processes, timeout=timeout)
+    for proc in alive:
+        try:
+            proc.kill()
+        except psutil.NoSuchProcess:
+            pass
+
+
+def run_once(server: CorpusServer, executable: str, settings: Dict, pages: List[str],
+             timeout: float, settle: float) -> Dict:
+    """Una corrida: perfil nuevo, recorrido del corpus y medición del árbol de procesos."""
+    profile = tempfile.mkdtemp(prefix='speedchrome-ab-')
+    try:
+        prepare_profile(profile, settings)
+        url = server.begin_run(pages)
+        start = time.perf_counter()
+        process = subprocess.Popen(browser_command(executable, profile, settings, url),
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        sampler = TreeSampler(process.pid)
+        sampler.start()
+        try:
+            finished = server.done.wait(timeout)
+            wall = time.perf_counter() - start
+            # Memoria estable: el navegador sigue abierto en la última página, en reposo
+            settled = time.perf_counter()
+            time.sleep(settle)
+        finally:
+            sampler.stop()
+            sampler.sample()
+            terminate_tree(process.pid)
+            process.wait()
+        return {
+            'completed': finished,
+            'reports': list(server.reports),
+            'peak_rss_mb': sampler.peak() / (1024 * 1024),
+            'steady_rss_mb': sampler.steady(settled) / (1024 * 1024),
+            'cpu_seconds': sampler.cpu_seconds(),
+            'wall_seconds': wall,
+        }
+    finally:
+        shutil.rmtree(profile, ignore_errors=True)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    return {
+        'n': len(values),
+        'median': statistics.median(values),
+        'p95': percentile(values, 0.95),
+        'mean': statistics.fmean(values),
+    }
+
+
+def bootstrap_median_diff(baseline: List[float], variant: List[float], rng: random.Random,
+                          resamples: int = 2000, confidence: float = 0.95) -> Tuple[float, float]:
+    """Intervalo de confianza (bootstrap por percentiles) de mediana(variante) - mediana(base)."""
+    diffs = []
+    for _ in range(resamples):
+        a = [baseline[rng.randrange(len(baseline))] for _ in baseline]
+        b = [variant[rng.randrange(len(variant))] for _ in variant]
+        diffs.append(statistics.median(b) - statistics.median(a))
+    tail = (1 - confidence) / 2
+    return percentile(diffs, tail), percentile(diffs, 1 - tail)
+
+
+def collect_metrics(runs: List[Dict]) -> Dict[str, List[float]]:
+    """Muestras por métrica: una por navegación (tiempos) o por corrida (memoria y CPU)."""
+    metrics: Dict[str, List[float]] = {name: [] for name in (*NAVIGATION_METRICS, *RUN_METRICS)}
+    for run in runs:
+        if not run['completed']:
+            continue
+        for report in run['reports']:
+            for name, extract in NAVIGATION_METRICS.items():
+                value = extract(report)
+                if value:
+                    metrics[name].append(float(value))
+        for name in RUN_METRICS:
+            metrics[name].append(run[name])
+    return metrics
+
+
+def compare(results: Dict[str, List[Dict]], seed: int) -> Dict[str, Dict]:
+    """Resumen de cada variante y su diferencia con ``baseline`` por métrica."""
+    rng = random.Random(seed)
+    metrics = {variant: collect_metrics(runs) for variant, runs in results.items()}
+    base = metrics['baseline']
+    comparison = {}
+    for variant, values in metrics.items():
+        entry = {}
+        for name, samples in values.items():
+            summary = summarize(samples)
+            if summary and variant != 'baseline' and len(base[name]) > 1 and len(samples) > 1:
+                base_median = statistics.median(base[name])
+                diff = summary['median'] - base_median
+                low, high = bootstrap_median_diff(base[name], samples, rng)
+                summary.update(
+                    diff=diff,
+                    relative=diff / base_median if base_median else None,
+                    ci95=[low, high],
+                    # El intervalo no incluye el 0: la diferencia no es ruido
+                    significant=low > 0 or high < 0,
+                )
+            entry[name] = summary
+        comparison[variant] = entry
+    return comparison
+
+
+def run_ab(args) -> Dict:
+    browser, executable = (None, args.executable) if args.executable else find_executable(args.browser)
+    if not executable:
+        raise SystemExit("No se encontró un navegador Chromium instalado (use --executable)")
+
+    corpus_dir = args.corpus
+    own_corpus = None
+    if corpus_dir:
+        pages = corpus_pages(corpus_dir)
+    else:
+        corpus_dir = own_corpus = tempfile.mkdtemp(prefix='speedchrome-corpus-')
+        pages = build_corpus(corpus_dir, args.pages, args.seed)
+    if not pages:
+        raise SystemExit(f"El corpus {corpus_dir} no tiene páginas HTML")
+
+    options = default_options()
+    for opt_id in args.enable or []:
+        opt = OPTIMIZATIONS_BY_ID[opt_id]
+        options[opt_id] = 1 if opt['type'] == 'bool' else opt['default'] * opt['scale']
+    variants = build_variants(options, args.only)
+    launch = {}
+    skipped = set()
+    for variant, variant_options in variants.items():
+        launch[variant], omitted = launch_settings(variant_options)
+        skipped.update(omitted)
+
+    server = CorpusServer(corpus_dir)
+    thread = threading.Thread(target=server.serve_forever, name='speedchrome-ab-server', daemon=True)
+    thread.start()
+    results: Dict[str, List[Dict]] = {variant: [] for variant in variants}
+    try:
+        order = list(variants)
+        rng = random.Random(args.seed)
+        for repetition in range(args.repeat):
+            # Orden distinto en cada repetición para no favorecer a ninguna variante
+            rng.shuffle(order)
+            for variant in order:
+                run = run_once(server, executable, launch[variant], pages, args.timeout, args.settle)
+                results[variant].append(run)
+                state = 'ok' if run['completed'] else 'SIN TERMINAR'
+                print(f"[{repetition + 1}/{args.repeat}] {variant}: {run['wall_seconds']:.2f}s "
+                      f"pico {run['peak_rss_mb']:.0f} MB ({state})", file=sys.stderr)
+    finally:
+        server.shutdown()
+        server.server_close()
+        if own_corpus:
+            shutil.rmtree(own_corpus, ignore_errors=True)
+
+    return {
+        'meta': {
+            'browser': browser,
+            'executable': executable,
+            'pages': len(pages),
+            'repeat': args.repeat,
+            'timestamp': int(time.time()),
+        },
+        'variants': {variant: {'options': variant_options, 'args': launch[variant]['args'],
+                               'features': launch[variant]['features'],
+                               'completed': sum(run['completed'] for run in results[variant])}
+                     for variant, variant_options in variants.items()},
+        'skipped': sorted(skipped),
+        'comparison': compare(results, args.seed),
+    }
+
+
+def print_summary(report: Dict) -> None:
+    for variant, metrics in report['comparison'].items():
+        if variant == 'baseline':
+            continue
+        for name, summary in metrics.items():
+            if not summary or 'diff' not in summary:
+                continue
+            mark = '*' if summary['significant'] else ' '
+            relative = f"{summary['relative']:+.1%}" if summary['relative'] is not None else 'n/d'
+            print(f"{mark} {variant:<24} {name:<22} mediana {summary['median']:10.1f} "
+                  f"({relative}, IC95 {summary['ci95'][0]:+.1f} .. {summary['ci95'][1]:+.1f})",
+                  file=sys.stderr)
+    if report['skipped']:
+        print(f"Sin equivalente medible en headless: {', '.join(report['skipped'])}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparación A/B de carga de páginas de SpeedChrome")
+    parser.add_argument('--browser', help="Navegador de BROWSER_PATHS (por defecto, el primero instalado)")
+    parser.add_argument('--executable', help="Ruta del ejecutable (omite la detección)")
+    parser.add_argument('--corpus', help="Carpeta con páginas HTML (por defecto, un sitio sintético)")
+    parser.add_argument('--pages', type=int, default=12, help="Páginas del sitio sintético")
+    parser.add_argument('--repeat', type=int, default=5, help="Repeticiones por variante")
+    parser.add_argument('--only', nargs='*', help="Optimizaciones a medir por separado")
+    parser.add_argument('--enable', nargs='*', choices=sorted(OPTIMIZATIONS_BY_ID),
+                        help="Activar optimizaciones que no vienen activadas por defecto")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Segundos máximos por corrida")
+    parser.add_argument('--settle', type=float, default=2.0,
+                        help="Segundos en reposo para medir la memoria estable")
+    parser.add_argument('--seed', type=int, default=1, help="Semilla del corpus, el orden y el bootstrap")
+    parser.add_argument('--output', help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    report = run_ab(args)
+    print_summary(report)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
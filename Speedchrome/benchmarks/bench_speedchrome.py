@@ -0,0 +1,492 @@
+"""Benchmarks de SpeedChrome sobre un registro y una tabla de procesos simulados.
+
+Mide las rutas críticas (detección, rutas de registro, configuración previa,
+plan y escritura de ``apply_changes`` con y sin diferencias, ``kill_browsers``,
+recorrido de la caché de disco, corrección de deriva, desglose por tipo de
+proceso, planificador de prioridades, lectura de extensiones) a escala de flota y emite JSON. Con ``--baseline`` compara contra una corrida anterior y
+termina con código 1 si alguna mediana empeoró más que ``--threshold``.
+
+Uso::
+
+    python Speedchrome/benchmarks/bench_speedchrome.py --output bench.json
+    python Speedchrome/benchmarks/bench_speedchrome.py --baseline bench.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import logging
+import argparse
+import contextlib
+import platform
+import statistics
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import psutil
+from registry_utils import RegistryManager, MemoryRegistryBackend, REG_DWORD
+from browser_manager import BrowserManager
+from browser_discovery import BROWSER_CATALOG, browser_paths
+from process_utils import BrowserMatcher, ProcessSnapshot
+from config_journal import ConfigJournal
+from apply_planner import plan_changes
+from disk_cache import DirectoryScanner
+from drift_watchdog import DriftWatchdog, MemoryNotifier
+from process_attribution import ProcessAttributor
+from priority_scheduler import PriorityScheduler, parse_policy
+from extension_profiler import read_extension_settings
+from resource_limits import ResourceLimiter, MemoryContainer
+from sessions import user_summary
+from optimizations import OPTIMIZATIONS
+import instrumentation
+
+
+class FakeProcess:
+    """Proceso simulado con la interfaz de psutil que usa SpeedChrome."""
+
+    def __init__(self, pid: int, name: str, ppid: int, cmdline: List[str], rss: int,
+                 user: str = 'bench', exe: str = ''):
+        self.pid = pid
+        self.user = user
+        self._exe = exe
+        self.info = {
+            'pid': pid,
+            'name': name,
+            'ppid': ppid,
+            'cmdline': cmdline,
+            'memory_info': _Mem(rss),
+            'cpu_times': _Times(pid % 7 * 0.5, pid % 3 * 0.25),
+        }
+        self._alive = True
+
+    def oneshot(self):
+        return contextlib.nullcontext()
+
+    def create_time(self):
+        return 0.0
+
+    def name(self):
+        return self.info['name']
+
+    def username(self):
+        return self.user
+
+    def ppid(self):
+        return self.info['ppid']
+
+    def nice(self):
+        return 0
+
+    def exe(self):
+        return self._exe
+
+    def cmdline(self):
+        return self.info['cmdline']
+
+    def memory_info(self):
+        return self.info['memory_info']
+
+    def cpu_times(self):
+        return self.info['cpu_times']
+
+    def kill(self):
+        if not self._alive:
+            raise psutil.NoSuchProcess(self.pid)
+        self._alive = False
+
+    def is_running(self):
+        return self._alive
+
+    def wait(self, timeout=None):
+        if self._alive:
+            raise psutil.TimeoutExpired(timeout, self.pid)
+        return 0
+
+
+class _Mem:
+    def __init__(self, rss):
+        self.rss = rss
+        self.vms = rss * 2
+        self.shared = rss // 4
+
+
+class _Times:
+    def __init__(self, user, system):
+        self.user = user
+        self.system = system
+
+
+class FakeProcessTable:
+    """Tabla de procesos sintética: un árbol por navegador y sesión más ruido.
+
+    El ejecutable de cada árbol está en la carpeta de su navegador
+    (``install_dirs``), como los canales que comparten nombre de proceso.
+    """
+
+    def __init__(self, browsers: Dict[str, Dict], total: int, seed: int = 1, sessions: int = 1):
+        rng = random.Random(seed)
+        self.rows = []
+        # Usuario de cada proceso raíz (una sesión por usuario)
+        self.users: Dict[int, str] = {}
+        pid = 1000
+        executables = []
+        for browser, info in browsers.items():
+            names = info.get('processes', [info['process']])
+            if names:
+                directory = (info.get('install_dirs') or [browser])[0].strip(os.sep)
+                executables.append((names[0], os.path.join(os.sep, 'bench', directory, names[0])))
+        browser_share = total // 2
+        per_browser = max(browser_share // max(len(executables), 1), sessions)
+        for name, exe in executables:
+            roots = []
+            for session in range(sessions):
+                self.rows.append((pid, name, 1, [exe], exe))
+                self.users[pid] = f'user{session:02d}'
+                roots.append(pid)
+                pid += 1
+            for i in range(per_browser - sessions):
+                kind = rng.choice(['renderer', 'renderer', 'renderer', 'utility', 'gpu-process'])
+                self.rows.append((pid, name, roots[i % sessions], [exe, f'--type={kind}'], exe))
+                pid += 1
+        while len(self.rows) < total:
+            service = f'service{pid % 50}.exe'
+            self.rows.append((pid, service, 4, [service], os.path.join(os.sep, 'bench', service)))
+            pid += 1
+
+    def _make(self, row) -> FakeProcess:
+        pid, name, ppid, cmdline, exe = row
+        return FakeProcess(pid, name, ppid, cmdline, 50 * 1024 * 1024 + pid,
+                           self.users.get(pid, 'bench'), exe)
+
+    def process_iter(self, attrs=None):
+        for row in self.rows:
+            yield self._make(row)
+
+    def pids(self):
+        return [row[0] for row in self.rows]
+
+    def process(self, pid):
+        if not hasattr(self, '_by_pid'):
+            self._by_pid = {row[0]: row for row in self.rows}
+        if pid not in self._by_pid:
+            raise psutil.NoSuchProcess(pid)
+        return self._make(self._by_pid[pid])
+
+
+def synthetic_browsers(count: int) -> Dict[str, Dict]:
+    """Catálogo con los navegadores reales más ``count`` entradas sintéticas."""
+    browsers = dict(BrowserManager.BROWSER_PATHS)
+    for i in range(count):
+        name = f'Synthetic{i:03d}'
+        browsers[name] = {
+            'reg_paths': [
+                rf'SOFTWARE\Vendor{i:03d}\{name}',
+                rf'SOFTWARE\Wow6432Node\Vendor{i:03d}\{name}',
+            ],
+            'process': f'synthetic{i:03d}.exe',
+            'processes': [f'synthetic{i:03d}.exe'],
+            'install_dirs': [os.path.join(f'Vendor{i:03d}', name)],
+            'friendly_name': f'{name} Browser',
+        }
+    return browsers
+
+
+def populate_registry(backend: MemoryRegistryBackend, browsers: Dict[str, Dict],
+                      noise_keys: int) -> None:
+    """Instala la mitad de los navegadores y guarda una configuración para cada uno."""
+    for index, (browser, info) in enumerate(browsers.items()):
+        if index % 2 == 0:
+            # Algunos solo en la vista de 32 bits, para ejercitar el segundo intento
+            backend.create_key(info['reg_paths'][-1 if index % 4 == 0 else 0])
+        backend.write_values(
+            f"{BrowserManager.SPEEDCHROME_REG_PATH}\\{browser}",
+            {
+                'memory_limit': (4096, REG_DWORD),
+                'disable_preload': (1, REG_DWORD),
+                'disable_hardware': (1, REG_DWORD),
+                'last_update': (int(time.time()), REG_DWORD),
+            }
+        )
+    for i in range(noise_keys):
+        backend.create_key(rf'SOFTWARE\Noise{i % 97}\Key{i}')
+
+
+def populate_cache_tree(root: str, files: int, per_dir: int = 250) -> List[str]:
+    """Crea una caché sintética (carpetas de ``per_dir`` archivos) y retorna sus raíces."""
+    roots = [os.path.join(root, name) for name in ('Cache', 'Code Cache', 'GPUCache')]
+    for index in range(files):
+        directory = os.path.join(roots[index % len(roots)], f'd{index // per_dir:04d}')
+        if index % per_dir < len(roots):
+            os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f'f{index}'), 'wb') as f:
+            f.write(b'\0' * (index % 4096))
+    return roots
+
+
+def populate_preferences(path: str, extensions: int, sites: int = 50000) -> None:
+    """Preferences sintético: ``extensions`` extensiones entre secciones grandes."""
+    settings = {
+        f'{i:032d}': {
+            'location': 1, 'path': f'{i:032d}/1.0_0', 'state': 1,
+            'manifest': {'name': f'Extension {i}', 'version': '1.0', 'manifest_version': 3,
+                         'background': {'service_worker': 'background.js'},
+                         'permissions': ['storage', 'tabs', 'scripting'] * 5,
+                         'content_scripts': [{'matches': ['<all_urls>'], 'js': ['content.js']}]},
+        }
+        for i in range(extensions)
+    }
+    preferences = {
+        'browser': {'window_placement': list(range(sites // 2))},
+        'extensions': {'settings': settings},
+        'profile': {'content_settings': {'exceptions': {
+            f'https://site{i}.example,*': {'last_modified': str(i), 'setting': 1} for i in range(sites)
+        }}},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(preferences, f)
+
+
+class _Var:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class _LogSink:
+    def append(self, line):
+        pass
+
+
+def headless_gui(browsers: Dict[str, Dict], installed: Dict[str, bool]):
+    """Instancia SpeedChromeGUI sin Tk, con variables simuladas."""
+    import main as gui_module
+
+    gui = gui_module.SpeedChromeGUI.__new__(gui_module.SpeedChromeGUI)
+    gui.browser_vars = {browser: _Var(installed.get(browser, False)) for browser in browsers}
+    gui.installed = installed
+    # Todas las optimizaciones del catálogo activadas, con su valor por defecto
+    gui.option_vars = {opt['id']: _Var(True) for opt in OPTIMIZATIONS}
+    gui.option_values = {
+        opt['id']: _Var(str(opt['default'])) for opt in OPTIMIZATIONS if opt['type'] == 'int'
+    }
+    gui.memory_var = gui.option_vars['memory_limit']
+    gui.memory_limit_var = gui.option_values['memory_limit']
+    gui.recommended_limits = None
+    gui.recommended_gb = None
+    gui.log_view = _LogSink()
+    gui.has_previous_config, gui.previous_config = BrowserManager.check_previous_config()
+    return gui
+
+
+def measure(func: Callable, repeat: int, warmup: int = 2) -> Dict[str, float]:
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        'iterations': repeat,
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'p95': timings[min(int(len(timings) * 0.95), len(timings) - 1)],
+        'min': timings[0],
+        'max': timings[-1],
+    }
+
+
+def run_benchmarks(args) -> Dict:
+    browsers = synthetic_browsers(args.browsers)
+    BrowserManager.BROWSER_PATHS = browsers
+
+    backend = MemoryRegistryBackend()
+    populate_registry(backend, browsers, args.noise_keys)
+    RegistryManager.set_backend(backend)
+    # El historial de la medición no debe mezclarse con el del usuario
+    journal_dir = tempfile.mkdtemp(prefix='speedchrome-bench-')
+    BrowserManager._journal = ConfigJournal(os.path.join(journal_dir, 'journal.db'))
+    table = FakeProcessTable(browsers, args.processes)
+    installed = BrowserManager.detect_installed_browsers()
+    selected = [browser for browser, ok in installed.items() if ok]
+    gui = headless_gui(browsers, installed)
+
+    def get_paths():
+        for browser in browsers:
+            BrowserManager.get_browser_path(browser)
+
+    def apply_changed():
+        # Alternar el límite para que cada corrida tenga diferencias que escribir
+        gui.memory_limit_var.set("8" if gui.memory_limit_var.get() == "4" else "4")
+        gui.run_apply(selected, gui.collect_options())
+
+    cache_roots = populate_cache_tree(os.path.join(journal_dir, 'profile'), args.cache_files)
+    preferences = os.path.join(journal_dir, 'Preferences')
+    populate_preferences(preferences, args.extensions)
+
+    def kill():
+        snapshot = ProcessSnapshot.capture(
+            BrowserManager.get_matcher().names(selected), process_iter=table.process_iter
+        )
+        BrowserManager.kill_browsers(selected, timeout=0.5, snapshot=snapshot)
+
+    # Sin límite de correcciones: cada iteración pisa el mismo valor
+    watchdog = DriftWatchdog(notifier=MemoryNotifier(backend), max_repairs=10 ** 9)
+    drift_key = f"SOFTWARE\\{BrowserManager.get_browser_path(selected[0])}\\Process"
+
+    def drift():
+        backend.write_values(drift_key, {'MaxMemPerProcess': None})
+        watchdog.check()
+
+    attributor = ProcessAttributor(selected, process_iter=table.process_iter)
+    # Servidor de terminales: los mismos procesos repartidos en una sesión por usuario
+    session_table = FakeProcessTable(browsers, args.processes, sessions=args.sessions)
+    session_attributor = ProcessAttributor(selected, process_iter=session_table.process_iter)
+    # Los canales reales que comparten el ejecutable de Chrome: cada proceso
+    # tiene que sumarse una sola vez en el resumen por usuario
+    real = {browser: info for browser, info in browser_paths(BROWSER_CATALOG).items()
+            if info['processes']}
+    channels = {browser: info for browser, info in real.items()
+                if info['processes'][0] == real['Chrome']['processes'][0]}
+    channel_table = FakeProcessTable(channels, args.processes, sessions=args.sessions)
+    channel_matcher = BrowserMatcher(channels)
+    channel_attributor = ProcessAttributor(list(channels), process_iter=channel_table.process_iter,
+                                           matcher=channel_matcher)
+    counted = sum(total['processes'] for total in user_summary(channel_attributor.sample(records=True)))
+    expected = len(ProcessSnapshot.capture(channel_matcher.names(),
+                                           process_iter=channel_table.process_iter).processes)
+    if counted != expected:
+        sys.exit(f"user_summary: {counted} procesos de {', '.join(channels)}, se esperaban {expected}")
+    # Revisión incremental en régimen: todos los procesos ya clasificados y,
+    # sin navegador en primer plano, en segundo plano
+    scheduler = PriorityScheduler(parse_policy({'idle_grace': 0}), selected, dry_run=True,
+                                  pids=table.pids, process=table.process, foreground=lambda: 0,
+                                  session=lambda pid: 0)
+    scheduler.check()
+    # Igual para los contenedores: los procesos ya están dentro. Se usan los
+    # navegadores reales (``real``) con los nombres de proceso de la
+    # plataforma (chrome, msedge... en Linux) y varios canales con el mismo ejecutable
+    limits_table = FakeProcessTable(real, args.processes)
+    limiter = ResourceLimiter({browser: {'memory_max': 4 * 1024 ** 3} for browser in real},
+                              container_factory=MemoryContainer, process_iter=limits_table.process_iter,
+                              matcher=BrowserMatcher(real), user='user00')
+    limiter.setup()
+    limiter.check()
+    empty = [browser for browser, container in limiter.containers.items() if not container.members()]
+    if empty:
+        sys.exit(f"limits_check: ningún proceso entró al contenedor de {', '.join(empty)}")
+
+    cases = {
+        'detect_installed_browsers': BrowserManager.detect_installed_browsers,
+        'discover_installations': BrowserManager.discover_installations,
+        'get_browser_path_all': get_paths,
+        'check_previous_config': BrowserManager.check_previous_config,
+        'apply_changes_headless': apply_changed,
+        'apply_changes_noop': lambda: gui.run_apply(selected, gui.collect_options()),
+        'plan_changes': lambda: plan_changes(selected, gui.collect_options()),
+        'process_snapshot': lambda: ProcessSnapshot.capture(process_iter=table.process_iter),
+        'kill_browsers': kill,
+        'disk_cache_scan': lambda: DirectoryScanner().scan(cache_roots),
+        'drift_check': drift,
+        'process_attribution': attributor.sample,
+        'user_summary': lambda: user_summary(session_attributor.sample()),
+        'user_summary_channels': lambda: user_summary(channel_attributor.sample(records=True)),
+        'priority_check': scheduler.check,
+        'limits_check': limiter.check,
+        'extension_settings_parse': lambda: read_extension_settings(preferences),
+    }
+    results = {}
+    for name, func in cases.items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(func, args.repeat)
+        print(f"{name}: mediana {results[name]['median'] * 1000:.3f} ms", file=sys.stderr)
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'browsers': len(browsers),
+            'installed': len(selected),
+            'processes': args.processes,
+            'noise_keys': args.noise_keys,
+            'cache_files': args.cache_files,
+            'extensions': args.extensions,
+            'sessions': args.sessions,
+            'repeat': args.repeat,
+            'timestamp': int(time.time()),
+        },
+        'results': results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """Compara medianas contra la línea base; retorna las regresiones."""
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base or not base['median']:
+            continue
+        ratio = result['median'] / base['median']
+        result['baseline_median'] = base['median']
+        result['ratio'] = ratio
+        if ratio > 1 + threshold:
+            regressions.append({'name': name, 'ratio': ratio,
+                                'median': result['median'], 'baseline_median': base['median']})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de SpeedChrome")
+    parser.add_argument('--processes', type=int, default=5000, help="Procesos en la tabla simulada")
+    parser.add_argument('--browsers', type=int, default=48, help="Entradas sintéticas de navegador")
+    parser.add_argument('--noise-keys', type=int, default=20000, help="Claves de registro no relacionadas")
+    parser.add_argument('--cache-files', type=int, default=20000, help="Archivos en la caché simulada")
+    parser.add_argument('--extensions', type=int, default=200, help="Extensiones en el Preferences simulado")
+    parser.add_argument('--sessions', type=int, default=60, help="Sesiones de usuario en user_summary")
+    parser.add_argument('--repeat', type=int, default=20, help="Repeticiones por caso")
+    parser.add_argument('--only', nargs='*', help="Casos a ejecutar")
+    parser.add_argument('--output', help="Archivo JSON de salida (por defecto stdout)")
+    parser.add_argument('--baseline', help="JSON de una corrida anterior para comparar")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Empeoramiento tolerado de la mediana (0.25 = 25%%)")
+    parser.add_argument('--trace', help="Traza de los tramos (formato de chrome://tracing)")
+    parser.add_argument('--metrics', help="Métricas de los tramos en formato de Prometheus")
+    args = parser.parse_args()
+
+    if args.trace or args.metrics:
+        # Con la instrumentación activada las medianas incluyen su costo
+        instrumentation.enable(args.trace, args.metrics)
+
+    # Silenciar los mensajes de la propia aplicación durante la medición
+    logging.basicConfig(level=logging.WARNING, format='%(message)s', stream=sys.stderr)
+    report = run_benchmarks(args)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['regressions'] = compare(report, baseline, args.threshold)
+        for regression in report['regressions']:
+            print(f"REGRESIÓN {regression['name']}: x{regression['ratio']:.2f}", file=sys.stderr)
+        exit_code = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import os
+import sys
+
+def get_data_dir() -> str:
+    """Directorio de datos de SpeedChrome (historial, logs, etc.).
+
+    En Windows: %LOCALAPPDATA%\\SpeedChrome. En otros sistemas:
+    $XDG_DATA_HOME/speedchrome (o ~/.local/share/speedchrome).
+    Se puede forzar con la variable de entorno SPEEDCHROME_DATA_DIR.
+    """
+    path = os.environ.get('SPEEDCHROME_DATA_DIR')
+    if not path:
+        if sys.platform == 'win32':
+            base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+            path = os.path.join(base, 'SpeedChrome')
+        else:
+            base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+            path = os.path.join(base, 'speedchrome')
+    os.makedirs(path, exist_ok=True)
+    return path
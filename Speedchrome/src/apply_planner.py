@@ -0,0 +1,182 @@
+import logging
+from typing import Dict, List, Optional
+from registry_utils import RegistryManager, HKLM, HKU, REG_DWORD, normalize_key_path
+from browser_manager import BrowserManager
+from browser_discovery import catalog_entry
+from sessions import user_key_path
+from instrumentation import traced
+from optimizations import (
+    OPTIMIZATIONS, SAVED_FIELDS, applies_to, option_value, registry_data, registry_location,
+    saved_config,
+)
+
+
+def settings_for(browser: str, options: Dict) -> List[Dict]:
+    """Optimizaciones activadas en ``options`` que se aplican al navegador."""
+    entry = catalog_entry(browser)
+    return [
+        opt for opt in OPTIMIZATIONS
+        if option_value(options, opt, browser) is not None and applies_to(opt, entry)
+    ]
+
+
+def _written(browser: str) -> Dict:
+    """Valores que SpeedChrome escribió para el navegador según el historial."""
+    try:
+        return BrowserManager.get_journal().written(browser)
+    except Exception as e:
+        logging.error(f"No se pudo leer el historial de {browser}: {e}")
+        return {}
+
+
+@traced('apply.plan', 'apply', arg_index=0, arg_name='browser')
+def plan_browser(browser: str, options: Dict, user: Optional[Dict] = None) -> Dict:
+    """Calcula los cambios mínimos para un navegador, sin escribir nada.
+
+    Retorna ``writes`` (lista de {option, hive, key_path, name, current,
+    desired, type, restart}, con la ruta completa de la clave), ``config``
+    (configuración a guardar, vacía si la guardada ya coincide) y
+    ``restart`` (True solo si cambia algún valor que requiere reiniciar).
+
+    Una optimización desactivada cuyo valor escrito por SpeedChrome sigue
+    en el registro (según el historial o la configuración guardada) vuelve
+    al valor anterior a SpeedChrome; ``desired`` None la borra.
+
+    Con ``user`` (de ``sessions.logged_on_users``) los valores se escriben
+    en la colmena de ese usuario (HKU) en lugar de HKLM; la configuración
+    guardada de SpeedChrome es del equipo y no se toca.
+    """
+    plan = {'browser': browser, 'browser_path': '', 'user': user['user'] if user else None,
+            'writes': [], 'config': {}, 'restart': False}
+    browser_path = BrowserManager.get_browser_path(browser)
+    if not browser_path:
+        plan['error'] = "No se encontró la ruta de registro"
+        return plan
+    plan['browser_path'] = browser_path
+    entry = catalog_entry(browser)
+
+    hive = HKU if user else HKLM
+    backend = RegistryManager.get_backend()
+    saved = {}
+    if not user:
+        saved = backend.read_values(
+            f"{BrowserManager.SPEEDCHROME_REG_PATH}\\{browser}", SAVED_FIELDS
+        ) or {}
+    written = _written(browser)
+
+    # (opción, clave, nombre, dato deseado, tipo, dato que dejó SpeedChrome)
+    settings = []
+    wanted: Dict[str, List[str]] = {}
+    for opt in OPTIMIZATIONS:
+        if not applies_to(opt, entry):
+            continue
+        key_path, name = registry_location(opt, browser_path, entry)
+        if user:
+            key_path = user_key_path(user, key_path)
+        value = option_value(options, opt, browser)
+        if value is not None:
+            settings.append((opt, key_path, name, registry_data(opt, value), REG_DWORD, None))
+        else:
+            # Desactivada: si todavía está el valor que escribió SpeedChrome,
+            # se vuelve al que había antes (o se borra)
+            history = written.get((hive.lower(), normalize_key_path(key_path).lower(), name.lower()))
+            if history is not None:
+                if history['last'] is None or history['last'] == history['original']:
+                    continue
+                original = history['original']
+                settings.append((opt, key_path, name, original[0] if original else None,
+                                 original[1] if original else None, history['last'][0]))
+            elif saved.get(opt['id'], (0,))[0]:
+                # Guardada antes de que existiera el historial: no se conoce el original
+                settings.append((opt, key_path, name, None, None,
+                                 registry_data(opt, saved[opt['id']][0])))
+            else:
+                continue
+        wanted.setdefault(key_path, []).append(name)
+
+    current = {}
+    for key_path, names in wanted.items():
+        try:
+            values = backend.read_values(key_path, names, hive=hive) or {}
+        except Exception as e:
+            logging.debug(f"No se pudo leer registro {key_path}: {e}")
+            continue
+        for name, value in values.items():
+            current[(key_path, name)] = value[0]
+
+    for opt, key_path, name, desired, value_type, leftover in settings:
+        existing = current.get((key_path, name))
+        if leftover is not None and existing != leftover:
+            # Otro programa cambió el valor después: ya no es de SpeedChrome
+            continue
+        if existing != desired:
+            plan['writes'].append({'option': opt['id'], 'hive': hive, 'key_path': key_path,
+                                   'name': name, 'current': existing, 'desired': desired,
+                                   'type': value_type, 'restart': opt['restart']})
+            plan['restart'] = plan['restart'] or opt['restart']
+
+    if user:
+        return plan
+    config = saved_config(options, browser)
+    if any(saved.get(field, (None,))[0] != config[field] for field in SAVED_FIELDS):
+        plan['config'] = config
+    return plan
+
+
+def plan_changes(selected_browsers: List[str], options: Dict,
+                 users: Optional[List[Dict]] = None) -> List[Dict]:
+    """Plan de todos los navegadores seleccionados (modo de prueba: no escribe).
+
+    Con ``users`` hay un plan por usuario y navegador, en la colmena de cada uno.
+    """
+    if users is None:
+        return [plan_browser(browser, options) for browser in selected_browsers]
+    return [plan_browser(browser, options, user) for user in users for browser in selected_browsers]
+
+
+def describe(plan: Dict) -> List[str]:
+    """Líneas legibles de un plan, para el log o la consola."""
+    browser = plan['browser']
+    if plan.get('user'):
+        browser = f"{browser} ({plan['user']})"
+    if plan.get('error'):
+        return [f"{browser}: {plan['error']}"]
+    if not plan['writes'] and not plan['config']:
+        return [f"{browser}: sin cambios"]
+    lines = []
+    for write in plan['writes']:
+        current = 'sin valor' if write['current'] is None else write['current']
+        desired = 'sin valor' if write['desired'] is None else write['desired']
+        lines.append(f"{browser}: {write['key_path']}\\{write['name']} {current} -> {desired}")
+    if plan['config'] and not plan['writes']:
+        lines.append(f"{browser}: solo se actualiza la configuración guardada")
+    lines.append(f"{browser}: {'requiere' if plan['restart'] else 'no requiere'} reinicio")
+    return lines
+
+
+@traced('apply.write', 'apply')
+def apply_plan(plan: Dict, kind: str = 'apply') -> Optional[bool]:
+    """Escribe solo las diferencias del plan en un único lote.
+
+    Retorna None si no había nada que escribir, True si se confirmó y False
+    si el lote falló (y se revirtió). ``kind`` es el tipo de generación en
+    el historial.
+    """
+    if plan.get('error') or (not plan['writes'] and not plan['config']):
+        return None
+    tx = RegistryManager.transaction()
+    for write in plan['writes']:
+        if write['desired'] is None:
+            tx.delete_value(write['key_path'], write['name'], hive=write.get('hive'))
+        else:
+            tx.set_value(write['key_path'], write['name'], write['desired'],
+                         write.get('type') or REG_DWORD, hive=write.get('hive'))
+    if plan['config']:
+        BrowserManager.save_config(plan['browser'], plan['config'], transaction=tx)
+    if not tx.commit():
+        return False
+    try:
+        BrowserManager.get_journal().record(plan['browser'], tx.changes, kind=kind)
+    except Exception as e:
+        logging.error(f"No se pudo registrar el cambio de {plan['browser']} en el historial: {e}")
+    return True
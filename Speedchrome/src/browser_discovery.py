@@ -0,0 +1,356 @@
+import os
+import sys
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+from registry_utils import RegistryManager, HKLM, HKCU, VIEW_32, VIEW_64
+
+UNINSTALL_KEY = r'SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall'
+
+# Catálogo de navegadores. Por entrada:
+#   reg_key                clave bajo SOFTWARE (HKLM o HKCU)
+#   uninstall_key          nombre de la clave de desinstalación (versión y carpeta)
+#   app_dir                carpeta del ejecutable relativa a Program Files / LocalAppData
+#   linux_paths            ejecutables habituales en Linux (sus nombres son los del
+#                          proceso en Linux; el primero que existe se usa para abrirlo)
+#   linux_policy_dir       carpeta de políticas administradas en Linux
+#   linux_flags_file       archivo de flags por usuario (en ~/.config)
+#   user_data_dir          datos de usuario (perfiles) relativos a LocalAppData
+#   linux_user_data_dir    ídem en Linux, relativo a ~/.config
+#   family                 familia (los canales comparten políticas y ejecutable)
+#   policy_key             clave de políticas bajo SOFTWARE\Policies (None: sin soporte)
+BROWSER_CATALOG = [
+    {'id': 'Chrome', 'friendly_name': 'Google Chrome', 'process': 'chrome.exe',
+     'reg_key': r'Google\Chrome', 'uninstall_key': 'Google Chrome',
+     'app_dir': r'Google\Chrome\Application',
+     'linux_paths': ['/opt/google/chrome/chrome'],
+     'linux_policy_dir': '/etc/opt/chrome/policies/managed', 'linux_flags_file': 'chrome-flags.conf',
+     'user_data_dir': r'Google\Chrome\User Data', 'linux_user_data_dir': 'google-chrome',
+     'family': 'chrome', 'policy_key': r'Google\Chrome'},
+    {'id': 'ChromeBeta', 'friendly_name': 'Google Chrome Beta', 'process': 'chrome.exe',
+     'reg_key': r'Google\Chrome Beta', 'uninstall_key': 'Google Chrome Beta',
+     'app_dir': r'Google\Chrome Beta\Application',
+     'linux_paths': ['/opt/google/chrome-beta/chrome'],
+     'linux_policy_dir': '/etc/opt/chrome_beta/policies/managed', 'linux_flags_file': 'chrome-beta-flags.conf',
+     'user_data_dir': r'Google\Chrome Beta\User Data', 'linux_user_data_dir': 'google-chrome-beta',
+     'family': 'chrome', 'policy_key': r'Google\Chrome'},
+    {'id': 'ChromeDev', 'friendly_name': 'Google Chrome Dev', 'process': 'chrome.exe',
+     'reg_key': r'Google\Chrome Dev', 'uninstall_key': 'Google Chrome Dev',
+     'app_dir': r'Google\Chrome Dev\Application',
+     'linux_paths': ['/opt/google/chrome-unstable/chrome'],
+     'linux_policy_dir': '/etc/opt/chrome_dev/policies/managed', 'linux_flags_file': 'chrome-dev-flags.conf',
+     'user_data_dir': r'Google\Chrome Dev\User Data', 'linux_user_data_dir': 'google-chrome-unstable',
+     'family': 'chrome', 'policy_key': r'Google\Chrome'},
+    {'id': 'ChromeCanary', 'friendly_name': 'Google Chrome Canary', 'process': 'chrome.exe',
+     'reg_key': r'Google\Chrome SxS', 'uninstall_key': 'Google Chrome SxS',
+     'app_dir': r'Google\Chrome SxS\Application',
+     'linux_paths': ['/opt/google/chrome-canary/chrome'],
+     'linux_policy_dir': '/etc/opt/chrome_canary/policies/managed', 'linux_flags_file': 'chrome-canary-flags.conf',
+     'user_data_dir': r'Google\Chrome SxS\User Data', 'linux_user_data_dir': 'google-chrome-canary',
+     'family': 'chrome', 'policy_key': r'Google\Chrome'},
+    {'id': 'Chromium', 'friendly_name': 'Chromium', 'process': 'chrome.exe',
+     'reg_key': 'Chromium', 'uninstall_key': 'Chromium',
+     'app_dir': r'Chromium\Application',
+     'linux_paths': ['/usr/lib/chromium/chromium', '/usr/lib/chromium-browser/chromium-browser',
+                     '/snap/chromium/current/usr/lib/chromium-browser/chrome'],
+     'linux_policy_dir': '/etc/chromium/policies/managed', 'linux_flags_file': 'chromium-flags.conf',
+     'user_data_dir': r'Chromium\User Data', 'linux_user_data_dir': 'chromium',
+     'family': 'chromium', 'policy_key': 'Chromium'},
+    {'id': 'Edge', 'friendly_name': 'Microsoft Edge (Chromium)', 'process': 'msedge.exe',
+     'reg_key': r'Microsoft\Edge', 'uninstall_key': 'Microsoft Edge',
+     'app_dir': r'Microsoft\Edge\Application',
+     'linux_paths': ['/opt/microsoft/msedge/msedge'],
+     'linux_policy_dir': '/etc/opt/edge/policies/managed', 'linux_flags_file': 'microsoft-edge-stable-flags.conf',
+     'user_data_dir': r'Microsoft\Edge\User Data', 'linux_user_data_dir': 'microsoft-edge',
+     'family': 'edge', 'policy_key': r'Microsoft\Edge'},
+    {'id': 'EdgeBeta', 'friendly_name': 'Microsoft Edge Beta', 'process': 'msedge.exe',
+     'reg_key': r'Microsoft\Edge Beta', 'uninstall_key': 'Microsoft Edge Beta',
+     'app_dir': r'Microsoft\Edge Beta\Application',
+     'linux_paths': ['/opt/microsoft/msedge-beta/msedge'],
+     'linux_policy_dir': '/etc/opt/edge_beta/policies/managed', 'linux_flags_file': 'microsoft-edge-beta-flags.conf',
+     'user_data_dir': r'Microsoft\Edge Beta\User Data', 'linux_user_data_dir': 'microsoft-edge-beta',
+     'family': 'edge', 'policy_key': r'Microsoft\Edge'},
+    {'id': 'EdgeDev', 'friendly_name': 'Microsoft Edge Dev', 'process': 'msedge.exe',
+     'reg_key': r'Microsoft\Edge Dev', 'uninstall_key': 'Microsoft Edge Dev',
+     'app_dir': r'Microsoft\Edge Dev\Application',
+     'linux_paths': ['/opt/microsoft/msedge-dev/msedge'],
+     'linux_policy_dir': '/etc/opt/edge_dev/policies/managed', 'linux_flags_file': 'microsoft-edge-dev-flags.conf',
+     'user_data_dir': r'Microsoft\Edge Dev\User Data', 'linux_user_data_dir': 'microsoft-edge-dev',
+     'family': 'edge', 'policy_key': r'Microsoft\Edge'},
+    {'id': 'EdgeCanary', 'friendly_name': 'Microsoft Edge Canary', 'process': 'msedge.exe',
+     'reg_key': r'Microsoft\Edge SxS', 'uninstall_key': 'Microsoft Edge Canary',
+     'app_dir': r'Microsoft\Edge SxS\Application',
+     'linux_paths': [],
+     'linux_policy_dir': None, 'linux_flags_file': None,
+     'user_data_dir': r'Microsoft\Edge SxS\User Data', 'linux_user_data_dir': None,
+     'family': 'edge', 'policy_key': r'Microsoft\Edge'},
+    {'id': 'Brave', 'friendly_name': 'Brave Browser', 'process': 'brave.exe',
+     'reg_key': r'BraveSoftware\Brave-Browser', 'uninstall_key': 'BraveSoftware Brave-Browser',
+     'app_dir': r'BraveSoftware\Brave-Browser\Application',
+     'linux_paths': ['/opt/brave.com/brave/brave'],
+     'linux_policy_dir': '/etc/brave/policies/managed', 'linux_flags_file': 'brave-flags.conf',
+     'user_data_dir': r'BraveSoftware\Brave-Browser\User Data', 'linux_user_data_dir': 'BraveSoftware/Brave-Browser',
+     'family': 'brave', 'policy_key': r'BraveSoftware\Brave'},
+    {'id': 'BraveBeta', 'friendly_name': 'Brave Browser Beta', 'process': 'brave.exe',
+     'reg_key': r'BraveSoftware\Brave-Browser-Beta', 'uninstall_key': 'BraveSoftware Brave-Browser-Beta',
+     'app_dir': r'BraveSoftware\Brave-Browser-Beta\Application',
+     'linux_paths': ['/opt/brave.com/brave-beta/brave'],
+     'linux_policy_dir': '/etc/brave/policies/managed', 'linux_flags_file': 'brave-beta-flags.conf',
+     'user_data_dir': r'BraveSoftware\Brave-Browser-Beta\User Data', 'linux_user_data_dir': 'BraveSoftware/Brave-Browser-Beta',
+     'family': 'brave', 'policy_key': r'BraveSoftware\Brave'},
+    {'id': 'BraveNightly', 'friendly_name': 'Brave Browser Nightly', 'process': 'brave.exe',
+     'reg_key': r'BraveSoftware\Brave-Browser-Nightly', 'uninstall_key': 'BraveSoftware Brave-Browser-Nightly',
+     'app_dir': r'BraveSoftware\Brave-Browser-Nightly\Application',
+     'linux_paths': ['/opt/brave.com/brave-nightly/brave'],
+     'linux_policy_dir': '/etc/brave/policies/managed', 'linux_flags_file': 'brave-nightly-flags.conf',
+     'user_data_dir': r'BraveSoftware\Brave-Browser-Nightly\User Data', 'linux_user_data_dir': 'BraveSoftware/Brave-Browser-Nightly',
+     'family': 'brave', 'policy_key': r'BraveSoftware\Brave'},
+    {'id': 'Opera', 'friendly_name': 'Opera', 'process': 'opera.exe',
+     'reg_key': r'Opera Software', 'uninstall_key': None,
+     'app_dir': r'Programs\Opera',
+     'linux_paths': ['/usr/lib/x86_64-linux-gnu/opera/opera', '/snap/opera/current/usr/lib/x86_64-linux-gnu/opera/opera'],
+     'linux_policy_dir': None, 'linux_flags_file': None,
+     'user_data_dir': None, 'linux_user_data_dir': None,
+     'family': 'opera', 'policy_key': None},
+    {'id': 'Vivaldi', 'friendly_name': 'Vivaldi', 'process': 'vivaldi.exe',
+     'reg_key': 'Vivaldi', 'uninstall_key': 'Vivaldi',
+     'app_dir': r'Vivaldi\Application',
+     'linux_paths': ['/opt/vivaldi/vivaldi', '/opt/vivaldi/vivaldi-bin'],
+     'linux_policy_dir': None, 'linux_flags_file': 'vivaldi-stable.conf',
+     'user_data_dir': r'Vivaldi\User Data', 'linux_user_data_dir': 'vivaldi',
+     'family': 'vivaldi', 'policy_key': None},
+]
+
+
+def catalog_entry(browser: str, catalog: Optional[List[Dict]] = None) -> Optional[Dict]:
+    """Entrada del catálogo de un navegador (o None)."""
+    for entry in catalog if catalog is not None else BROWSER_CATALOG:
+        if entry['id'] == browser:
+            return entry
+    return None
+
+
+def process_names(entry: Dict, platform: str = sys.platform) -> List[str]:
+    """Nombres del proceso del navegador en la tabla de procesos de la plataforma.
+
+    En Windows es el ejecutable (``chrome.exe``); en Linux, los nombres de
+    sus ``linux_paths`` (``chrome``, ``chromium``, ``msedge``...).
+    """
+    if platform == 'win32':
+        return [entry['process']]
+    names = []
+    for path in entry.get('linux_paths') or []:
+        name = os.path.basename(path)
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def install_dirs(entry: Dict, platform: str = sys.platform) -> List[str]:
+    """Carpetas del ejecutable según el catálogo.
+
+    En Windows es ``app_dir``, relativa a Program Files o LocalAppData (de
+    cualquier usuario); en Linux, las carpetas de ``linux_paths``.
+    """
+    if platform == 'win32':
+        return [entry['app_dir']] if entry.get('app_dir') else []
+    dirs = []
+    for path in entry.get('linux_paths') or []:
+        directory = os.path.dirname(path)
+        if directory not in dirs:
+            dirs.append(directory)
+    return dirs
+
+
+def _installation(entry: Dict, scope: str, source: str, **fields) -> Dict:
+    record = {
+        'browser': entry['id'],
+        'friendly_name': entry['friendly_name'],
+        'process': entry['process'],
+        'scope': scope,
+        'sources': [source],
+        'hive': None,
+        'view': None,
+        'reg_path': None,
+        'version': None,
+        'install_location': None,
+        'executable': None,
+    }
+    record.update(fields)
+    return record
+
+
+def scan_registry(catalog: List[Dict], hive: str, view: int, source: str) -> List[Dict]:
+    """Busca las entradas del catálogo en una colmena y vista del registro."""
+    backend = RegistryManager.get_backend()
+    scope = 'machine' if hive == HKLM else 'user'
+    found = []
+    for entry in catalog:
+        reg_path = f"SOFTWARE\\{entry['reg_key']}"
+        exists = backend.key_exists(reg_path, hive=hive, view=view)
+        uninstall = None
+        if entry.get('uninstall_key'):
+            uninstall = backend.read_values(
+                f"{UNINSTALL_KEY}\\{entry['uninstall_key']}",
+                ['DisplayVersion', 'InstallLocation'], hive=hive, view=view
+            )
+        if not exists and uninstall is None:
+            continue
+        uninstall = uninstall or {}
+        location = uninstall.get('InstallLocation', (None,))[0]
+        found.append(_installation(
+            entry, scope, source, hive=hive, view=view,
+            reg_path=reg_path if exists else None,
+            version=uninstall.get('DisplayVersion', (None,))[0],
+            install_location=location,
+            executable=os.path.join(location, entry['process']) if location else None,
+        ))
+    return found
+
+
+def _install_roots() -> List[Tuple[str, str]]:
+    """Carpetas base de instalación con su alcance (máquina o usuario)."""
+    roots = []
+    for variable, scope in (('ProgramFiles', 'machine'), ('ProgramFiles(x86)', 'machine'),
+                            ('ProgramW6432', 'machine'), ('LOCALAPPDATA', 'user')):
+        path = os.environ.get(variable)
+        if path and (path, scope) not in roots:
+            roots.append((path, scope))
+    return roots
+
+
+def scan_directories(catalog: List[Dict], source: str = 'directories') -> List[Dict]:
+    """Busca los ejecutables en las carpetas de instalación conocidas."""
+    found = []
+    if sys.platform == 'win32':
+        roots = _install_roots()
+        for entry in catalog:
+            for root, scope in roots:
+                location = os.path.join(root, entry['app_dir'])
+                executable = os.path.join(location, entry['process'])
+                if os.path.isfile(executable):
+                    found.append(_installation(entry, scope, source,
+                                               install_location=location, executable=executable))
+    else:
+        home = os.path.expanduser('~')
+        for entry in catalog:
+            for executable in entry.get('linux_paths', []):
+                if os.path.isfile(executable):
+                    scope = 'user' if executable.startswith(home) else 'machine'
+                    found.append(_installation(entry, scope, source,
+                                               install_location=os.path.dirname(executable),
+                                               executable=executable))
+                    break
+    return found
+
+
+def _same_location(a: Optional[str], b: Optional[str]) -> bool:
+    return bool(a and b) and os.path.normcase(os.path.normpath(a)) == os.path.normcase(os.path.normpath(b))
+
+
+def merge_installations(results: List[Dict]) -> List[Dict]:
+    """Une los hallazgos de todas las fuentes en una lista sin duplicados.
+
+    Dos hallazgos son la misma instalación si son del mismo navegador y tienen
+    el mismo alcance, salvo que ambos conozcan su carpeta y sea distinta.
+    """
+    merged: List[Dict] = []
+    for record in results:
+        for existing in merged:
+            if existing['browser'] != record['browser'] or existing['scope'] != record['scope']:
+                continue
+            if (existing['install_location'] and record['install_location']
+                    and not _same_location(existing['install_location'], record['install_location'])):
+                continue
+            for source in record['sources']:
+                if source not in existing['sources']:
+                    existing['sources'].append(source)
+            for field in ('hive', 'view', 'reg_path', 'version', 'install_location', 'executable'):
+                if existing[field] is None and record[field] is not None:
+                    existing[field] = record[field]
+            break
+        else:
+            merged.append(dict(record, sources=list(record['sources'])))
+    return merged
+
+
+class BrowserDiscovery:
+    """Descubre instalaciones consultando todas las fuentes en paralelo.
+
+    Fuentes: HKLM vista de 64 bits, HKLM vista de 32 bits, HKCU y las
+    carpetas de instalación conocidas. Todas se lanzan a la vez y se espera
+    como mucho ``timeout`` segundos; una fuente que no terminó a tiempo se
+    informa como ``timeout`` y sus resultados se descartan.
+    """
+
+    def __init__(self, catalog: Optional[List[Dict]] = None, timeout: float = 2.0):
+        self.catalog = catalog if catalog is not None else BROWSER_CATALOG
+        self.timeout = timeout
+
+    def sources(self) -> Dict[str, Callable[[], List[Dict]]]:
+        return {
+            'hklm64': lambda: scan_registry(self.catalog, HKLM, VIEW_64, 'hklm64'),
+            'hklm32': lambda: scan_registry(self.catalog, HKLM, VIEW_32, 'hklm32'),
+            'hkcu': lambda: scan_registry(self.catalog, HKCU, VIEW_64, 'hkcu'),
+            'directories': lambda: scan_directories(self.catalog),
+        }
+
+    def discover(self) -> Dict:
+        """Ejecuta todas las fuentes y retorna instalaciones y tiempos por fuente."""
+        start = time.perf_counter()
+        sources = self.sources()
+
+        def timed(name, func):
+            # Retorna su tiempo en lugar de escribirlo en un dict compartido:
+            # una fuente que no terminó a tiempo sigue corriendo después
+            source_start = time.perf_counter()
+            try:
+                result = func()
+                timing = {'status': 'ok', 'found': len(result)}
+            except Exception as e:
+                logging.error(f"Error en la fuente de descubrimiento {name}: {e}")
+                result = []
+                timing = {'status': 'error', 'error': str(e), 'found': 0}
+            timing['ms'] = round((time.perf_counter() - source_start) * 1000, 3)
+            return result, timing
+
+        from concurrent.futures import ThreadPoolExecutor, wait
+
+        executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix='speedchrome-discovery')
+        futures = {name: executor.submit(timed, name, func) for name, func in sources.items()}
+        done, _ = wait(futures.values(), timeout=self.timeout)
+        # No se espera a las fuentes lentas: sus hilos terminan por su cuenta
+        executor.shutdown(wait=False)
+
+        results = []
+        timings: Dict[str, Dict] = {}
+        for name, future in futures.items():
+            if future in done:
+                result, timings[name] = future.result()
+                results.extend(result)
+            else:
+                timings[name] = {'status': 'timeout', 'found': 0, 'ms': self.timeout * 1000}
+        return {
+            'installations': merge_installations(results),
+            'sources': timings,
+            'total_ms': round((time.perf_counter() - start) * 1000, 3),
+        }
+
+
+def browser_paths(catalog: List[Dict]) -> Dict[str, Dict]:
+    """Tabla ``BROWSER_PATHS`` (formato de BrowserManager) derivada del catálogo."""
+    paths = {}
+    for entry in catalog:
+        paths[entry['id']] = {
+            'reg_paths': [
+                f"SOFTWARE\\{entry['reg_key']}",
+                f"SOFTWARE\\Wow6432Node\\{entry['reg_key']}",
+            ],
+            'process': entry['process'],
+            'processes': process_names(entry),
+            'install_dirs': install_dirs(entry),
+            'app_dir': entry.get('app_dir'),
+            'friendly_name': entry['friendly_name'],
+            'uninstall_key': entry['uninstall_key'],
+        }
+    return paths
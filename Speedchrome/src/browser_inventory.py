@@ -0,0 +1,136 @@
+import logging
+from typing import Dict, List, Optional
+from registry_utils import RegistryManager, RegistryBackend
+
+APP_PATHS_KEY = r'SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths'
+UNINSTALL_KEYS = [
+    r'SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall',
+    r'SOFTWARE\Wow6432Node\Microsoft\Windows\CurrentVersion\Uninstall',
+]
+
+
+def under_app_dir(path: Optional[str], app_dir: Optional[str]) -> bool:
+    """True si ``path`` es la carpeta ``app_dir`` del catálogo o está dentro.
+
+    ``app_dir`` es relativa a Program Files o LocalAppData, así que se busca
+    como tramo de la ruta: 'Google\\Chrome\\Application' no coincide con la
+    carpeta de Chrome Beta.
+    """
+    if not path:
+        return False
+    if not app_dir:
+        return True
+    normalized = '\\' + path.replace('/', '\\').strip('\\').lower() + '\\'
+    segment = '\\' + app_dir.strip('\\').lower() + '\\'
+    return segment in normalized
+
+
+class BrowserInventory:
+    """Índice de navegadores instalados, construido una vez y reutilizado.
+
+    Por navegador guarda la ruta de registro resuelta, el proceso, la versión
+    y la carpeta de instalación, junto con la hora de última escritura
+    (``query_last_write``) de cada clave de la que se leyó algo. Una nueva
+    consulta solo compara esas horas; si alguna cambió (o la clave ya no
+    existe) se vuelve a sondear ese navegador. Los navegadores no instalados
+    se vuelven a sondear siempre (una comprobación de existencia por ruta).
+    """
+
+    def __init__(self, browsers: Dict[str, Dict]):
+        self.browsers = browsers
+        self._entries: Dict[str, Dict] = {}
+        self._backend: Optional[RegistryBackend] = None
+
+    def _check_backend(self) -> RegistryBackend:
+        backend = RegistryManager.get_backend()
+        if backend is not self._backend:
+            self._entries.clear()
+            self._backend = backend
+        return backend
+
+    def _is_fresh(self, backend: RegistryBackend, entry: Dict) -> bool:
+        if not entry['installed']:
+            return False
+        return all(
+            backend.query_last_write(key_path) == stamp
+            for key_path, stamp in entry['stamps'].items()
+        )
+
+    def _probe(self, backend: RegistryBackend, browser: str, info: Dict) -> Dict:
+        entry = {
+            'browser': browser,
+            'friendly_name': info['friendly_name'],
+            'process': info['process'],
+            'installed': False,
+            'reg_path': '',
+            'browser_path': '',
+            'version': None,
+            'install_location': None,
+            'executable': None,
+            'stamps': {},
+        }
+        for reg_path in info['reg_paths']:
+            stamp = backend.query_last_write(reg_path)
+            if stamp is not None:
+                entry.update(installed=True, reg_path=reg_path,
+                             browser_path=reg_path.replace('SOFTWARE\\', '', 1))
+                entry['stamps'][reg_path] = stamp
+                break
+        if not entry['installed']:
+            return entry
+
+        # App Paths va por nombre de ejecutable: los canales que comparten
+        # chrome.exe o msedge.exe ven la del que se registró, casi siempre el
+        # estable. Solo vale si está en la carpeta del navegador.
+        app_path = f"{APP_PATHS_KEY}\\{info['process']}"
+        values = backend.read_values(app_path, ['', 'Path'])
+        if values:
+            location = values.get('Path', (None,))[0]
+            if under_app_dir(location, info.get('app_dir')):
+                entry['install_location'] = location
+                entry['executable'] = values.get('', (None,))[0]
+            entry['stamps'][app_path] = backend.query_last_write(app_path)
+
+        uninstall_name = info.get('uninstall_key')
+        if uninstall_name:
+            for base in UNINSTALL_KEYS:
+                uninstall_path = f"{base}\\{uninstall_name}"
+                values = backend.read_values(uninstall_path, ['DisplayVersion', 'InstallLocation'])
+                if values is None:
+                    continue
+                entry['version'] = values.get('DisplayVersion', (None,))[0]
+                if not entry['install_location']:
+                    entry['install_location'] = values.get('InstallLocation', (None,))[0]
+                entry['stamps'][uninstall_path] = backend.query_last_write(uninstall_path)
+                break
+        return entry
+
+    def refresh(self, force: bool = False) -> Dict[str, Dict]:
+        """Valida (o reconstruye) el índice y lo retorna."""
+        backend = self._check_backend()
+        for browser, info in self.browsers.items():
+            entry = self._entries.get(browser)
+            if force or entry is None or not self._is_fresh(backend, entry):
+                try:
+                    self._entries[browser] = self._probe(backend, browser, info)
+                except Exception as e:
+                    logging.error(f"Error al sondear {browser}: {e}")
+                    self._entries[browser] = {'browser': browser, 'installed': False,
+                                              'reg_path': '', 'browser_path': '', 'stamps': {}}
+        # Entradas de navegadores que ya no están en el catálogo
+        for browser in set(self._entries) - set(self.browsers):
+            del self._entries[browser]
+        return self._entries
+
+    def get(self, browser: str) -> Optional[Dict]:
+        """Entrada de un navegador (validada contra el registro)."""
+        if browser not in self.browsers:
+            return None
+        backend = self._check_backend()
+        entry = self._entries.get(browser)
+        if entry is None or not self._is_fresh(backend, entry):
+            entry = self._entries[browser] = self._probe(backend, browser, self.browsers[browser])
+        return entry
+
+    def installed(self) -> List[str]:
+        return [browser for browser, entry in self.refresh().items() if entry['installed']]
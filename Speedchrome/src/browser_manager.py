@@ -1,135 +1,263 @@
 import os
-import psutil
-import winreg
+import time
 import logging
-from typing import Dict, List, Tuple
-from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from registry_utils import RegistryManager, RegistryTransaction
+from browser_inventory import BrowserInventory
+from browser_discovery import BROWSER_CATALOG, BrowserDiscovery, browser_paths
+from app_paths import get_data_dir
+from optimizations import SAVED_FIELDS
+from instrumentation import traced
+
+if TYPE_CHECKING:
+    from process_utils import ProcessSnapshot, BrowserMatcher
+    from config_journal import ConfigJournal
 
 class BrowserManager:
-    BROWSER_PATHS = {
-        'Chrome': {
-            'reg_paths': [
-                r'SOFTWARE\Google\Chrome',
-                r'SOFTWARE\Wow6432Node\Google\Chrome'
-            ],
-            'process': 'chrome.exe',
-            'friendly_name': 'Google Chrome'
-        },
-        'Edge': {
-            'reg_paths': [
-                r'SOFTWARE\Microsoft\Edge'
-            ],
-            'process': 'msedge.exe',
-            'friendly_name': 'Microsoft Edge (Chromium)'
-        },
-        'Brave': {
-            'reg_paths': [
-                r'SOFTWARE\BraveSoftware\Brave-Browser'
-            ],
-            'process': 'brave.exe',
-            'friendly_name': 'Brave Browser'
-        }
-    }
+    # Derivado de BROWSER_CATALOG (browser_discovery.py)
+    BROWSER_PATHS = browser_paths(BROWSER_CATALOG)
 
     SPEEDCHROME_REG_PATH = r'SOFTWARE\SpeedChrome'
+
+    _inventory: Optional[BrowserInventory] = None
+    _journal: Optional['ConfigJournal'] = None
+
+    @staticmethod
+    def get_inventory() -> BrowserInventory:
+        """Inventario compartido de navegadores (se reconstruye si cambia el catálogo)."""
+        inventory = BrowserManager._inventory
+        if inventory is None or inventory.browsers is not BrowserManager.BROWSER_PATHS:
+            inventory = BrowserManager._inventory = BrowserInventory(BrowserManager.BROWSER_PATHS)
+        return inventory
     
+    @staticmethod
+    def get_journal() -> 'ConfigJournal':
+        """Historial de cambios compartido (journal.db en el directorio de datos)."""
+        if BrowserManager._journal is None:
+            # sqlite3 y hashlib solo se cargan al usar el historial
+            from config_journal import ConfigJournal
+            BrowserManager._journal = ConfigJournal(os.path.join(get_data_dir(), 'journal.db'))
+        return BrowserManager._journal
+
+    @staticmethod
+    def get_matcher() -> 'BrowserMatcher':
+        """Asignación de procesos a navegadores según el catálogo y lo instalado.
+
+        Los canales que comparten ejecutable se distinguen por la carpeta
+        del ejecutable de cada proceso (ver ``BrowserMatcher``).
+        """
+        from process_utils import BrowserMatcher
+        installed = {
+            browser: entry for browser, entry in BrowserManager.get_inventory().refresh().items()
+            if entry['installed']
+        }
+        return BrowserMatcher(BrowserManager.BROWSER_PATHS, installed)
+
+    @staticmethod
+    @traced('browser.restore_original', 'browser', arg_index=0, arg_name='browser')
+    def restore_original(browser: str) -> bool:
+        """Restaura los valores que había antes de que SpeedChrome tocara el navegador."""
+        try:
+            return BrowserManager.get_journal().restore_original(browser)
+        except Exception as e:
+            logging.error(f"Error al restaurar {browser}: {e}")
+            return False
+
     @staticmethod
     def check_registry_paths(reg_paths: List[str]) -> bool:
         """Verifica la existencia del navegador en el registro."""
+        backend = RegistryManager.get_backend()
         for reg_path in reg_paths:
-            try:
-                with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, reg_path, 0, 
-                                  winreg.KEY_READ | winreg.KEY_WOW64_64KEY):
-                    return True
-            except WindowsError:
-                continue
+            if backend.key_exists(reg_path):
+                return True
         return False
 
     @staticmethod
+    @traced('browser.detect', 'browser')
     def detect_installed_browsers() -> Dict[str, bool]:
         """Detecta los navegadores instalados usando el registro."""
         installed = {}
         
-        for browser, info in BrowserManager.BROWSER_PATHS.items():
-            # Verificar en el registro
-            installed[browser] = BrowserManager.check_registry_paths(info['reg_paths'])
+        for browser, entry in BrowserManager.get_inventory().refresh().items():
+            installed[browser] = entry['installed']
             logging.debug(f"{browser}: instalado={installed[browser]}")
 
         return installed
 
     @staticmethod
+    @traced('browser.get_path', 'browser', arg_index=0, arg_name='browser')
     def get_browser_path(browser: str) -> str:
         """Obtiene la ruta del registro correcta para un navegador."""
-        if browser in BrowserManager.BROWSER_PATHS:
-            # Intentar obtener la primera ruta de registro válida
-            for reg_path in BrowserManager.BROWSER_PATHS[browser]['reg_paths']:
-                if BrowserManager.check_registry_paths([reg_path]):
-                    # Eliminar 'SOFTWARE\' del inicio de la ruta
-                    return reg_path.replace('SOFTWARE\\', '', 1)
-        return ""
+        # Ruta sin 'SOFTWARE\' del inicio, resuelta por el inventario
+        entry = BrowserManager.get_inventory().get(browser)
+        return entry['browser_path'] if entry else ""
 
     @staticmethod
+    @traced('browser.discover', 'browser')
+    def discover_installations(timeout: float = 2.0) -> Dict:
+        """Descubre todas las instalaciones del catálogo (HKLM 64/32 bits, HKCU y carpetas).
+
+        Retorna ``installations`` (sin duplicados, con las fuentes que vieron
+        cada una), ``sources`` (estado, hallazgos y ms por fuente) y ``total_ms``.
+        """
+        return BrowserDiscovery(timeout=timeout).discover()
+
+    CONFIG_FIELDS = SAVED_FIELDS + ('last_update',)
+
+    @staticmethod
+    @traced('browser.check_previous_config', 'browser')
     def check_previous_config() -> Tuple[bool, Dict[str, Dict]]:
         """Verifica si existe una configuración previa y la retorna"""
+        backend = RegistryManager.get_backend()
         try:
-            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, BrowserManager.SPEEDCHROME_REG_PATH, 0, 
-                              winreg.KEY_READ | winreg.KEY_WOW64_64KEY) as key:
-                # Leer la última configuración
-                config = {}
-                for browser in BrowserManager.BROWSER_PATHS:
-                    try:
-                        with winreg.OpenKey(key, browser, 0, winreg.KEY_READ) as browser_key:
-                            config[browser] = {
-                                'memory_limit': winreg.QueryValueEx(browser_key, 'memory_limit')[0],
-                                'disable_preload': winreg.QueryValueEx(browser_key, 'disable_preload')[0],
-                                'disable_hardware': winreg.QueryValueEx(browser_key, 'disable_hardware')[0],
-                                'last_update': winreg.QueryValueEx(browser_key, 'last_update')[0]
-                            }
-                    except WindowsError:
-                        continue
-                return True, config
-        except WindowsError:
+            if not backend.key_exists(BrowserManager.SPEEDCHROME_REG_PATH):
+                return False, {}
+            # Leer la última configuración
+            config = {}
+            for browser in BrowserManager.BROWSER_PATHS:
+                values = backend.read_values(
+                    f"{BrowserManager.SPEEDCHROME_REG_PATH}\\{browser}",
+                    BrowserManager.CONFIG_FIELDS
+                )
+                # Solo cuentan las configuraciones guardadas por SpeedChrome; las
+                # optimizaciones que no existían al guardarlas quedan desactivadas (0)
+                if not values or 'last_update' not in values:
+                    continue
+                config[browser] = {
+                    name: values[name][0] if name in values else 0
+                    for name in BrowserManager.CONFIG_FIELDS
+                }
+            return True, config
+        except Exception as e:
+            logging.error(f"Error al leer configuración previa: {e}")
             return False, {}
 
     @staticmethod
-    def save_config(browser: str, config: Dict) -> bool:
-        """Guarda la configuración aplicada"""
-        try:
-            # Crear clave principal si no existe
-            key = winreg.CreateKeyEx(winreg.HKEY_LOCAL_MACHINE, BrowserManager.SPEEDCHROME_REG_PATH, 0, 
-                                   winreg.KEY_WRITE | winreg.KEY_WOW64_64KEY)
-            
-            # Crear subclave para el navegador
-            browser_key = winreg.CreateKeyEx(key, browser, 0, winreg.KEY_WRITE)
-            
-            # Guardar configuración
-            for name, value in config.items():
-                winreg.SetValueEx(browser_key, name, 0, winreg.REG_DWORD, value)
-            
-            # Agregar timestamp
-            timestamp = int(datetime.now().timestamp())
-            winreg.SetValueEx(browser_key, 'last_update', 0, winreg.REG_DWORD, timestamp)
-            
+    @traced('browser.save_config', 'browser', arg_index=0, arg_name='browser')
+    def save_config(browser: str, config: Dict,
+                    transaction: Optional[RegistryTransaction] = None) -> bool:
+        """Guarda la configuración aplicada.
+
+        Si se pasa ``transaction`` los valores se encolan en ese lote y se
+        confirman junto con el resto de cambios; si no, se escriben en un lote
+        propio.
+        """
+        tx = transaction if transaction is not None else RegistryManager.transaction()
+        browser_key = f"{BrowserManager.SPEEDCHROME_REG_PATH}\\{browser}"
+
+        # Guardar configuración
+        for name, value in config.items():
+            tx.set_value(browser_key, name, value)
+
+        # Agregar timestamp
+        timestamp = int(time.time())
+        tx.set_value(browser_key, 'last_update', timestamp)
+
+        if transaction is not None:
             return True
-        except Exception as e:
-            logging.error(f"Error al guardar configuración: {e}")
+        if not tx.commit():
+            logging.error(f"Error al guardar configuración de {browser}")
             return False
+        return True
 
     @staticmethod
-    def kill_browsers(selected_browsers: List[str]) -> Dict[str, bool]:
-        """Cierra los navegadores seleccionados."""
-        results = {}
-        for browser in selected_browsers:
-            if browser in BrowserManager.BROWSER_PATHS:
-                process_name = BrowserManager.BROWSER_PATHS[browser]['process']
-                try:
-                    killed = False
-                    for proc in psutil.process_iter(['name']):
-                        if proc.info['name'].lower() == process_name.lower():
-                            proc.kill()
-                            killed = True
-                    results[browser] = killed
-                except Exception as e:
-                    logging.error(f"Error al cerrar {browser}: {e}")
-                    results[browser] = False
-        return results 
\ No newline at end of file
+    @traced('browser.restart', 'browser')
+    def restart_browsers(selected_browsers: List[str], grace: float = 10.0,
+                         ready_timeout: float = 30.0,
+                         users: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Cierra con normalidad, relanza con la sesión anterior y mide el tiempo hasta estar listo.
+
+        Ver ``BrowserRestarter``: por navegador retorna los procesos cerrados
+        con normalidad y forzados y, por cada ventana principal relanzada,
+        los segundos hasta la primera ventana, hasta la memoria estable y el
+        corte total. Con ``users`` solo se reinician los navegadores de esos
+        usuarios.
+        """
+        from browser_restart import BrowserRestarter
+
+        executables = {}
+        for record in BrowserManager.discover_installations()['installations']:
+            if record['executable'] and record['browser'] not in executables:
+                executables[record['browser']] = record['executable']
+        restarter = BrowserRestarter(BrowserManager.BROWSER_PATHS, executables,
+                                     grace=grace, ready_timeout=ready_timeout,
+                                     matcher=BrowserManager.get_matcher())
+        return restarter.restart(selected_browsers, users=users)
+
+    @staticmethod
+    @traced('browser.kill', 'browser')
+    def kill_browsers(selected_browsers: List[str], timeout: float = 3.0,
+                      snapshot: Optional['ProcessSnapshot'] = None,
+                      users: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Cierra los navegadores seleccionados.
+
+        Usa una única foto de la tabla de procesos para todos los navegadores.
+        Primero se cierran los procesos raíz de todos ellos y se espera en
+        paralelo con ``psutil.wait_procs``; luego se cierran los hijos que
+        sigan vivos. Retorna por navegador: procesos encontrados, cerrados,
+        restantes, segundos hasta que desapareció el último y ``by_user``
+        (procesos encontrados de cada usuario). Cada árbol cuenta solo para
+        el navegador en cuya carpeta está su ejecutable (``get_matcher``):
+        cerrar Chrome Canary no cierra Chrome. Con ``users`` solo se
+        cierran los árboles cuya raíz es de esos usuarios; las demás
+        sesiones no se tocan.
+        """
+        # psutil se importa aquí para no cargarlo al abrir la interfaz
+        import psutil
+        from process_utils import ProcessSnapshot, kill_processes
+        from sessions import OwnerResolver, UNKNOWN_USER
+
+        start = time.perf_counter()
+        targets = [browser for browser in selected_browsers if browser in BrowserManager.BROWSER_PATHS]
+        results = {
+            browser: {'found': 0, 'terminated': 0, 'remaining': 0, 'elapsed': 0.0, 'by_user': {}}
+            for browser in targets
+        }
+        try:
+            matcher = BrowserManager.get_matcher()
+            if snapshot is None:
+                snapshot = ProcessSnapshot.capture(matcher.names(targets))
+        except Exception as e:
+            logging.error(f"Error al enumerar procesos: {e}")
+            return results
+
+        owner = {}
+        roots, children = [], []
+        resolver = OwnerResolver()
+        for browser in targets:
+            # Cada árbol es de un solo navegador (los canales comparten
+            # ejecutable) y de un usuario: el de su raíz
+            for root, user in resolver.owned(matcher.roots(snapshot, browser), users):
+                by_user = results[browser]['by_user']
+                for pid in [root.pid, *snapshot.descendants(root.pid)]:
+                    if pid in owner or pid not in snapshot.processes:
+                        continue
+                    owner[pid] = browser
+                    results[browser]['found'] += 1
+                    by_user[user or UNKNOWN_USER] = by_user.get(user or UNKNOWN_USER, 0) + 1
+                    (roots if pid == root.pid else children).append(snapshot.processes[pid])
+
+        def on_gone(proc):
+            result = results[owner[proc.pid]]
+            result['terminated'] += 1
+            result['elapsed'] = time.perf_counter() - start
+
+        # Raíces primero: al morir el proceso principal los hijos suelen salir solos
+        psutil.wait_procs(kill_processes(roots, on_gone), timeout=timeout, callback=on_gone)
+
+        pending = []
+        for proc in children:
+            try:
+                if proc.is_running():
+                    pending.append(proc)
+                    continue
+            except psutil.Error:
+                pass
+            on_gone(proc)
+        psutil.wait_procs(kill_processes(pending, on_gone), timeout=timeout, callback=on_gone)
+
+        for browser, result in results.items():
+            result['remaining'] = result['found'] - result['terminated']
+            if result['remaining']:
+                logging.error(f"{browser}: {result['remaining']} procesos siguen en ejecución")
+        return results
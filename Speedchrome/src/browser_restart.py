@@ -0,0 +1,344 @@
+import os
+import sys
+import time
+import logging
+import subprocess
+from typing import Callable, Dict, List, Optional
+import psutil
+from process_utils import BrowserMatcher, ProcessSnapshot, kill_processes
+from sessions import OwnerResolver, UNKNOWN_USER, current_user, interactive_user, user_key
+from instrumentation import traced
+
+# Argumentos del proceso principal que se conservan al relanzar (perfil elegido)
+KEPT_ARGS = ('--user-data-dir=', '--profile-directory=')
+RESTORE_ARG = '--restore-last-session'
+
+WM_CLOSE = 0x0010
+
+
+def _visible_windows(pids: set) -> List[int]:
+    """Ventanas de nivel superior visibles de los procesos indicados (solo Windows)."""
+    if sys.platform != 'win32':
+        return []
+    import ctypes
+    from ctypes import wintypes
+
+    user32 = ctypes.windll.user32
+    windows = []
+
+    @ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+    def callback(hwnd, _):
+        pid = wintypes.DWORD()
+        user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        if pid.value in pids and user32.IsWindowVisible(hwnd):
+            windows.append(hwnd)
+        return True
+
+    user32.EnumWindows(callback, 0)
+    return windows
+
+
+def request_close(proc: psutil.Process) -> bool:
+    """Pide al proceso principal que se cierre como lo haría el usuario.
+
+    En Windows se envía WM_CLOSE a sus ventanas (``terminate`` sería un
+    TerminateProcess); en POSIX, SIGTERM, que Chromium atiende guardando la
+    sesión. Retorna False si no hubo a quién pedírselo.
+    """
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            windows = _visible_windows({proc.pid})
+            for hwnd in windows:
+                ctypes.windll.user32.PostMessageW(hwnd, WM_CLOSE, 0, 0)
+            return bool(windows)
+        proc.terminate()
+        return True
+    except psutil.NoSuchProcess:
+        return False
+    except psutil.AccessDenied as e:
+        logging.error(f"Acceso denegado al cerrar PID {proc.pid}: {e}")
+        return False
+
+
+def relaunch_command(executable: str, cmdline: Optional[List[str]]) -> List[str]:
+    """Línea de comandos para volver a abrir el navegador con la sesión anterior."""
+    kept = [arg for arg in (cmdline or [])[1:] if arg.startswith(KEPT_ARGS)]
+    return [executable, *kept, RESTORE_ARG]
+
+
+def launch_options(user: Optional[str]) -> Optional[Dict]:
+    """Argumentos extra de ``Popen`` para abrir el navegador como ``user``.
+
+    Vacío si SpeedChrome ya corre con esa cuenta. Como root (sudo) se baja
+    a su uid, gid y grupos con su entorno (HOME, USER, bus de la sesión);
+    None si no se puede.
+    """
+    if sys.platform == 'win32' or not user or os.geteuid() != 0:
+        return {}
+    if user_key(user) == user_key(current_user()):
+        return {}
+    import pwd
+    try:
+        entry = pwd.getpwnam(user)
+    except KeyError:
+        logging.error(f"No se encontró el usuario {user} para relanzar el navegador")
+        return None
+    env = {key: value for key, value in os.environ.items() if not key.startswith('SUDO_')}
+    env.update(HOME=entry.pw_dir, USER=entry.pw_name, LOGNAME=entry.pw_name)
+    runtime = f'/run/user/{entry.pw_uid}'
+    if os.path.isdir(runtime):
+        env['XDG_RUNTIME_DIR'] = runtime
+        if os.path.exists(os.path.join(runtime, 'bus')):
+            env['DBUS_SESSION_BUS_ADDRESS'] = f'unix:path={runtime}/bus'
+    return {
+        'user': entry.pw_uid,
+        'group': entry.pw_gid,
+        'extra_groups': os.getgrouplist(entry.pw_name, entry.pw_gid),
+        'env': env,
+        'cwd': entry.pw_dir if os.path.isdir(entry.pw_dir) else '/',
+    }
+
+
+def _launch(command: List[str], **options) -> subprocess.Popen:
+    """Lanza el navegador desacoplado de SpeedChrome (sigue abierto al salir)."""
+    kwargs = {'stdin': subprocess.DEVNULL, 'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
+    if sys.platform == 'win32':
+        kwargs['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs['start_new_session'] = True
+    return subprocess.Popen(command, close_fds=True, **kwargs, **options)
+
+
+def _tree(pid: int) -> List[psutil.Process]:
+    try:
+        root = psutil.Process(pid)
+        return [root] + root.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return []
+
+
+def _tree_rss(processes: List[psutil.Process]) -> int:
+    total = 0
+    for proc in processes:
+        try:
+            total += proc.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return total
+
+
+def _has_window(processes: List[psutil.Process]) -> bool:
+    """Primera ventana visible (Windows) o primer renderizador (otros sistemas)."""
+    if sys.platform == 'win32':
+        return bool(_visible_windows({proc.pid for proc in processes}))
+    from process_utils import get_process_type
+    for proc in processes:
+        try:
+            if get_process_type(proc.cmdline()) == 'renderer':
+                return True
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return False
+
+
+def wait_until_ready(pid: int, timeout: float = 30.0, interval: float = 0.25,
+                     window: int = 4, tolerance: float = 0.05,
+                     clock: Callable[[], float] = time.perf_counter) -> Dict:
+    """Espera a que el navegador relanzado muestre su ventana y su memoria se estabilice.
+
+    La memoria se considera estable cuando las últimas ``window`` muestras
+    del árbol de procesos varían menos de ``tolerance``. Retorna los
+    segundos hasta la primera ventana y hasta la memoria estable (None si
+    no se alcanzaron antes de ``timeout``) y la memoria estable en bytes.
+    """
+    start = clock()
+    result = {'first_window': None, 'steady': None, 'steady_rss': 0}
+    samples: List[int] = []
+    while clock() - start < timeout:
+        processes = _tree(pid)
+        if not processes:
+            break
+        elapsed = clock() - start
+        if result['first_window'] is None and _has_window(processes):
+            result['first_window'] = elapsed
+        samples.append(_tree_rss(processes))
+        recent = samples[-window:]
+        if (result['first_window'] is not None and len(recent) == window
+                and max(recent) - min(recent) <= tolerance * max(recent)):
+            result['steady'] = elapsed
+            result['steady_rss'] = recent[-1]
+            break
+        time.sleep(interval)
+    return result
+
+
+class BrowserRestarter:
+    """Reinicia navegadores con el menor corte posible.
+
+    1. Pide el cierre normal a los procesos principales de todos los
+       navegadores a la vez (la sesión queda guardada como cerrada bien).
+    2. Espera a todo el árbol de procesos hasta ``grace`` segundos y solo
+       fuerza (kill) a los que sigan vivos.
+    3. Vuelve a abrir cada navegador desde su ejecutable instalado con
+       ``--restore-last-session`` y mide el tiempo hasta la primera ventana
+       y hasta que la memoria se estabiliza.
+
+    Los navegadores de otros usuarios (otras sesiones de un servidor de
+    terminales) se cierran pero no se relanzan: abrirlos desde aquí los
+    dejaría en la sesión y con la cuenta de SpeedChrome. Su usuario los
+    vuelve a abrir con la sesión restaurada. Los de quien ejecuta
+    SpeedChrome (con sudo, quien lo llamó) se relanzan con su cuenta; si no
+    se pueden relanzar no se cierran.
+
+    Cada árbol es del navegador cuyo ejecutable lo abrió (``BrowserMatcher``):
+    con solo Chrome Beta seleccionado, un Chrome estable abierto no se toca.
+    """
+
+    def __init__(self, browser_paths: Dict[str, Dict], executables: Dict[str, str],
+                 grace: float = 10.0, force_timeout: float = 3.0, ready_timeout: float = 30.0,
+                 launcher: Callable[..., subprocess.Popen] = _launch,
+                 matcher: Optional[BrowserMatcher] = None, user: Optional[str] = None):
+        self.browser_paths = browser_paths
+        self.executables = executables
+        if matcher is None:
+            # Sin inventario: las carpetas instaladas son las de los ejecutables
+            matcher = BrowserMatcher(browser_paths, {
+                browser: {'install_location': os.path.dirname(executable)}
+                for browser, executable in executables.items()
+            })
+        self.matcher = matcher
+        self.grace = grace
+        self.force_timeout = force_timeout
+        self.ready_timeout = ready_timeout
+        self.launcher = launcher
+        self.user = user or interactive_user()
+        self.launch_options = launch_options(self.user)
+
+    @traced('restart.close', 'process')
+    def close(self, selected_browsers: List[str], snapshot: Optional[ProcessSnapshot] = None,
+              users: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Cierra los navegadores; retorna por navegador el resultado y cómo relanzarlo.
+
+        Con ``users`` solo se cierran los de esos usuarios. ``by_user``
+        cuenta las ventanas principales de cada usuario y ``other_sessions``
+        las de otros usuarios, que no se relanzan. ``kept`` cuenta las propias
+        que quedaron abiertas porque no se podían relanzar.
+        """
+        start = time.perf_counter()
+        me = user_key(self.user)
+        browsers = [browser for browser in selected_browsers if browser in self.browser_paths]
+        results = {
+            browser: {'found': 0, 'graceful': 0, 'forced': 0, 'remaining': 0,
+                      'close_seconds': 0.0, 'relaunch': [], 'by_user': {}, 'other_sessions': 0, 'kept': 0}
+            for browser in browsers
+        }
+        if snapshot is None:
+            snapshot = ProcessSnapshot.capture(self.matcher.names(browsers))
+
+        owner: Dict[int, str] = {}
+        tree: List[psutil.Process] = []
+        forced = set()
+        resolver = OwnerResolver()
+        for browser in browsers:
+            for root, user in resolver.owned(self.matcher.roots(snapshot, browser), users):
+                by_user = results[browser]['by_user']
+                by_user[user or UNKNOWN_USER] = by_user.get(user or UNKNOWN_USER, 0) + 1
+                if me and user is not None and user_key(user) != me:
+                    results[browser]['other_sessions'] += 1
+                else:
+                    try:
+                        cmdline = root.cmdline()
+                    except psutil.Error:
+                        cmdline = None
+                    if self.launch_options is None or self._executable(browser, cmdline) is None:
+                        logging.warning(f"{browser} (PID {root.pid}) no se puede relanzar: no se cierra")
+                        results[browser]['kept'] += 1
+                        continue
+                    results[browser]['relaunch'].append(cmdline)
+                for pid in [root.pid, *snapshot.descendants(root.pid)]:
+                    if pid in snapshot.processes and pid not in owner:
+                        owner[pid] = browser
+                        tree.append(snapshot.processes[pid])
+                if not request_close(root):
+                    # Sin ventanas (en segundo plano) no hay sesión que guardar
+                    forced.add(root.pid)
+        for pid, browser in owner.items():
+            results[browser]['found'] += 1
+
+        def on_gone(proc):
+            result = results[owner[proc.pid]]
+            result['forced' if proc.pid in forced else 'graceful'] += 1
+            result['close_seconds'] = time.perf_counter() - start
+
+        kill_processes([snapshot.processes[pid] for pid in forced])
+        # Cierre normal: el proceso principal cierra sus hijos al terminar
+        _, alive = psutil.wait_procs(tree, timeout=self.grace, callback=on_gone)
+        if alive:
+            logging.info(f"{len(alive)} procesos no cerraron en {self.grace:g}s: se fuerzan")
+            forced.update(proc.pid for proc in alive)
+            psutil.wait_procs(kill_processes(alive, on_gone), timeout=self.force_timeout,
+                              callback=on_gone)
+
+        for browser, result in results.items():
+            result['remaining'] = result['found'] - result['graceful'] - result['forced']
+            if result['remaining']:
+                logging.error(f"{browser}: {result['remaining']} procesos siguen en ejecución")
+        return results
+
+    @traced('restart.relaunch', 'process', arg_index=1, arg_name='browser')
+    def relaunch(self, browser: str, cmdline: Optional[List[str]]) -> Dict:
+        """Vuelve a abrir un navegador y mide cuánto tarda en estar listo."""
+        executable = self._executable(browser, cmdline)
+        if executable is None:
+            return {'relaunched': False, 'error': "No se encontró el ejecutable instalado"}
+        if self.launch_options is None:
+            return {'relaunched': False, 'error': f"No se puede abrir como {self.user}"}
+        try:
+            process = self.launcher(relaunch_command(executable, cmdline), **self.launch_options)
+        except OSError as e:
+            return {'relaunched': False, 'error': str(e)}
+        launched = time.perf_counter()
+        ready = wait_until_ready(process.pid, timeout=self.ready_timeout)
+        return {
+            'relaunched': True,
+            'pid': process.pid,
+            'launched': launched,
+            'first_window_seconds': ready['first_window'],
+            'steady_seconds': ready['steady'],
+            'steady_rss_mb': ready['steady_rss'] / (1024 * 1024),
+        }
+
+    def _executable(self, browser: str, cmdline: Optional[List[str]]) -> Optional[str]:
+        executable = self.executables.get(browser) or (cmdline[0] if cmdline else None)
+        return executable if executable and os.path.isfile(executable) else None
+
+    def restart(self, selected_browsers: List[str], snapshot: Optional[ProcessSnapshot] = None,
+                users: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Cierra y vuelve a abrir los navegadores que estaban en ejecución.
+
+        ``downtime_seconds`` va desde el pedido de cierre hasta la primera
+        ventana del navegador relanzado.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        start = time.perf_counter()
+        results = self.close(selected_browsers, snapshot, users)
+        launches = [
+            (browser, cmdline) for browser, result in results.items()
+            if not result['remaining'] for cmdline in result['relaunch']
+        ]
+        for result in results.values():
+            result['launches'] = []
+        if launches:
+            with ThreadPoolExecutor(max_workers=len(launches),
+                                    thread_name_prefix='speedchrome-restart') as pool:
+                for (browser, _), launch in zip(launches, pool.map(lambda item: self.relaunch(*item),
+                                                                   launches)):
+                    launched = launch.pop('launched', None)
+                    if launch.get('first_window_seconds') is not None:
+                        launch['downtime_seconds'] = launched - start + launch['first_window_seconds']
+                    results[browser]['launches'].append(launch)
+        for result in results.values():
+            result['relaunch'] = len(result['relaunch'])
+        return results
@@ -0,0 +1,541 @@
+import sys
+import json
+import logging
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+# Interfaz de línea de comandos sin ventana: para scripts, tareas programadas
+# y herramientas de gestión (Intune, Ansible, GPO de inicio de sesión).
+# Nunca importa tkinter y carga el resto de módulos solo en el comando que
+# los necesita, para que ``detect`` responda en pocos milisegundos.
+#
+# La salida es un único documento JSON en stdout; los mensajes de log van a
+# stderr.
+
+EXIT_OK = 0
+EXIT_FAILED = 1          # algún navegador no se pudo planificar, aplicar o restaurar
+EXIT_USAGE = 2           # argumentos o perfil inválidos (mismo código que argparse)
+EXIT_NOT_ADMIN = 3       # faltan permisos para escribir el registro
+EXIT_NO_BROWSERS = 4     # ningún navegador del perfil está instalado
+EXIT_CHANGES = 5         # --detailed-exitcode / --check / watch --once: cambios pendientes o deriva
+
+
+def load_profile(path: str) -> Tuple[Optional[List[str]], Dict]:
+    """Lee un perfil JSON o TOML; retorna (navegadores, opciones).
+
+    Formato::
+
+        {"browsers": ["Chrome", "Edge"],      # o "installed" (por defecto)
+         "options": {"memory_limit": 4, "disable_hardware": false}}
+
+    Los valores van en la unidad que muestra la interfaz (GB, MB, procesos).
+    ``-`` lee JSON de la entrada estándar. Lanza ValueError si el perfil no
+    es válido.
+    """
+    from optimizations import parse_options
+
+    try:
+        if path == '-':
+            profile = json.load(sys.stdin)
+        elif path.lower().endswith('.toml'):
+            try:
+                import tomllib
+            except ImportError:
+                raise ValueError("Los perfiles TOML requieren Python 3.11 o superior")
+            with open(path, 'rb') as f:
+                profile = tomllib.load(f)
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                profile = json.load(f)
+    except OSError as e:
+        raise ValueError(f"No se pudo leer el perfil {path}: {e}")
+    except ValueError as e:
+        # json.JSONDecodeError y tomllib.TOMLDecodeError derivan de ValueError
+        raise ValueError(f"Perfil inválido {path}: {e}")
+
+    if not isinstance(profile, dict):
+        raise ValueError("El perfil debe ser un objeto con 'browsers' y 'options'")
+    unknown = set(profile) - {'browsers', 'options'}
+    if unknown:
+        raise ValueError(f"Campos desconocidos en el perfil: {', '.join(sorted(unknown))}")
+
+    browsers = profile.get('browsers', 'installed')
+    if browsers == 'installed':
+        browsers = None
+    elif not isinstance(browsers, list) or not all(isinstance(b, str) for b in browsers):
+        raise ValueError("'browsers' debe ser una lista de nombres o \"installed\"")
+
+    options = profile.get('options', {})
+    if not isinstance(options, dict):
+        raise ValueError("'options' debe ser un objeto")
+    return browsers, parse_options(options)
+
+
+def resolve_browsers(requested: Optional[List[str]]) -> Tuple[List[str], List[str]]:
+    """(instalados a procesar, pedidos que no están instalados).
+
+    Sin ``requested`` se usan todos los instalados. Lanza ValueError si se
+    pide un navegador que no está en el catálogo.
+    """
+    from browser_manager import BrowserManager
+
+    installed = BrowserManager.detect_installed_browsers()
+    if requested is None:
+        return [browser for browser, found in installed.items() if found], []
+    unknown = [browser for browser in requested if browser not in installed]
+    if unknown:
+        raise ValueError(
+            f"Navegadores desconocidos: {', '.join(unknown)} "
+            f"(disponibles: {', '.join(installed)})"
+        )
+    return ([browser for browser in requested if installed[browser]],
+            [browser for browser in requested if not installed[browser]])
+
+
+def resolve_users(args) -> Optional[List[Dict]]:
+    """Usuarios de ``--per-user``/``--users`` (None: valores del equipo en HKLM).
+
+    Lanza ValueError si no hay ningún usuario con sesión o si se nombra uno sin sesión.
+    """
+    if not args.per_user and not args.users:
+        return None
+    from sessions import logged_on_users, select_users
+
+    names = [name for name in args.users.split(',') if name] if args.users else None
+    users = select_users(logged_on_users(), names)
+    if not users:
+        raise ValueError("No hay usuarios con sesión y colmena cargada")
+    return users
+
+
+def _plan(args) -> Tuple[int, Dict]:
+    from apply_planner import plan_changes
+
+    requested, options = load_profile(args.profile)
+    browsers, missing = resolve_browsers(requested)
+    users = resolve_users(args)
+    output = {'browsers': browsers, 'missing': missing, 'plans': []}
+    if users is not None:
+        output['users'] = [user['user'] for user in users]
+    if not browsers:
+        return EXIT_NO_BROWSERS, output
+    output['plans'] = plan_changes(browsers, options, users)
+    output['changes'] = sum(len(plan['writes']) for plan in output['plans'])
+    output['restart'] = any(plan['restart'] for plan in output['plans'])
+    return EXIT_OK, output
+
+
+def cmd_detect(args) -> Tuple[int, Dict]:
+    from browser_manager import BrowserManager
+
+    installed = BrowserManager.detect_installed_browsers()
+    output = {'browsers': installed}
+    if args.discover:
+        output['discovery'] = BrowserManager.discover_installations()
+    code = EXIT_OK if any(installed.values()) else EXIT_NO_BROWSERS
+    return code, output
+
+
+def cmd_plan(args) -> Tuple[int, Dict]:
+    code, output = _plan(args)
+    if code != EXIT_OK:
+        return code, output
+    if any(plan.get('error') for plan in output['plans']):
+        return EXIT_FAILED, output
+    pending = any(plan['writes'] or plan['config'] for plan in output['plans'])
+    return (EXIT_CHANGES if args.detailed_exitcode and pending else EXIT_OK), output
+
+
+def cmd_apply(args) -> Tuple[int, Dict]:
+    from registry_utils import is_admin
+    from apply_planner import apply_plan
+
+    if not is_admin():
+        return EXIT_NOT_ADMIN, {'error': "Se requieren permisos de administrador"}
+    code, output = _plan(args)
+    if code != EXIT_OK:
+        return code, output
+
+    # Por navegador, o por navegador y usuario con --per-user
+    results = {}
+    statuses = []
+    for plan in output['plans']:
+        applied = apply_plan(plan)
+        if plan.get('error') or applied is False:
+            status = 'failed'
+        else:
+            status = 'unchanged' if applied is None else 'applied'
+        statuses.append(status)
+        if plan['user'] is None:
+            results[plan['browser']] = status
+        else:
+            results.setdefault(plan['browser'], {})[plan['user']] = status
+    output['results'] = results
+
+    if args.restart:
+        from browser_manager import BrowserManager
+
+        # Solo los navegadores (y usuarios) cuyos cambios necesitan reiniciar
+        restart = [plan for plan, status in zip(output['plans'], statuses)
+                   if plan['restart'] and status == 'applied']
+        pending = list(dict.fromkeys(plan['browser'] for plan in restart))
+        users = None
+        if 'users' in output:
+            users = list(dict.fromkeys(plan['user'] for plan in restart))
+        elif not args.all_sessions:
+            # Valores del equipo: solo la sesión de quien ejecuta, salvo --all-sessions
+            from sessions import interactive_user
+            user = interactive_user()
+            users = [user] if user else None
+        if pending:
+            output['restarted'] = BrowserManager.restart_browsers(pending, grace=args.grace, users=users)
+    return (EXIT_FAILED if 'failed' in statuses else EXIT_OK), output
+
+
+def cmd_restore(args) -> Tuple[int, Dict]:
+    from registry_utils import is_admin
+    from browser_manager import BrowserManager
+
+    if not is_admin():
+        return EXIT_NOT_ADMIN, {'error': "Se requieren permisos de administrador"}
+    browsers = args.browsers
+    if not browsers:
+        # Sin argumentos: los navegadores con configuración guardada
+        _, config = BrowserManager.check_previous_config()
+        browsers = list(config)
+    unknown = [browser for browser in browsers if browser not in BrowserManager.BROWSER_PATHS]
+    if unknown:
+        raise ValueError(f"Navegadores desconocidos: {', '.join(unknown)}")
+    results = {browser: BrowserManager.restore_original(browser) for browser in browsers}
+    return (EXIT_OK if all(results.values()) else EXIT_FAILED), {'restored': results}
+
+
+def cmd_status(args) -> Tuple[int, Dict]:
+    """Configuración guardada, historial y deriva (valores cambiados por otros)."""
+    from browser_manager import BrowserManager
+    from apply_planner import plan_browser
+    from optimizations import options_from_config
+
+    _, config = BrowserManager.check_previous_config()
+    browsers = {}
+    drifted = False
+    for browser, saved in config.items():
+        # Volver a planificar la configuración guardada: lo que habría que
+        # escribir es lo que se modificó desde fuera desde el último apply
+        plan = plan_browser(browser, options_from_config(saved))
+        drift = [{key: write[key] for key in ('option', 'key_path', 'name', 'current', 'desired')}
+                 for write in plan['writes']]
+        drifted = drifted or bool(drift) or bool(plan.get('error'))
+        browsers[browser] = {'config': saved, 'drift': drift}
+        if plan.get('error'):
+            browsers[browser]['error'] = plan['error']
+
+    output = {'browsers': browsers}
+    try:
+        output['generations'] = BrowserManager.get_journal().generations(limit=args.history)
+    except Exception as e:
+        logging.error(f"No se pudo leer el historial: {e}")
+        output['generations'] = []
+    return (EXIT_CHANGES if args.check and drifted else EXIT_OK), output
+
+
+def cmd_processes(args) -> Tuple[int, Dict]:
+    """Memoria y CPU por tipo de proceso de los navegadores en ejecución."""
+    import time
+    from browser_manager import BrowserManager
+    from process_attribution import ProcessAttributor
+
+    unknown = [browser for browser in args.browsers if browser not in BrowserManager.BROWSER_PATHS]
+    if unknown:
+        raise ValueError(f"Navegadores desconocidos: {', '.join(unknown)}")
+    attributor = ProcessAttributor(args.browsers or None, top=args.top)
+    # El % de CPU necesita dos muestras
+    attributor.sample(uss=args.uss)
+    time.sleep(args.interval)
+    result = attributor.sample(uss=args.uss)
+    return (EXIT_OK if result['browsers'] else EXIT_NO_BROWSERS), result
+
+
+def cmd_extensions(args) -> Tuple[int, Dict]:
+    """Extensiones instaladas de cada perfil, ordenadas por costo."""
+    import time
+    from browser_manager import BrowserManager
+    from extension_profiler import ExtensionProfiler
+
+    unknown = [browser for browser in args.browsers if browser not in BrowserManager.BROWSER_PATHS]
+    if unknown:
+        raise ValueError(f"Navegadores desconocidos: {', '.join(unknown)}")
+    profiler = ExtensionProfiler(args.browsers or None, workers=args.workers)
+    # El % de CPU necesita dos muestras
+    profiler.profile(uss=args.uss)
+    time.sleep(args.interval)
+    result = profiler.profile(uss=args.uss)
+    if not args.all:
+        result['extensions'] = [ext for ext in result['extensions'] if ext['enabled']]
+    return (EXIT_OK if result['browsers'] else EXIT_NO_BROWSERS), result
+
+
+def cmd_sessions(args) -> Tuple[int, Dict]:
+    """Usuarios con sesión y memoria de sus navegadores (todo el equipo)."""
+    import time
+    from process_attribution import ProcessAttributor
+    from sessions import logged_on_users, user_summary
+
+    users = logged_on_users()
+    # Una sola pasada por la tabla de procesos para todos los usuarios
+    attributor = ProcessAttributor(top=0)
+    # El % de CPU necesita dos muestras
+    attributor.sample(uss=args.uss)
+    time.sleep(args.interval)
+    # Con los registros por proceso cada PID se suma una sola vez
+    result = attributor.sample(uss=args.uss, records=True)
+    return EXIT_OK, {'timestamp': result['timestamp'], 'uss': args.uss, 'users': users,
+                     'memory': user_summary(result)}
+
+
+def cmd_watch(args) -> Tuple[int, Dict]:
+    """Vigila las claves administradas y corrige la deriva (modo servicio).
+
+    Cada corrección se escribe en stdout como una línea JSON en el momento;
+    al terminar (SIGINT/SIGTERM o ``--duration``) se escribe el resumen.
+    """
+    import signal
+    from registry_utils import is_admin
+    from browser_manager import BrowserManager
+    from drift_watchdog import DriftWatchdog
+
+    if not is_admin():
+        return EXIT_NOT_ADMIN, {'error': "Se requieren permisos de administrador"}
+    _, config = BrowserManager.check_previous_config()
+    if not config:
+        return EXIT_NO_BROWSERS, {'error': "No hay configuración guardada; aplique un perfil primero"}
+
+    def report(event):
+        sys.stdout.write(json.dumps(event, ensure_ascii=False, default=str) + '\n')
+        sys.stdout.flush()
+
+    watchdog = DriftWatchdog(debounce=args.debounce, on_repair=report)
+    if args.once:
+        events = watchdog.check()
+        watchdog.notifier.close()
+        code = EXIT_CHANGES if events else EXIT_OK
+        return code, {'browsers': list(config), 'repairs': events}
+
+    def on_signal(signum, frame):
+        watchdog.stop(timeout=0)
+
+    for name in ('SIGINT', 'SIGTERM'):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), on_signal)
+    watchdog.run(duration=args.duration)
+    return EXIT_OK, {'browsers': list(config), 'cycles': watchdog.cycles,
+                     'repaired': watchdog.repaired}
+
+
+def cmd_schedule(args) -> Tuple[int, Dict]:
+    """Baja la prioridad de los procesos en segundo plano (modo servicio).
+
+    Cada cambio se escribe en stdout como una línea JSON; al terminar se
+    restauran las prioridades y se escribe el resumen.
+    """
+    import signal
+    from browser_manager import BrowserManager
+    from priority_scheduler import PriorityScheduler, load_policy
+
+    unknown = [browser for browser in args.browsers if browser not in BrowserManager.BROWSER_PATHS]
+    if unknown:
+        raise ValueError(f"Navegadores desconocidos: {', '.join(unknown)}")
+    policy = load_policy(args.policy)
+
+    def report(change):
+        sys.stdout.write(json.dumps(change, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+
+    scheduler = PriorityScheduler(policy, args.browsers or None, interval=args.interval,
+                                  dry_run=args.dry_run)
+
+    def on_signal(signum, frame):
+        scheduler.stop(timeout=0)
+
+    for name in ('SIGINT', 'SIGTERM'):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), on_signal)
+    scheduler.run(duration=args.duration, on_change=report)
+    return EXIT_OK, {'policy': policy}
+
+
+def cmd_limit(args) -> Tuple[int, Dict]:
+    """Hace cumplir límites de memoria y CPU con cgroups o Job Objects (modo servicio).
+
+    Sin ``--memory`` se usa el límite de memoria guardado de cada navegador.
+    Cada evento de memoria del contenedor se escribe en stdout como una
+    línea JSON; al terminar se quitan los límites y se escribe el resumen.
+    """
+    import signal
+    from resource_limits import ResourceLimiter
+
+    if args.memory is not None:
+        if args.memory <= 0:
+            raise ValueError("--memory debe ser mayor que 0")
+        browsers, _ = resolve_browsers(args.browsers or None)
+        limits = {browser: {'memory_max': int(args.memory * 1024 ** 3), 'cpu_percent': args.cpu}
+                  for browser in browsers}
+    else:
+        limits = ResourceLimiter.load_limits(args.cpu)
+        if args.browsers:
+            limits = {browser: limit for browser, limit in limits.items() if browser in args.browsers}
+    if not limits:
+        return EXIT_NO_BROWSERS, {'error': "No hay límites: indique --memory o aplique un perfil primero"}
+
+    events = []
+
+    def report(event):
+        events.append(event)
+        sys.stdout.write(json.dumps(event, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+
+    limiter = ResourceLimiter(limits, interval=args.interval, on_event=report)
+    active = limiter.setup()
+    if not any(active.values()):
+        limiter.release()
+        return EXIT_FAILED, {'limits': limits, 'active': active}
+
+    def on_signal(signum, frame):
+        limiter.stop(timeout=0)
+
+    for name in ('SIGINT', 'SIGTERM'):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), on_signal)
+    limiter.run(duration=args.duration)
+    return EXIT_OK, {'limits': limits, 'active': active, 'events': len(events)}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='speedchrome',
+        description="SpeedChrome sin interfaz: detecta, planifica, aplica y restaura optimizaciones.",
+    )
+    parser.add_argument('--pretty', action='store_true', help="JSON indentado")
+    parser.add_argument('-v', '--verbose', action='store_true', help="log detallado en stderr")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    detect = commands.add_parser('detect', help="navegadores instalados")
+    detect.add_argument('--discover', action='store_true',
+                        help="incluye todas las instalaciones (registro y carpetas)")
+    detect.set_defaults(func=cmd_detect)
+
+    plan = commands.add_parser('plan', help="cambios que haría un perfil, sin escribir")
+    plan.add_argument('profile', help="perfil .json o .toml (- para stdin)")
+    plan.add_argument('--detailed-exitcode', action='store_true',
+                      help=f"termina con {EXIT_CHANGES} si hay cambios pendientes")
+    plan.set_defaults(func=cmd_plan)
+
+    apply = commands.add_parser('apply', help="aplica un perfil")
+    apply.add_argument('profile', help="perfil .json o .toml (- para stdin)")
+    apply.add_argument('--restart', action='store_true',
+                       help="reinicia los navegadores cuyos cambios lo requieren")
+    apply.add_argument('--all-sessions', action='store_true',
+                       help="con --restart y sin --per-user, reinicia también los navegadores "
+                            "de las demás sesiones (por defecto, solo los de quien ejecuta)")
+    apply.add_argument('--grace', type=float, default=10.0,
+                       help="segundos para el cierre normal antes de forzar")
+    apply.set_defaults(func=cmd_apply)
+    for command in (plan, apply):
+        command.add_argument('--per-user', action='store_true',
+                             help="escribe en la colmena de cada usuario con sesión en lugar de HKLM")
+        command.add_argument('--users', default=None,
+                             help="solo estos usuarios, separados por comas (implica --per-user)")
+
+    restore = commands.add_parser('restore', help="vuelve a los valores previos a SpeedChrome")
+    restore.add_argument('browsers', nargs='*',
+                         help="navegadores (por defecto, los que tienen configuración guardada)")
+    restore.set_defaults(func=cmd_restore)
+
+    status = commands.add_parser('status', help="configuración guardada, historial y deriva")
+    status.add_argument('--check', action='store_true',
+                        help=f"termina con {EXIT_CHANGES} si algún valor cambió desde fuera")
+    status.add_argument('--history', type=int, default=10,
+                        help="generaciones del historial a mostrar")
+    status.set_defaults(func=cmd_status)
+
+    processes = commands.add_parser('processes', help="memoria y CPU por tipo de proceso")
+    processes.add_argument('browsers', nargs='*', help="navegadores (por defecto, todos)")
+    processes.add_argument('--uss', action='store_true',
+                           help="mide la memoria exclusiva (USS); más lento")
+    processes.add_argument('--top', type=int, default=10, help="procesos principales por navegador")
+    processes.add_argument('--interval', type=float, default=1.0,
+                           help="segundos entre las dos muestras del %% de CPU")
+    processes.set_defaults(func=cmd_processes)
+
+    extensions = commands.add_parser('extensions', help="extensiones por perfil, ordenadas por costo")
+    extensions.add_argument('browsers', nargs='*', help="navegadores (por defecto, los instalados)")
+    extensions.add_argument('--uss', action='store_true',
+                            help="mide la memoria exclusiva (USS); más lento")
+    extensions.add_argument('--all', action='store_true', help="incluye las deshabilitadas")
+    extensions.add_argument('--interval', type=float, default=1.0,
+                            help="segundos entre las dos muestras del %% de CPU")
+    extensions.add_argument('--workers', type=int, default=8, help="perfiles leídos en paralelo")
+    extensions.set_defaults(func=cmd_extensions)
+
+    sessions = commands.add_parser('sessions', help="usuarios con sesión y memoria de sus navegadores")
+    sessions.add_argument('--uss', action='store_true',
+                          help="mide la memoria exclusiva (USS); más lento")
+    sessions.add_argument('--interval', type=float, default=1.0,
+                          help="segundos entre las dos muestras del %% de CPU")
+    sessions.set_defaults(func=cmd_sessions)
+
+    schedule = commands.add_parser('schedule',
+                                   help="baja la prioridad de CPU y E/S de los procesos en segundo plano")
+    schedule.add_argument('browsers', nargs='*', help="navegadores (por defecto, todos)")
+    schedule.add_argument('--policy', default=None,
+                          help="política JSON (por defecto, scheduler_policy.json en el directorio de datos)")
+    schedule.add_argument('--interval', type=float, default=2.0, help="segundos entre revisiones")
+    schedule.add_argument('--duration', type=float, default=None,
+                          help="segundos a ejecutar (por defecto, hasta SIGINT/SIGTERM)")
+    schedule.add_argument('--dry-run', action='store_true', help="solo informar, no cambiar prioridades")
+    schedule.set_defaults(func=cmd_schedule)
+
+    limit = commands.add_parser('limit',
+                                help="límites estrictos de memoria y CPU (cgroup v2 / Job Object)")
+    limit.add_argument('browsers', nargs='*', help="navegadores (por defecto, todos)")
+    limit.add_argument('--memory', type=float, default=None,
+                       help="GB por navegador (por defecto, el límite guardado)")
+    limit.add_argument('--cpu', type=float, default=None,
+                       help="tope de CPU en %% de un núcleo (por defecto, sin tope)")
+    limit.add_argument('--interval', type=float, default=2.0, help="segundos entre revisiones")
+    limit.add_argument('--duration', type=float, default=None,
+                       help="segundos a ejecutar (por defecto, hasta SIGINT/SIGTERM)")
+    limit.set_defaults(func=cmd_limit)
+
+    watch = commands.add_parser('watch', help="vuelve a aplicar la configuración guardada si cambia")
+    watch.add_argument('--debounce', type=float, default=2.0,
+                       help="segundos sin cambios nuevos antes de corregir")
+    watch.add_argument('--duration', type=float, default=None,
+                       help="segundos a vigilar (por defecto, hasta SIGINT/SIGTERM)")
+    watch.add_argument('--once', action='store_true',
+                       help=f"corrige una vez y termina ({EXIT_CHANGES} si hubo deriva)")
+    watch.set_defaults(func=cmd_watch)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        stream=sys.stderr,
+    )
+    try:
+        code, output = args.func(args)
+    except ValueError as e:
+        logging.error(str(e))
+        code, output = EXIT_USAGE, {'error': str(e)}
+    output['exit_code'] = code
+    json.dump(output, sys.stdout, indent=2 if args.pretty else None,
+              ensure_ascii=False, default=str)
+    sys.stdout.write('\n')
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+from registry_utils import RegistryManager, RegValue
+from instrumentation import traced
+
+# (colmena, ruta, nombre, antes, después); None = el valor no existía / se borra
+Change = Tuple[str, str, str, Optional[RegValue], Optional[RegValue]]
+
+
+def _split(value: Optional[RegValue]) -> Tuple[object, Optional[int]]:
+    return (None, None) if value is None else (value[0], value[1])
+
+
+def _join(data: object, value_type: Optional[int]) -> Optional[RegValue]:
+    return None if value_type is None else (data, value_type)
+
+
+def checksum(browser: str, created: float, kind: str, changes: List[Change]) -> str:
+    """Suma SHA-256 de una generación (independiente del orden de los cambios)."""
+    payload = json.dumps(
+        [browser, created, kind, sorted(
+            [hive, key_path, name, list(_split(before)), list(_split(after))]
+            for hive, key_path, name, before, after in changes
+        )],
+        separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ConfigJournal:
+    """Historial de solo-agregado de los valores de registro que escribe SpeedChrome.
+
+    Cada aplicación es una *generación* con los valores antes y después de
+    cada nombre escrito y una suma SHA-256 que se verifica al revertirla.
+    Las generaciones se indexan por navegador y fecha; los cambios por
+    generación (clave primaria), así que revertir una generación es una
+    consulta por índice y un único lote de escritura.
+
+    La primera vez que se toca un valor su contenido anterior queda además
+    en ``originals``: ``restore_original`` devuelve el navegador al estado
+    previo a SpeedChrome aunque el historial ya se haya compactado.
+
+    Cuando el archivo pasa de ``max_bytes`` se conservan las últimas
+    ``keep_generations`` por navegador y, si hace falta, se descartan las
+    más antiguas hasta bajar de la mitad de ``max_bytes`` (siempre queda la
+    última de cada navegador). Si lo que queda no se puede descartar, la
+    próxima compactación espera a que el archivo crezca otra media cuota.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024, keep_generations: int = 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.keep_generations = keep_generations
+        # Tamaño a partir del cual se compacta
+        self._compact_at = max_bytes
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL: cada generación es un agregado secuencial, sin reescribir el archivo
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, browser TEXT NOT NULL,"
+            " created REAL NOT NULL, kind TEXT NOT NULL, checksum TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS generations_browser ON generations (browser, created);"
+            "CREATE TABLE IF NOT EXISTS changes ("
+            " generation INTEGER NOT NULL, hive TEXT NOT NULL, key_path TEXT NOT NULL,"
+            " name TEXT NOT NULL, before_data, before_type INTEGER, after_data, after_type INTEGER,"
+            " PRIMARY KEY (generation, hive, key_path, name)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS originals ("
+            " browser TEXT NOT NULL, hive TEXT NOT NULL, key_path TEXT NOT NULL,"
+            " name TEXT NOT NULL, data, type INTEGER,"
+            " PRIMARY KEY (browser, hive, key_path, name)) WITHOUT ROWID;"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    @traced('journal.record', 'registry', arg_index=1, arg_name='browser')
+    def record(self, browser: str, changes: List[Change], kind: str = 'apply') -> Optional[int]:
+        """Agrega una generación y retorna su id (None si no había cambios)."""
+        if not changes:
+            return None
+        created = time.time()
+        digest = checksum(browser, created, kind, changes)
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO generations (browser, created, kind, checksum) VALUES (?, ?, ?, ?)",
+                    (browser, created, kind, digest)
+                )
+                generation = cursor.lastrowid
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO changes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(generation, hive, key_path, name, *_split(before), *_split(after))
+                     for hive, key_path, name, before, after in changes]
+                )
+                # Solo el primer valor anterior visto cuenta como original
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO originals VALUES (?, ?, ?, ?, ?, ?)",
+                    [(browser, hive, key_path, name, *_split(before))
+                     for hive, key_path, name, before, _ in changes]
+                )
+            if self._used() > self._compact_at:
+                self._compact()
+        return generation
+
+    def generations(self, browser: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Generaciones más recientes primero (de un navegador o de todos)."""
+        query = "SELECT id, browser, created, kind, checksum FROM generations"
+        params: tuple = ()
+        if browser is not None:
+            query += " WHERE browser = ?"
+            params = (browser,)
+        query += " ORDER BY created DESC, id DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, params + (limit,)).fetchall()
+        return [
+            {'id': row[0], 'browser': row[1], 'created': row[2], 'kind': row[3], 'checksum': row[4]}
+            for row in rows
+        ]
+
+    def load(self, generation: int) -> Optional[Tuple[Dict, List[Change]]]:
+        """Generación y sus cambios; None si no existe o su suma no coincide."""
+        with self._lock:
+            header = self._conn.execute(
+                "SELECT id, browser, created, kind, checksum FROM generations WHERE id = ?",
+                (generation,)
+            ).fetchone()
+            if header is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT hive, key_path, name, before_data, before_type, after_data, after_type"
+                " FROM changes WHERE generation = ?", (generation,)
+            ).fetchall()
+        changes = [
+            (hive, key_path, name, _join(before_data, before_type), _join(after_data, after_type))
+            for hive, key_path, name, before_data, before_type, after_data, after_type in rows
+        ]
+        info = {'id': header[0], 'browser': header[1], 'created': header[2],
+                'kind': header[3], 'checksum': header[4]}
+        if checksum(info['browser'], info['created'], info['kind'], changes) != info['checksum']:
+            logging.error(f"La generación {generation} del historial está dañada (suma no coincide)")
+            return None
+        return info, changes
+
+    def written(self, browser: str) -> Dict[Tuple[str, str, str], Dict[str, Optional[RegValue]]]:
+        """Por valor que SpeedChrome tocó del navegador: el original y el último escrito.
+
+        Las claves son (colmena, ruta, nombre) en minúsculas; cada entrada
+        tiene ``original`` (previo a SpeedChrome) y ``last`` (lo último que
+        escribió cualquier generación; None si lo borró).
+        """
+        with self._lock:
+            originals = self._conn.execute(
+                "SELECT hive, key_path, name, data, type FROM originals WHERE browser = ?",
+                (browser,)
+            ).fetchall()
+            changes = self._conn.execute(
+                "SELECT c.hive, c.key_path, c.name, c.after_data, c.after_type"
+                " FROM changes c JOIN generations g ON g.id = c.generation"
+                " WHERE g.browser = ? ORDER BY g.created, g.id", (browser,)
+            ).fetchall()
+        result = {}
+        for hive, key_path, name, data, value_type in originals:
+            original = _join(data, value_type)
+            result[(hive.lower(), key_path.lower(), name.lower())] = {'original': original,
+                                                                      'last': original}
+        for hive, key_path, name, data, value_type in changes:
+            entry = result.get((hive.lower(), key_path.lower(), name.lower()))
+            if entry is not None:
+                entry['last'] = _join(data, value_type)
+        return result
+
+    def rollback(self, generation: int) -> bool:
+        """Deshace una generación: vuelve a escribir los valores anteriores en un lote."""
+        loaded = self.load(generation)
+        if loaded is None:
+            return False
+        info, changes = loaded
+        return self._write_back(info['browser'], [
+            (hive, key_path, name, before) for hive, key_path, name, before, _ in changes
+        ], 'rollback')
+
+    def restore_original(self, browser: str) -> bool:
+        """Devuelve al valor previo a SpeedChrome todo lo que se tocó del navegador."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hive, key_path, name, data, type FROM originals WHERE browser = ?",
+                (browser,)
+            ).fetchall()
+        if not rows:
+            return True
+        return self._write_back(browser, [
+            (hive, key_path, name, _join(data, value_type))
+            for hive, key_path, name, data, value_type in rows
+        ], 'restore')
+
+    def _write_back(self, browser: str, values: List[Tuple[str, str, str, Optional[RegValue]]],
+                    kind: str) -> bool:
+        tx = RegistryManager.transaction()
+        for hive, key_path, name, value in values:
+            if value is None:
+                tx.delete_value(key_path, name, hive=hive)
+            else:
+                tx.set_value(key_path, name, value[0], value[1], hive=hive)
+        if not tx.commit():
+            return False
+        # La reversión también queda en el historial (y puede revertirse)
+        self.record(browser, tx.changes, kind)
+        return True
+
+    def size(self) -> int:
+        total = 0
+        for path in (self.path, self.path + '-wal'):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def compact(self) -> None:
+        """Descarta las generaciones viejas y reduce el archivo."""
+        with self._lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        before = size = self._used()
+        target = self.max_bytes // 2
+        deleted = self._delete_generations(
+            "SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+            " PARTITION BY browser ORDER BY created DESC, id DESC) AS age FROM generations)"
+            " WHERE age > ?", (self.keep_generations,)
+        )
+        if deleted:
+            size = self._vacuum()
+        while size > target:
+            # El archivo solo se achica con VACUUM: se estima cuántos cambios
+            # descartar por el tamaño medio de cada fila
+            rows = self._conn.execute(
+                "SELECT (SELECT COUNT(*) FROM changes) + (SELECT COUNT(*) FROM originals)"
+            ).fetchone()[0]
+            excess = (size - target) * max(rows, 1) // size + 1
+            candidates = self._conn.execute(
+                "SELECT g.id, (SELECT COUNT(*) FROM changes WHERE generation = g.id) FROM ("
+                " SELECT id, created, ROW_NUMBER() OVER ("
+                "  PARTITION BY browser ORDER BY created DESC, id DESC) AS age FROM generations) g"
+                " WHERE g.age > 1 ORDER BY g.created, g.id"
+            ).fetchall()
+            oldest = []
+            for generation, changes in candidates:
+                oldest.append(generation)
+                excess -= changes
+                if excess <= 0:
+                    break
+            if not oldest:
+                break
+            deleted += self._delete_generations(', '.join('?' * len(oldest)), tuple(oldest))
+            size = self._vacuum()
+        # Lo que no se pudo descartar no vuelve a compactarse en cada escritura
+        self._compact_at = max(self.max_bytes, size + self.max_bytes - target)
+        if deleted:
+            logging.info(f"Historial de configuración compactado: {before} -> {size} bytes "
+                         f"({deleted} generaciones descartadas)")
+
+    def _delete_generations(self, ids_query: str, params: tuple) -> int:
+        """Borra las generaciones elegidas por ``ids_query`` y sus cambios."""
+        with self._conn:
+            deleted = self._conn.execute(
+                f"DELETE FROM generations WHERE id IN ({ids_query})", params
+            ).rowcount
+            if deleted:
+                self._conn.execute(
+                    "DELETE FROM changes WHERE generation NOT IN (SELECT id FROM generations)"
+                )
+        return deleted
+
+    def _vacuum(self) -> int:
+        self._conn.execute("VACUUM")
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return self._used()
+
+    def _used(self) -> int:
+        """Tamaño de la base, con lo que todavía está en el WAL.
+
+        El WAL no se achica al compactar: contarlo haría compactar en cada
+        escritura hasta el próximo checkpoint.
+        """
+        pages = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        return pages * self._conn.execute("PRAGMA page_size").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
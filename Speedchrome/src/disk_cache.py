@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional, Tuple
+from browser_discovery import BROWSER_CATALOG, browser_paths
+from instrumentation import traced
+
+# Carpetas de caché de cada perfil (relativas a la carpeta del perfil)
+CACHE_DIRS = ['Cache', 'Code Cache', 'GPUCache', os.path.join('Service Worker', 'CacheStorage')]
+
+
+def user_data_dir(entry: Dict) -> Optional[str]:
+    """Directorio de datos de usuario de un navegador del catálogo (o None)."""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA')
+        relative = entry.get('user_data_dir')
+    else:
+        base = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+        relative = entry.get('linux_user_data_dir')
+    if not base or not relative:
+        return None
+    return os.path.join(base, relative)
+
+
+def find_profiles(data_dir: str) -> List[str]:
+    """Perfiles de un directorio de datos: subcarpetas con un archivo Preferences."""
+    profiles = []
+    try:
+        with os.scandir(data_dir) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False) and os.path.isfile(
+                        os.path.join(entry.path, 'Preferences')):
+                    profiles.append(entry.path)
+    except OSError:
+        pass
+    return sorted(profiles)
+
+
+class DirectoryScanner:
+    """Suma tamaños de varios árboles de carpetas con ``os.scandir`` en paralelo.
+
+    Las carpetas pendientes van a una única cola compartida por ``workers``
+    hilos; cada hilo acumula en sus propios contadores (sin bloqueos) y los
+    totales se combinan al final. En Windows ``DirEntry.stat`` no hace
+    llamadas extra al sistema; en Linux es un ``lstat`` por archivo.
+    """
+
+    def __init__(self, workers: int = 8):
+        self.workers = workers
+
+    @traced('cache.scan', 'cache')
+    def scan(self, roots: List[str]) -> Dict[str, Dict[str, int]]:
+        """Retorna {raíz: {'bytes', 'files', 'dirs'}} para cada raíz."""
+        pending: queue.Queue = queue.Queue()
+        for index, root in enumerate(roots):
+            if os.path.isdir(root):
+                pending.put((index, root))
+        partials = []
+
+        def work():
+            # [bytes, archivos, carpetas] por raíz, solo de este hilo
+            totals = [[0, 0, 0] for _ in roots]
+            partials.append(totals)
+            while True:
+                item = pending.get()
+                if item is None:
+                    pending.task_done()
+                    return
+                index, path = item
+                counts = totals[index]
+                counts[2] += 1
+                try:
+                    with os.scandir(path) as entries:
+                        for entry in entries:
+                            try:
+                                if entry.is_dir(follow_symlinks=False):
+                                    pending.put((index, entry.path))
+                                else:
+                                    counts[0] += entry.stat(follow_symlinks=False).st_size
+                                    counts[1] += 1
+                            except OSError:
+                                continue
+                except OSError:
+                    pass
+                except Exception as e:
+                    # El hilo sigue atendiendo la cola: si muriera, join() no terminaría
+                    logging.error(f"Error al recorrer {path}: {e}")
+                finally:
+                    pending.task_done()
+
+        threads = [
+            threading.Thread(target=work, name=f'speedchrome-scan-{i}', daemon=True)
+            for i in range(max(1, self.workers))
+        ]
+        for thread in threads:
+            thread.start()
+        pending.join()
+        for _ in threads:
+            pending.put(None)
+        for thread in threads:
+            thread.join()
+
+        result = {root: {'bytes': 0, 'files': 0, 'dirs': 0} for root in roots}
+        for totals in partials:
+            for root, (size, files, dirs) in zip(roots, totals):
+                result[root]['bytes'] += size
+                result[root]['files'] += files
+                result[root]['dirs'] += dirs
+        return result
+
+
+def analyze(browsers: Optional[List[str]] = None, catalog: Optional[List[Dict]] = None,
+            workers: int = 8) -> Dict:
+    """Mide las cachés de todos los perfiles de los navegadores en una sola pasada.
+
+    Retorna por navegador su directorio de datos y, por perfil, el tamaño de
+    cada carpeta de caché; además totales y velocidad del recorrido.
+    """
+    catalog = catalog if catalog is not None else BROWSER_CATALOG
+    layout: List[Tuple[str, str, str, str]] = []
+    data_dirs = {}
+    for entry in catalog:
+        if browsers is not None and entry['id'] not in browsers:
+            continue
+        data_dir = user_data_dir(entry)
+        if not data_dir or not os.path.isdir(data_dir):
+            continue
+        data_dirs[entry['id']] = data_dir
+        for profile in find_profiles(data_dir):
+            for cache_dir in CACHE_DIRS:
+                layout.append((entry['id'], profile, cache_dir, os.path.join(profile, cache_dir)))
+
+    start = time.perf_counter()
+    sizes = DirectoryScanner(workers).scan([path for _, _, _, path in layout])
+    elapsed = time.perf_counter() - start
+
+    report: Dict[str, Dict] = {
+        browser: {'data_dir': data_dir, 'profiles': {}, 'bytes': 0, 'files': 0}
+        for browser, data_dir in data_dirs.items()
+    }
+    for browser, profile, cache_dir, path in layout:
+        size = sizes[path]
+        profiles = report[browser]['profiles']
+        profiles.setdefault(os.path.basename(profile), {})[cache_dir] = {
+            'path': path, 'bytes': size['bytes'], 'files': size['files'],
+        }
+        report[browser]['bytes'] += size['bytes']
+        report[browser]['files'] += size['files']
+
+    files = sum(size['files'] for size in sizes.values())
+    total = sum(size['bytes'] for size in sizes.values())
+    return {
+        'browsers': report,
+        'bytes': total,
+        'files': files,
+        'dirs': sum(size['dirs'] for size in sizes.values()),
+        'elapsed': elapsed,
+        'files_per_second': files / elapsed if elapsed else 0.0,
+    }
+
+
+def is_running(browser: str, data_dir: str, catalog: Optional[List[Dict]] = None) -> bool:
+    """True si el navegador parece estar en ejecución (proceso o bloqueo del perfil)."""
+    from process_utils import ProcessSnapshot, BrowserMatcher
+
+    if os.path.lexists(os.path.join(data_dir, 'SingletonLock')):
+        return True
+    lockfile = os.path.join(data_dir, 'lockfile')
+    if os.path.exists(lockfile):
+        # En Windows 'lockfile' queda tras un cierre normal; solo cuenta si está abierto
+        try:
+            with open(lockfile, 'a'):
+                pass
+        except PermissionError:
+            return True
+        except OSError:
+            pass
+    # Solo los procesos de este canal: Chrome abierto no bloquea la caché de Chrome Beta
+    matcher = BrowserMatcher(browser_paths(catalog if catalog is not None else BROWSER_CATALOG))
+    names = matcher.names([browser])
+    if not names:
+        return False
+    return bool(matcher.roots(ProcessSnapshot.capture(names), browser))
+
+
+def _clear_directory(path: str) -> None:
+    """Borra el contenido de la carpeta (no la carpeta: el navegador la espera)."""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.remove(entry.path)
+            except OSError as e:
+                logging.debug(f"No se pudo borrar {entry.path}: {e}")
+
+
+@traced('cache.purge', 'cache')
+def purge(analysis: Dict, browsers: Optional[List[str]] = None, workers: int = 8) -> Dict[str, Dict]:
+    """Vacía las cachés medidas en ``analysis`` de los navegadores que no están abiertos.
+
+    Retorna por navegador si se omitió (en ejecución) y los bytes liberados,
+    calculados volviendo a medir las carpetas después de borrar.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    results = {}
+    for browser, info in analysis['browsers'].items():
+        if browsers is not None and browser not in browsers:
+            continue
+        if is_running(browser, info['data_dir']):
+            results[browser] = {'skipped': True, 'reclaimed': 0}
+            logging.info(f"{browser} está en ejecución: no se vacía su caché")
+            continue
+        paths = [cache['path'] for caches in info['profiles'].values() for cache in caches.values()
+                 if cache['files']]
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='speedchrome-purge') as pool:
+            for path, error in zip(paths, pool.map(_safe_clear, paths)):
+                if error:
+                    logging.error(f"No se pudo vaciar {path}: {error}")
+        remaining = sum(size['bytes'] for size in DirectoryScanner(workers).scan(paths).values())
+        results[browser] = {'skipped': False, 'reclaimed': max(info['bytes'] - remaining, 0)}
+    return results
+
+
+def _safe_clear(path: str) -> Optional[str]:
+    try:
+        _clear_directory(path)
+    except OSError as e:
+        return str(e)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analiza y vacía la caché de disco de los navegadores")
+    parser.add_argument('browsers', nargs='*', help="Navegadores (por defecto, todos los encontrados)")
+    parser.add_argument('--purge', action='store_true',
+                        help="Vaciar la caché de los navegadores indicados que estén cerrados")
+    parser.add_argument('--workers', type=int, default=8, help="Hilos del recorrido")
+    args = parser.parse_args()
+    if args.purge and not args.browsers:
+        parser.error("--purge requiere indicar los navegadores")
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stderr)
+    analysis = analyze(args.browsers or None, workers=args.workers)
+    if args.purge:
+        analysis['purged'] = purge(analysis, workers=args.workers)
+    print(json.dumps(analysis, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+import os
+import sys
+import errno
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from registry_utils import (
+    RegistryBackend, RegistryManager, MemoryRegistryBackend, JsonFileRegistryBackend,
+    WinRegBackend, HKLM,
+    normalize_key_path,
+)
+from browser_manager import BrowserManager
+from browser_discovery import catalog_entry
+from apply_planner import plan_browser, apply_plan
+from optimizations import OPTIMIZATIONS, applies_to, options_from_config, registry_location
+from instrumentation import traced, count
+
+
+def watch_roots(targets: List[str], exists: Callable[[str], bool], separator: str,
+                nested: bool = True) -> Dict[str, Set[str]]:
+    """Ancestro existente más profundo de cada destino.
+
+    Retorna {ancestro: nombres hijos que llevan a los destinos} (vacío si el
+    destino existe). Con ``nested=False`` se descartan los ancestros que
+    quedan dentro de otro, para notificaciones que ya cubren subclaves.
+    """
+    roots: Dict[str, Set[str]] = {}
+    for target in targets:
+        parts = [part for part in target.split(separator) if part]
+        for depth in range(len(parts), 0, -1):
+            path = separator.join(parts[:depth])
+            if target.startswith(separator):
+                path = separator + path
+            if exists(path):
+                children = roots.setdefault(path, set())
+                if depth < len(parts):
+                    children.add(parts[depth])
+                break
+    if not nested:
+        lowered = {path.lower(): path for path in roots}
+        for path in list(roots):
+            parts = path.lower().split(separator)
+            if any(separator.join(parts[:depth]) in lowered for depth in range(1, len(parts))):
+                del roots[path]
+    return roots
+
+
+class ChangeNotifier:
+    """Espera cambios en las claves vigiladas sin sondear.
+
+    ``watch`` (re)arma la notificación; un cambio posterior queda pendiente
+    hasta que lo consume ``wait``.
+    """
+
+    def watch(self, key_paths: List[str]) -> None:
+        raise NotImplementedError
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Bloquea hasta un cambio (True) o hasta ``timeout``/``interrupt`` (False)."""
+        raise NotImplementedError
+
+    def interrupt(self) -> None:
+        """Despierta a ``wait`` desde otro hilo o desde un manejador de señales."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryNotifier(ChangeNotifier):
+    """Notificaciones del registro simulado: escrituras hechas con el mismo backend."""
+
+    def __init__(self, backend: MemoryRegistryBackend):
+        self.backend = backend
+        self._prefixes: Tuple[str, ...] = ()
+        self._cond = threading.Condition()
+        self._pending = False
+        self._interrupted = False
+        backend.add_listener(self._on_write)
+
+    def _on_write(self, hive: str, key_path: str) -> None:
+        key = f"{hive}\\{key_path}".lower()
+        if any(key == prefix or key.startswith(prefix + '\\') for prefix in self._prefixes):
+            with self._cond:
+                self._pending = True
+                self._cond.notify_all()
+
+    def watch(self, key_paths: List[str]) -> None:
+        # Como con REG_NOTIFY de subárbol: la clave y todo lo que cuelga de ella
+        self._prefixes = tuple(f"{HKLM}\\{normalize_key_path(path)}".lower() for path in key_paths)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._interrupted, timeout)
+            changed, self._pending, self._interrupted = self._pending, False, False
+            return changed
+
+    def interrupt(self) -> None:
+        with self._cond:
+            self._interrupted = True
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        self.backend.remove_listener(self._on_write)
+
+
+class RegistryNotifier(ChangeNotifier):
+    """RegNotifyChangeKeyValue sobre cada clave vigilada (con sus subclaves).
+
+    Todas las claves señalan el mismo evento; un segundo evento sirve para
+    despertar la espera al detenerse. Si una clave aún no existe se vigila
+    su ancestro existente más profundo, así también se ve su creación.
+    """
+
+    REG_NOTIFY_CHANGE_NAME = 0x00000001
+    REG_NOTIFY_CHANGE_LAST_SET = 0x00000004
+    REG_NOTIFY_THREAD_AGNOSTIC = 0x10000000
+    ERROR_INVALID_PARAMETER = 87
+    INFINITE = 0xFFFFFFFF
+
+    def __init__(self, backend: WinRegBackend):
+        import ctypes
+        from ctypes import wintypes
+
+        self.backend = backend
+        self._kernel32 = ctypes.windll.kernel32
+        self._advapi32 = ctypes.windll.advapi32
+        self._kernel32.CreateEventW.restype = wintypes.HANDLE
+        self._kernel32.CreateEventW.argtypes = [wintypes.LPVOID, wintypes.BOOL, wintypes.BOOL,
+                                                wintypes.LPCWSTR]
+        self._kernel32.SetEvent.argtypes = [wintypes.HANDLE]
+        self._kernel32.ResetEvent.argtypes = [wintypes.HANDLE]
+        self._kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+        self._kernel32.WaitForMultipleObjects.argtypes = [wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE),
+                                                          wintypes.BOOL, wintypes.DWORD]
+        self._kernel32.WaitForMultipleObjects.restype = wintypes.DWORD
+        self._advapi32.RegNotifyChangeKeyValue.argtypes = [wintypes.HKEY, wintypes.BOOL, wintypes.DWORD,
+                                                           wintypes.HANDLE, wintypes.BOOL]
+        self._advapi32.RegNotifyChangeKeyValue.restype = wintypes.LONG
+        # Eventos de reinicio automático: cambio y despertar
+        self._changed = self._kernel32.CreateEventW(None, False, False, None)
+        self._wake = self._kernel32.CreateEventW(None, False, False, None)
+        self._handles = (wintypes.HANDLE * 2)(self._changed, self._wake)
+        self._keys = []
+        self._thread_agnostic = True
+
+    def _close_keys(self) -> None:
+        for key in self._keys:
+            key.Close()
+        self._keys = []
+
+    def watch(self, key_paths: List[str]) -> None:
+        import winreg
+
+        # Cerrar una clave con una notificación pendiente señala el evento:
+        # se descarta antes de volver a armar
+        self._close_keys()
+        self._kernel32.ResetEvent(self._changed)
+        access = winreg.KEY_NOTIFY | winreg.KEY_WOW64_64KEY
+        for path in watch_roots(key_paths, self.backend.key_exists, '\\', nested=False):
+            try:
+                key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, path, 0, access)
+            except OSError as e:
+                logging.debug(f"No se puede vigilar {path}: {e}")
+                continue
+            filters = self.REG_NOTIFY_CHANGE_NAME | self.REG_NOTIFY_CHANGE_LAST_SET
+            result = self._notify(key, filters)
+            if result != 0:
+                logging.error(f"RegNotifyChangeKeyValue falló en {path} (código {result})")
+                key.Close()
+                continue
+            self._keys.append(key)
+
+    def _notify(self, key, filters: int) -> int:
+        # Sin REG_NOTIFY_THREAD_AGNOSTIC (Windows 7) la notificación muere con
+        # el hilo que la armó; el vigilante arma y espera siempre en el mismo
+        if self._thread_agnostic:
+            result = self._advapi32.RegNotifyChangeKeyValue(
+                key.handle, True, filters | self.REG_NOTIFY_THREAD_AGNOSTIC, self._changed, True)
+            if result != self.ERROR_INVALID_PARAMETER:
+                return result
+            self._thread_agnostic = False
+        return self._advapi32.RegNotifyChangeKeyValue(key.handle, True, filters, self._changed, True)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        milliseconds = self.INFINITE if timeout is None else int(timeout * 1000)
+        return self._kernel32.WaitForMultipleObjects(2, self._handles, False, milliseconds) == 0
+
+    def interrupt(self) -> None:
+        self._kernel32.SetEvent(self._wake)
+
+    def close(self) -> None:
+        self._close_keys()
+        for handle in (self._changed, self._wake):
+            self._kernel32.CloseHandle(handle)
+
+
+class InotifyNotifier(ChangeNotifier):
+    """inotify sobre las carpetas de los archivos que genera el backend de Linux.
+
+    En Linux las claves viven en el archivo de estado y se traducen a
+    políticas y flags, así que se vigilan esos archivos (``managed_files``)
+    en lugar de las claves. inotify no es recursivo: por cada archivo se
+    vigila su carpeta o, si aún no existe, el ancestro existente más
+    profundo, y solo despiertan los eventos de los nombres que llevan a él.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            | IN_DELETE_SELF | IN_MOVE_SELF)
+    # Eventos sobre la carpeta vigilada en sí: hay que volver a armar
+    SELF_EVENTS = IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED
+
+    def __init__(self, files: Callable[[], List[str]]):
+        import ctypes
+        import ctypes.util
+
+        self.files = files
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_write, False)
+        self._watches: Dict[str, int] = {}
+        self._names: Dict[int, Set[str]] = {}
+
+    def watch(self, key_paths: List[str]) -> None:
+        import ctypes
+
+        # Un archivo no es carpeta: su raíz es la carpeta que lo contiene
+        roots = watch_roots(self.files(), os.path.isdir, os.sep)
+        for directory in list(self._watches):
+            if directory not in roots:
+                self._libc.inotify_rm_watch(self._fd, self._watches.pop(directory))
+        self._names = {}
+        for directory, children in roots.items():
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                # La carpeta pudo desaparecer desde que se buscó: se verá en el próximo armado
+                log = logging.debug if error == errno.ENOENT else logging.error
+                log(f"No se puede vigilar {directory}: {os.strerror(error)}")
+                continue
+            self._watches[directory] = wd
+            self._names.setdefault(wd, set()).update(children)
+
+    def _relevant(self) -> bool:
+        import struct
+
+        relevant = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return relevant
+            offset = 0
+            while offset + 16 <= len(data):
+                wd, mask, _, length = struct.unpack_from('iIII', data, offset)
+                name = data[offset + 16:offset + 16 + length].split(b'\0', 1)[0]
+                offset += 16 + length
+                if mask & self.IN_Q_OVERFLOW:
+                    relevant = True
+                elif wd in self._names and (mask & self.SELF_EVENTS
+                                            or os.fsdecode(name) in self._names[wd]):
+                    relevant = True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        import select
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self._fd, self._wake_read], [], [], remaining)
+            if self._wake_read in readable:
+                os.read(self._wake_read, 512)
+                return False
+            if not readable:
+                return False
+            # Otras carpetas (p. ej. ~/.config) cambian a menudo: solo cuentan los nombres vigilados
+            if self._relevant():
+                return True
+
+    def interrupt(self) -> None:
+        try:
+            os.write(self._wake_write, b'\0')
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        for fd in (self._fd, self._wake_read, self._wake_write):
+            os.close(fd)
+
+
+def notifier_for(backend: RegistryBackend) -> ChangeNotifier:
+    """Notificador adecuado para el backend de registro activo."""
+    if isinstance(backend, WinRegBackend):
+        return RegistryNotifier(backend)
+    if sys.platform.startswith('linux'):
+        from linux_backend import LinuxPolicyBackend
+        if isinstance(backend, LinuxPolicyBackend):
+            return InotifyNotifier(backend.managed_files)
+        if isinstance(backend, JsonFileRegistryBackend):
+            # Registro simulado compartido entre procesos: se vigila su archivo
+            return InotifyNotifier(lambda: [backend.file_path])
+    if isinstance(backend, MemoryRegistryBackend):
+        return MemoryNotifier(backend)
+    raise ValueError(f"No hay notificaciones de cambios para {type(backend).__name__}")
+
+
+class DriftWatchdog:
+    """Vuelve a aplicar la configuración guardada cuando otro programa la cambia.
+
+    Las actualizaciones del navegador y otras herramientas de gestión
+    reescriben sus claves. En lugar de revisar periódicamente, el vigilante
+    se suscribe a las notificaciones de cambio de las claves que administra
+    (y de ``SOFTWARE\\SpeedChrome``, para seguir los cambios de
+    configuración) y duerme hasta que llega una: sin cambios no hay ningún
+    despertar.
+
+    Tras una notificación espera ``debounce`` segundos sin cambios nuevos
+    (como mucho ``max_delay``), de modo que una actualización que escribe
+    muchas claves, o un apply de la interfaz a medio escribir, se evalúa una
+    sola vez. Luego planifica de nuevo la configuración de
+    ``check_previous_config`` y escribe solo los valores que difieren. Si un
+    mismo valor se corrige más de ``max_repairs`` veces en ``repair_window``
+    segundos, otra herramienta lo está imponiendo: se deja de pelear por él
+    y se registra un error.
+    """
+
+    def __init__(self, notifier: Optional[ChangeNotifier] = None, debounce: float = 2.0,
+                 max_delay: float = 30.0, max_repairs: int = 5, repair_window: float = 3600.0,
+                 on_repair: Optional[Callable[[Dict], None]] = None):
+        self.backend = RegistryManager.get_backend()
+        self.notifier = notifier if notifier is not None else notifier_for(self.backend)
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_repairs = max_repairs
+        self.repair_window = repair_window
+        self.on_repair = on_repair
+        self.cycles = 0
+        self.repaired = 0
+        self._repairs: Dict[Tuple[str, str, str], List[float]] = {}
+        self._given_up: Set[Tuple[str, str, str]] = set()
+        self._targets: List[str] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def targets(self) -> List[str]:
+        """Claves que se vigilan: las de cada optimización del navegador y la de SpeedChrome.
+
+        Incluye las desactivadas, porque un valor viejo de SpeedChrome que
+        reaparece también se corrige.
+        """
+        keys = {BrowserManager.SPEEDCHROME_REG_PATH}
+        _, config = BrowserManager.check_previous_config()
+        for browser in config:
+            browser_path = BrowserManager.get_browser_path(browser)
+            if not browser_path:
+                continue
+            entry = catalog_entry(browser)
+            for opt in OPTIMIZATIONS:
+                if applies_to(opt, entry):
+                    keys.add(registry_location(opt, browser_path, entry)[0])
+        return sorted(keys)
+
+    def _allow(self, browser: str, write: Dict, now: float) -> bool:
+        key = (browser, write['key_path'], write['name'])
+        recent = [stamp for stamp in self._repairs.get(key, []) if now - stamp < self.repair_window]
+        if len(recent) >= self.max_repairs:
+            if key not in self._given_up:
+                self._given_up.add(key)
+                logging.error(
+                    f"{browser}: {write['key_path']}\\{write['name']} se corrigió {len(recent)} veces "
+                    f"en {self.repair_window:g}s; otra herramienta lo impone, se deja de corregir"
+                )
+            self._repairs[key] = recent
+            return False
+        self._given_up.discard(key)
+        recent.append(now)
+        self._repairs[key] = recent
+        return True
+
+    @traced('drift.check', 'drift')
+    def check(self) -> List[Dict]:
+        """Compara con la configuración guardada y corrige solo lo que cambió."""
+        self.backend.reload()
+        _, config = BrowserManager.check_previous_config()
+        now = time.monotonic()
+        events = []
+        for browser, saved in config.items():
+            plan = plan_browser(browser, options_from_config(saved))
+            if plan.get('error'):
+                continue
+            # La configuración guardada es la referencia: no se reescribe
+            plan['config'] = {}
+            plan['writes'] = [write for write in plan['writes'] if self._allow(browser, write, now)]
+            if not plan['writes']:
+                continue
+            applied = apply_plan(plan, kind='drift')
+            for write in plan['writes']:
+                events.append({'browser': browser, 'key_path': write['key_path'],
+                               'name': write['name'], 'found': write['current'],
+                               'restored': write['desired'], 'ok': bool(applied)})
+        try:
+            for path in self.backend.repair():
+                events.append({'file': path, 'ok': True})
+        except OSError as e:
+            logging.error(f"No se pudieron regenerar los archivos de políticas: {e}")
+        count('drift.repaired', len(events))
+        return events
+
+    def _settle(self) -> None:
+        """Espera hasta ``debounce`` segundos sin cambios (como mucho ``max_delay``)."""
+        limit = time.monotonic() + self.max_delay
+        while not self._stop.is_set():
+            remaining = limit - time.monotonic()
+            if remaining <= 0:
+                return
+            # Las notificaciones del registro son de un solo disparo
+            self.notifier.watch(self._targets)
+            if not self.notifier.wait(min(self.debounce, remaining)):
+                return
+
+    def _cycle(self) -> None:
+        # Armar antes de revisar: lo que cambie durante la revisión no se pierde
+        self._targets = self.targets()
+        self.notifier.watch(self._targets)
+        self.cycles += 1
+        for event in self.check():
+            if event['ok']:
+                self.repaired += 1
+            target = event.get('file') or f"{event['browser']}: {event['key_path']}\\{event['name']}"
+            logging.info(f"Deriva corregida en {target}")
+            if self.on_repair:
+                self.on_repair(event)
+
+    def run(self, duration: Optional[float] = None) -> None:
+        """Corrige lo pendiente y luego atiende notificaciones hasta ``stop`` o ``duration``."""
+        deadline = time.monotonic() + duration if duration else None
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._cycle()
+                except Exception as e:
+                    logging.error(f"Error en el vigilante de configuración: {e}")
+                while not self._stop.is_set():
+                    timeout = None if deadline is None else deadline - time.monotonic()
+                    if timeout is not None and timeout <= 0:
+                        return
+                    if self.notifier.wait(timeout):
+                        self._settle()
+                        break
+        finally:
+            self.notifier.close()
+
+    def start(self) -> None:
+        """Inicia el vigilante en un hilo en segundo plano."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='speedchrome-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self.notifier.interrupt()
+        if self._thread:
+            self._thread.join(timeout)
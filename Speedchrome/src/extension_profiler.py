@@ -0,0 +1,308 @@
+import os
+import json
+import time
+import logging
+import psutil
+from typing import Callable, Dict, List, Optional, Tuple
+from browser_discovery import BROWSER_CATALOG, catalog_entry
+from disk_cache import user_data_dir, find_profiles
+from json_stream import iter_members
+from process_attribution import ProcessAttributor
+from instrumentation import traced, count
+
+# Archivos de un perfil con ``extensions.settings``; desde hace varias
+# versiones la mayoría de las extensiones están en Secure Preferences
+PREFERENCES_FILES = ('Preferences', 'Secure Preferences')
+
+# Origen de la instalación (``location`` en las preferencias)
+EXTENSION_LOCATIONS = {
+    1: 'webstore', 2: 'external_pref', 3: 'external_registry', 4: 'unpacked',
+    5: 'component', 6: 'external_pref_download', 7: 'policy_download',
+    8: 'command_line', 9: 'policy', 10: 'external_component',
+}
+# Extensiones internas del navegador (visor de PDF, etc.): no se listan
+COMPONENT_LOCATIONS = {5, 10}
+
+# Patrones con los que una extensión inyecta scripts en todas las páginas
+ALL_URLS_PATTERNS = {'<all_urls>', '*://*/*', 'http://*/*', 'https://*/*'}
+
+
+@traced('extensions.read_settings', 'extensions', arg_index=0, arg_name='path')
+def read_extension_settings(path: str) -> Dict[str, Dict]:
+    """``extensions.settings`` de un archivo de preferencias, leído por partes.
+
+    Retorna {} si el archivo no existe o no es válido.
+    """
+    settings = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for extension_id, values in iter_members(f, ('extensions', 'settings')):
+                if isinstance(values, dict):
+                    settings[extension_id] = values
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logging.warning(f"No se pudieron leer las extensiones de {path}: {e}")
+    return settings
+
+
+def _load_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except (OSError, ValueError):
+        return None
+
+
+def _extension_dir(profile: str, extension_id: str, settings: Dict) -> Optional[str]:
+    """Carpeta instalada de una extensión (la versión más reciente si no se indica)."""
+    path = settings.get('path')
+    if isinstance(path, str) and path:
+        # Relativa a <perfil>/Extensions, o absoluta para las desempaquetadas
+        return os.path.join(profile, 'Extensions', path)
+    base = os.path.join(profile, 'Extensions', extension_id)
+    try:
+        versions = sorted(os.listdir(base))
+    except OSError:
+        return None
+    return os.path.join(base, versions[-1]) if versions else None
+
+
+def _localized(value: str, directory: Optional[str], manifest: Dict) -> str:
+    """Resuelve un nombre ``__MSG_clave__`` con los mensajes del idioma por defecto."""
+    if not value.startswith('__MSG_') or not value.endswith('__') or directory is None:
+        return value
+    locale = manifest.get('default_locale') or 'en'
+    messages = _load_json(os.path.join(directory, '_locales', locale, 'messages.json')) or {}
+    key = value[len('__MSG_'):-2].lower()
+    for name, entry in messages.items():
+        if name.lower() == key and isinstance(entry, dict) and entry.get('message'):
+            return entry['message']
+    return value
+
+
+def describe_extension(profile: str, extension_id: str, settings: Dict) -> Optional[Dict]:
+    """Datos de una extensión de ``extensions.settings`` (None si es interna)."""
+    location = settings.get('location')
+    if location in COMPONENT_LOCATIONS:
+        return None
+    directory = _extension_dir(profile, extension_id, settings)
+    manifest = settings.get('manifest')
+    if not isinstance(manifest, dict):
+        manifest = _load_json(os.path.join(directory, 'manifest.json')) if directory else None
+        manifest = manifest or {}
+
+    reasons = settings.get('disable_reasons')
+    enabled = not reasons and settings.get('state', 1) != 0
+
+    background = None
+    declared = manifest.get('background')
+    if isinstance(declared, dict):
+        if declared.get('service_worker'):
+            background = 'service_worker'
+        elif declared.get('page') or declared.get('scripts'):
+            # En MV2 la página de fondo es persistente salvo que diga lo contrario
+            background = 'persistent' if declared.get('persistent', True) else 'event'
+    elif isinstance(manifest.get('app'), dict) and manifest['app'].get('background'):
+        background = 'app'
+
+    all_urls = any(
+        pattern in ALL_URLS_PATTERNS
+        for script in manifest.get('content_scripts') or [] if isinstance(script, dict)
+        for pattern in script.get('matches') or []
+    )
+    name = manifest.get('name') or extension_id
+    return {
+        'id': extension_id,
+        'name': _localized(name, directory, manifest) if isinstance(name, str) else extension_id,
+        'version': manifest.get('version'),
+        'profile': os.path.basename(profile),
+        'enabled': enabled,
+        'location': EXTENSION_LOCATIONS.get(location, 'unknown'),
+        'background': background,
+        'all_urls': all_urls,
+    }
+
+
+class ExtensionProfiler:
+    """Extensiones instaladas por perfil y lo que cuestan sus procesos.
+
+    Las preferencias de cada perfil (``Preferences`` y ``Secure
+    Preferences``) se leen en paralelo y por partes: solo se decodifica
+    ``extensions.settings``, una extensión por vez. Lo leído se reutiliza
+    mientras el archivo no cambie.
+
+    Los procesos de extensión de Chromium (``--extension-process``) no dicen
+    a qué extensión pertenecen. Solo cuentan las extensiones activas con
+    contexto de fondo de los perfiles abiertos (``--profile-directory`` del
+    proceso principal o, sin él, el último perfil usado). Si hay una sola,
+    su costo es exacto (``attribution='exact'``). Con varias, la memoria y
+    la CPU de todos los procesos de extensión se reparten en partes iguales
+    entre ellas (``attribution='shared'``): es una estimación, y la cantidad
+    de procesos compartidos va en ``shared_processes``.
+    """
+
+    def __init__(self, browsers: Optional[List[str]] = None, catalog: Optional[List[Dict]] = None,
+                 workers: int = 8, process_iter: Callable = psutil.process_iter):
+        self.catalog = catalog if catalog is not None else BROWSER_CATALOG
+        if browsers is None:
+            from browser_manager import BrowserManager
+            browsers = [browser for browser, ok in BrowserManager.detect_installed_browsers().items() if ok]
+        self.entries = [entry for entry in (catalog_entry(b, self.catalog) for b in browsers) if entry]
+        self.workers = workers
+        # El atribuidor asigna cada raíz a un solo canal (por la carpeta del ejecutable)
+        self.attributor = ProcessAttributor([entry['id'] for entry in self.entries],
+                                            process_iter=process_iter)
+        self._parsed: Dict[str, Tuple[Tuple[int, int], Dict]] = {}
+        self._root_dirs: Dict[Tuple[int, float], Tuple[Optional[str], Optional[str]]] = {}
+
+    def _read_cached(self, path: str) -> Dict[str, Dict]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return {}
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self._parsed.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        settings = read_extension_settings(path)
+        self._parsed[path] = (stamp, settings)
+        return settings
+
+    def _read_profile(self, profile: str) -> List[Dict]:
+        merged: Dict[str, Dict] = {}
+        for name in PREFERENCES_FILES:
+            for extension_id, settings in self._read_cached(os.path.join(profile, name)).items():
+                merged.setdefault(extension_id, {}).update(settings)
+        extensions = []
+        for extension_id, settings in merged.items():
+            info = describe_extension(profile, extension_id, settings)
+            if info is not None:
+                extensions.append(info)
+        return extensions
+
+    @traced('extensions.installed', 'extensions')
+    def installed(self) -> Dict[str, Dict]:
+        """Por navegador: directorio de datos, perfiles y extensiones de cada uno."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        layout = []
+        result = {}
+        for entry in self.entries:
+            data_dir = user_data_dir(entry)
+            if not data_dir or not os.path.isdir(data_dir):
+                continue
+            profiles = find_profiles(data_dir)
+            result[entry['id']] = {'data_dir': data_dir, 'profiles': len(profiles), 'extensions': []}
+            layout.extend((entry['id'], profile) for profile in profiles)
+
+        with ThreadPoolExecutor(max_workers=max(min(self.workers, len(layout)), 1)) as pool:
+            parsed = list(pool.map(lambda item: self._read_profile(item[1]), layout))
+        for (browser, _), extensions in zip(layout, parsed):
+            for info in extensions:
+                info['browser'] = browser
+            result[browser]['extensions'].extend(extensions)
+        count('extensions.profiles', len(layout))
+        return result
+
+    def _root_profile(self, pid: int, browser: str) -> Tuple[Optional[str], Optional[str]]:
+        """(directorio de datos, perfil) de un navegador en ejecución (por su línea de comandos)."""
+        try:
+            proc = psutil.Process(pid)
+            key = (pid, proc.create_time())
+            if key in self._root_dirs:
+                return self._root_dirs[key]
+            cmdline = proc.cmdline()
+        except psutil.Error:
+            return None, None
+        data_dir = profile = None
+        for arg in cmdline:
+            if arg.startswith('--user-data-dir='):
+                data_dir = arg[len('--user-data-dir='):].strip('"')
+            elif arg.startswith('--profile-directory='):
+                profile = arg[len('--profile-directory='):].strip('"')
+        if data_dir is None:
+            entry = catalog_entry(browser, self.catalog)
+            data_dir = user_data_dir(entry) if entry else None
+        if data_dir and profile is None:
+            # Sin --profile-directory abre el último perfil usado
+            local_state = _load_json(os.path.join(data_dir, 'Local State')) or {}
+            last_used = (local_state.get('profile') or {}).get('last_used')
+            profile = last_used if isinstance(last_used, str) and last_used else 'Default'
+        if data_dir:
+            data_dir = os.path.normcase(os.path.abspath(data_dir))
+        self._root_dirs[key] = (data_dir, profile and os.path.normcase(profile))
+        return self._root_dirs[key]
+
+    @traced('extensions.profile', 'extensions')
+    def profile(self, uss: bool = False) -> Dict:
+        """Extensiones de todos los perfiles ordenadas por costo.
+
+        Cada extensión lleva ``rss``, ``uss`` y ``cpu_percent`` de sus
+        procesos, ``processes`` (los suyos, si es exacto) o
+        ``shared_processes`` (los que comparte, si es estimado) y
+        ``attribution`` ('exact', 'shared' o None si no tiene procesos en
+        ejecución). ``browsers`` resume por navegador los procesos de
+        extensión encontrados y los perfiles abiertos. El % de CPU necesita
+        una muestra anterior.
+        """
+        start = time.perf_counter()
+        installed = self.installed()
+        sample = self.attributor.sample(uss=uss, records=True)
+        measure = 'uss' if uss else 'rss'
+
+        processes: Dict[str, List[Dict]] = {}
+        running: Dict[str, set] = {}
+        for browser, info in sample['browsers'].items():
+            for record in info['records']:
+                data_dir, profile = self._root_profile(record['root'], browser)
+                if not data_dir:
+                    continue
+                running.setdefault(data_dir, set()).add(profile)
+                if record['type'] == 'extension':
+                    processes.setdefault(data_dir, []).append(record)
+
+        extensions = []
+        browsers = {}
+        for browser, info in installed.items():
+            data_dir = os.path.normcase(os.path.abspath(info['data_dir']))
+            records = processes.pop(data_dir, [])
+            profiles = running.get(data_dir, set())
+
+            def candidate(ext):
+                return (ext['enabled'] and bool(ext['background'])
+                        and os.path.normcase(ext['profile']) in profiles)
+
+            candidates = sum(1 for ext in info['extensions'] if candidate(ext))
+            attribution = None
+            if records and candidates:
+                attribution = 'exact' if candidates == 1 else 'shared'
+            totals = {
+                'processes': len(records),
+                'rss': sum(record['rss'] for record in records),
+                'uss': sum(record['uss'] or 0 for record in records) if uss else None,
+                'cpu_percent': sum(record['cpu_percent'] for record in records),
+            }
+            for ext in info['extensions']:
+                ext.update(processes=0, shared_processes=0, rss=0, uss=0 if uss else None,
+                           cpu_percent=0.0, attribution=None)
+                if attribution and candidate(ext):
+                    shared = attribution == 'shared'
+                    ext.update(processes=0 if shared else totals['processes'],
+                               shared_processes=totals['processes'] if shared else 0,
+                               rss=totals['rss'] // candidates,
+                               uss=totals['uss'] // candidates if uss else None,
+                               cpu_percent=totals['cpu_percent'] / candidates,
+                               attribution=attribution)
+                extensions.append(ext)
+            browsers[browser] = dict(totals, data_dir=info['data_dir'], profiles=info['profiles'],
+                                     running_profiles=len(profiles),
+                                     extensions=len(info['extensions']), attribution=attribution)
+
+        extensions.sort(key=lambda ext: (ext['enabled'], ext[measure] or 0, ext['cpu_percent'],
+                                         ext['all_urls'], ext['background'] == 'persistent'),
+                        reverse=True)
+        return {'timestamp': sample['timestamp'], 'uss': uss, 'elapsed': time.perf_counter() - start,
+                'browsers': browsers, 'extensions': extensions}
+
@@ -0,0 +1,274 @@
+import os
+import time
+import atexit
+import logging
+import threading
+import functools
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Tramos (spans) y contadores de las rutas críticas.
+#
+# Desactivado (por defecto) ``span`` retorna un único objeto vacío y
+# ``traced`` solo agrega una comprobación de un booleano por llamada. Se
+# activa con ``enable`` o con las variables de entorno SPEEDCHROME_TRACE
+# (archivo JSON en formato trace-event de Chrome, se abre en chrome://tracing
+# o Perfetto) y SPEEDCHROME_METRICS (archivo de texto de Prometheus para el
+# textfile collector de node_exporter); ambos se escriben al salir.
+
+
+class _State:
+    enabled = False
+    trace_path: Optional[str] = None
+    metrics_path: Optional[str] = None
+    # (nombre, categoría, inicio µs, duración µs, hilo, args)
+    events: deque = deque(maxlen=200000)
+    # nombre -> [cantidad, segundos totales, segundos máximo]
+    totals: Dict[str, List[float]] = {}
+    counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+    threads: Dict[int, str] = {}
+    lock = threading.Lock()
+    origin_ns = time.perf_counter_ns()
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name: str, category: str, args: Dict):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        _record(self.name, self.category, self.start, end - self.start, self.args)
+        return False
+
+    def set(self, **args) -> None:
+        """Agrega datos al tramo (se ven en el visor de la traza)."""
+        self.args.update(args)
+
+
+def _record(name: str, category: str, start_ns: int, duration_ns: int, args: Dict) -> None:
+    thread = threading.current_thread()
+    seconds = duration_ns / 1e9
+    with _State.lock:
+        _State.events.append((name, category, (start_ns - _State.origin_ns) // 1000,
+                              duration_ns // 1000, thread.ident, args))
+        _State.threads.setdefault(thread.ident, thread.name)
+        total = _State.totals.get(name)
+        if total is None:
+            _State.totals[name] = [1, seconds, seconds]
+        else:
+            total[0] += 1
+            total[1] += seconds
+            if seconds > total[2]:
+                total[2] = seconds
+
+
+def enabled() -> bool:
+    return _State.enabled
+
+
+def span(name: str, category: str = 'app', **args):
+    """Context manager que mide un tramo: ``with span('apply.plan', browser=b): ...``"""
+    if not _State.enabled:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def traced(name: str, category: str = 'app', arg_index: Optional[int] = None,
+           arg_name: str = 'target') -> Callable:
+    """Decorador que mide cada llamada como un tramo.
+
+    Con ``arg_index`` se registra ese argumento posicional (p. ej. la ruta
+    de la clave de registro) como ``arg_name``.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _State.enabled:
+                return func(*args, **kwargs)
+            details = {}
+            if arg_index is not None and len(args) > arg_index:
+                details[arg_name] = str(args[arg_index])
+            with _Span(name, category, details):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """Suma ``value`` a un contador (con etiquetas opcionales)."""
+    if not _State.enabled:
+        return
+    key = (name, tuple(sorted((label, str(data)) for label, data in labels.items())))
+    with _State.lock:
+        _State.counters[key] = _State.counters.get(key, 0) + value
+
+
+def mark(name: str, category: str = 'app', **args) -> None:
+    """Evento instantáneo (duración 0), p. ej. una fase de la interfaz."""
+    if _State.enabled:
+        now = time.perf_counter_ns()
+        _record(name, category, now, 0, args)
+
+
+def enable(trace_path: Optional[str] = None, metrics_path: Optional[str] = None,
+           max_events: int = 200000) -> None:
+    """Activa la instrumentación; si se indican rutas, se exporta al salir."""
+    with _State.lock:
+        if _State.events.maxlen != max_events:
+            _State.events = deque(_State.events, maxlen=max_events)
+        _State.trace_path = trace_path or _State.trace_path
+        _State.metrics_path = metrics_path or _State.metrics_path
+        _State.enabled = True
+
+
+def disable() -> None:
+    _State.enabled = False
+
+
+def reset() -> None:
+    """Descarta todo lo registrado."""
+    with _State.lock:
+        _State.events.clear()
+        _State.totals.clear()
+        _State.counters.clear()
+
+
+def summary() -> Dict[str, Dict[str, float]]:
+    """Por tramo: cantidad, segundos totales y máximo."""
+    with _State.lock:
+        return {name: {'count': int(total[0]), 'seconds': total[1], 'max_seconds': total[2]}
+                for name, total in _State.totals.items()}
+
+
+def trace_events() -> Dict:
+    """Traza en formato trace-event de Chrome (eventos completos 'X')."""
+    pid = os.getpid()
+    with _State.lock:
+        events = list(_State.events)
+        threads = dict(_State.threads)
+    trace = [
+        {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+        for tid, name in threads.items()
+    ]
+    for name, category, start, duration, tid, args in events:
+        event = {'name': name, 'cat': category, 'ph': 'X' if duration else 'i',
+                 'ts': start, 'pid': pid, 'tid': tid}
+        if duration:
+            event['dur'] = duration
+        else:
+            event['s'] = 't'
+        if args:
+            event['args'] = args
+        trace.append(event)
+    return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def prometheus_text() -> str:
+    """Métricas en el formato de texto de Prometheus."""
+    with _State.lock:
+        totals = {name: list(total) for name, total in _State.totals.items()}
+        counters = dict(_State.counters)
+    lines = [
+        '# HELP speedchrome_span_seconds Duración de los tramos instrumentados.',
+        '# TYPE speedchrome_span_seconds summary',
+    ]
+    for name, (calls, seconds, _) in sorted(totals.items()):
+        lines.append(f'speedchrome_span_seconds_sum{{span="{_escape(name)}"}} {seconds:.9f}')
+        lines.append(f'speedchrome_span_seconds_count{{span="{_escape(name)}"}} {int(calls)}')
+    lines += [
+        '# HELP speedchrome_span_max_seconds Duración máxima de un tramo.',
+        '# TYPE speedchrome_span_max_seconds gauge',
+    ]
+    for name, (_, _, longest) in sorted(totals.items()):
+        lines.append(f'speedchrome_span_max_seconds{{span="{_escape(name)}"}} {longest:.9f}')
+    lines += [
+        '# HELP speedchrome_events_total Contadores de operaciones.',
+        '# TYPE speedchrome_events_total counter',
+    ]
+    for (name, labels), value in sorted(counters.items()):
+        label_text = ''.join(f',{label}="{_escape(data)}"' for label, data in labels)
+        lines.append(f'speedchrome_events_total{{event="{_escape(name)}"{label_text}}} {value:g}')
+    lines += [
+        '# HELP speedchrome_export_timestamp_seconds Momento de la exportación.',
+        '# TYPE speedchrome_export_timestamp_seconds gauge',
+        f'speedchrome_export_timestamp_seconds {time.time():.3f}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def _atomic_write(path: str, content: str) -> None:
+    import tempfile
+
+    # node_exporter puede leer el archivo en cualquier momento: temporal + rename
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.speedchrome-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def export(trace_path: Optional[str] = None, metrics_path: Optional[str] = None) -> List[str]:
+    """Escribe la traza y/o las métricas; retorna los archivos escritos."""
+    import json
+
+    trace_path = trace_path or _State.trace_path
+    metrics_path = metrics_path or _State.metrics_path
+    written = []
+    try:
+        if trace_path:
+            _atomic_write(trace_path, json.dumps(trace_events()))
+            written.append(trace_path)
+        if metrics_path:
+            _atomic_write(metrics_path, prometheus_text())
+            written.append(metrics_path)
+    except OSError as e:
+        logging.error(f"No se pudo exportar la instrumentación: {e}")
+    return written
+
+
+def _export_at_exit() -> None:
+    if _State.enabled and (_State.trace_path or _State.metrics_path):
+        export()
+
+
+if os.environ.get('SPEEDCHROME_TRACE') or os.environ.get('SPEEDCHROME_METRICS'):
+    enable(os.environ.get('SPEEDCHROME_TRACE'), os.environ.get('SPEEDCHROME_METRICS'))
+atexit.register(_export_at_exit)
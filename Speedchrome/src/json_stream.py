@@ -0,0 +1,135 @@
+import re
+import json
+from typing import Iterator, Sequence, Tuple, TextIO
+
+# Lectura por partes de documentos JSON grandes (p. ej. Preferences de un
+# perfil, varios MB). Solo se recorren carácter a carácter los objetos en el
+# camino pedido; cada valor hoja se decodifica con el decodificador de C de
+# ``json`` sobre el búfer, de modo que en memoria nunca hay más que un
+# miembro del documento y el resto del archivo no se llega a leer.
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Caracteres con los que puede seguir un número o literal cortado por el bloque
+_TOKEN_TAIL = re.compile(r'[0-9A-Za-z.+-]*')
+
+
+class JsonStreamReader:
+    """Cursor sobre un archivo JSON en modo texto, leído de a ``chunk_size``."""
+
+    def __init__(self, stream: TextIO, chunk_size: int = 65536):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, size: int = 0) -> bool:
+        """Agrega al menos ``size`` caracteres (o un bloque); False al final del archivo."""
+        if self.eof:
+            return False
+        if self.pos > self.chunk_size and self.pos * 2 > len(self.buffer):
+            # Descartar lo ya consumido
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        wanted = max(size, self.chunk_size)
+        read = 0
+        while read < wanted:
+            data = self.stream.read(self.chunk_size)
+            if not data:
+                self.eof = True
+                break
+            self.buffer += data
+            read += len(data)
+        return read > 0
+
+    def peek(self) -> str:
+        """Siguiente carácter que no es espacio ('' al final del documento)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Se esperaba '{char}' y se encontró {found!r} en el carácter {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """Decodifica el siguiente valor completo."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+                # Un número al final del búfer puede seguir en el bloque siguiente
+                if (self.eof or isinstance(value, (dict, list, str))
+                        or _TOKEN_TAIL.match(self.buffer, end).end() < len(self.buffer)):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Valor incompleto: al menos duplicar lo disponible para que el
+            # costo total de los reintentos sea lineal
+            self._fill(len(self.buffer) - self.pos)
+
+    def members(self) -> Iterator[str]:
+        """Claves del objeto que empieza en el cursor.
+
+        Tras cada clave el cursor queda en su valor, que quien llama debe
+        consumir (``value``, ``skip`` o ``members``) antes de pedir la
+        siguiente.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError(f"Clave inválida en el carácter {self.pos}")
+            self.expect(':')
+            yield key
+            separator = self.peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Se esperaba ',' o '}}' y se encontró {separator!r}")
+
+    def skip(self) -> None:
+        """Descarta el siguiente valor."""
+        self.value()
+
+
+def iter_members(stream: TextIO, path: Sequence[str],
+                 chunk_size: int = 65536) -> Iterator[Tuple[str, object]]:
+    """(clave, valor) de cada miembro del objeto en ``path``, de a uno.
+
+    ``iter_members(f, ('extensions', 'settings'))`` recorre
+    ``doc['extensions']['settings']`` sin decodificar el resto del
+    documento. Si el camino no existe o no es un objeto no retorna nada.
+    Lanza ValueError si el JSON no es válido.
+    """
+    reader = JsonStreamReader(stream, chunk_size)
+    depth = 0
+    if reader.peek() != '{':
+        return
+    keys = reader.members()
+    while True:
+        for key in keys:
+            if depth == len(path):
+                yield key, reader.value()
+            elif key == path[depth] and reader.peek() == '{':
+                depth += 1
+                keys = reader.members()
+                break
+            else:
+                reader.skip()
+        else:
+            # Se terminó el objeto del nivel actual: el camino ya se recorrió
+            # entero o no existe (las claves no se repiten)
+            return
@@ -0,0 +1,350 @@
+import os
+import json
+import stat
+import errno
+import logging
+from typing import Dict, List, Optional, Tuple
+from registry_utils import JsonFileRegistryBackend, HKLM, HKU, VIEW_64
+from browser_discovery import BROWSER_CATALOG
+from instrumentation import traced
+from optimizations import OPTIMIZATIONS, applies_to, linux_settings, registry_location
+
+POLICY_FILE = 'speedchrome.json'
+FLAGS_BEGIN = '# --- SpeedChrome: inicio (no editar este bloque) ---'
+FLAGS_END = '# --- SpeedChrome: fin ---'
+
+
+def atomic_write(path: str, content: str, mode: int = 0o644) -> bool:
+    """Escribe ``content`` en ``path`` solo si cambia (temporal + rename).
+
+    Retorna True si el archivo se escribió, False si ya tenía ese contenido.
+    """
+    import tempfile
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.speedchrome-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+
+def _owned_config_dir(config_dir: str, owner: Tuple[int, int]) -> int:
+    """Abre la carpeta ``.config`` de otro usuario y retorna su descriptor.
+
+    Se abre sin seguir enlaces simbólicos y tiene que ser un directorio de
+    ese usuario; si no existe se crea con él como dueño. Todo lo que sigue
+    se hace relativo a este descriptor, así que cambiar la carpeta después
+    no desvía la escritura. Lanza OSError si no es segura.
+    """
+    flags = os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW
+    name = os.path.basename(config_dir)
+    home_fd = os.open(os.path.dirname(config_dir), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        try:
+            fd = os.open(name, flags, dir_fd=home_fd)
+        except FileNotFoundError:
+            os.mkdir(name, 0o700, dir_fd=home_fd)
+            fd = os.open(name, flags, dir_fd=home_fd)
+            os.fchown(fd, *owner)
+    except OSError as e:
+        if e.errno in (errno.ELOOP, errno.ENOTDIR):
+            raise OSError(e.errno, f"{config_dir} no es una carpeta (¿enlace simbólico?)")
+        raise
+    finally:
+        os.close(home_fd)
+    if os.fstat(fd).st_uid != owner[0]:
+        os.close(fd)
+        raise OSError(errno.EPERM, f"{config_dir} no pertenece al UID {owner[0]}")
+    return fd
+
+
+def write_owned_flags(path: str, flags: List[str], owner: Tuple[int, int]) -> bool:
+    """Reemplaza el bloque de SpeedChrome en el archivo de flags de otro usuario.
+
+    Para ejecutar como root sobre la carpeta personal de un usuario, que la
+    controla él: nada sigue enlaces simbólicos (un ``*-flags.conf`` que
+    apunta a un archivo de root no se lee ni se reescribe), el archivo
+    existente tiene que ser un archivo común de ese usuario y el temporal
+    se crea con O_EXCL y se le pasa el dueño antes del rename. Retorna True
+    si el archivo cambió; lanza OSError si no es seguro escribirlo.
+    """
+    name = os.path.basename(path)
+    dir_fd = _owned_config_dir(os.path.dirname(path), owner)
+    try:
+        try:
+            fd = os.open(name, os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK, dir_fd=dir_fd)
+        except FileNotFoundError:
+            existing = ''
+        except OSError as e:
+            if e.errno == errno.ELOOP:
+                raise OSError(e.errno, f"{path} es un enlace simbólico")
+            raise
+        else:
+            with os.fdopen(fd, 'r', encoding='utf-8') as f:
+                info = os.fstat(f.fileno())
+                if not stat.S_ISREG(info.st_mode) or info.st_uid != owner[0]:
+                    raise OSError(errno.EPERM, f"{path} no es un archivo común del UID {owner[0]}")
+                existing = f.read()
+        # Sin flags y sin bloque previo no hay nada que tocar
+        if not flags and FLAGS_BEGIN not in existing:
+            return False
+        content = replace_flags_block(existing, flags)
+        if content == existing:
+            return False
+        tmp_name = f'.speedchrome-{os.urandom(8).hex()}.tmp'
+        fd = os.open(tmp_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW, 0o600,
+                     dir_fd=dir_fd)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fchown(f.fileno(), *owner)
+                os.fchmod(f.fileno(), 0o644)
+                os.fsync(f.fileno())
+            os.replace(tmp_name, name, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+        except BaseException:
+            try:
+                os.unlink(tmp_name, dir_fd=dir_fd)
+            except OSError:
+                pass
+            raise
+        return True
+    finally:
+        os.close(dir_fd)
+
+
+def replace_flags_block(existing: str, flags: List[str]) -> str:
+    """Reemplaza (o agrega, o quita) el bloque de SpeedChrome en un *-flags.conf.
+
+    Las líneas del usuario fuera del bloque se conservan tal cual.
+    """
+    lines = existing.splitlines()
+    kept, inside = [], False
+    for line in lines:
+        if line.strip() == FLAGS_BEGIN:
+            inside = True
+        elif line.strip() == FLAGS_END:
+            inside = False
+        elif not inside:
+            kept.append(line)
+    while kept and not kept[-1].strip():
+        kept.pop()
+    if flags:
+        if kept:
+            kept.append('')
+        kept.extend([FLAGS_BEGIN, *flags, FLAGS_END])
+    return '\n'.join(kept) + '\n' if kept else ''
+
+
+class LinuxPolicyBackend(JsonFileRegistryBackend):
+    """Backend de Linux con la misma interfaz que el registro de Windows.
+
+    Los valores que escribe SpeedChrome se guardan en ``state_file`` (como
+    el registro simulado) y en cada ``flush`` se traducen, en una sola
+    pasada por todo el catálogo y según la columna ``linux`` de
+    ``OPTIMIZATIONS``, a:
+
+    * ``<linux_policy_dir>/speedchrome.json``: políticas administradas,
+      combinadas por carpeta (los canales de Brave comparten una);
+    * ``~/.config/<linux_flags_file>``: un bloque delimitado con los flags,
+      que se reemplaza entero sin tocar las líneas del usuario.
+
+    Los valores de usuario (``HKU\\<UID>\\...``, ver ``sessions.py``) se
+    combinan con los del equipo en el archivo de flags de la carpeta
+    personal de ese usuario. Chromium no lee políticas por usuario en
+    Linux, así que las de ese tipo solo cuentan en HKLM.
+
+    Los archivos de flags de otros usuarios (ejecutando como root) se
+    escriben con ``write_owned_flags``, que no sigue enlaces simbólicos.
+
+    Cada archivo se escribe con temporal + rename y solo si su contenido
+    cambia, así que aplicar dos veces lo mismo no modifica nada. Las claves
+    ``SOFTWARE\\<reg_key>`` de cada navegador existen solo si su ejecutable
+    está instalado, para que la detección funcione igual que en Windows.
+    """
+
+    requires_admin = True
+
+    def __init__(self, state_file: str, catalog: Optional[List[Dict]] = None,
+                 root: str = '/', config_dir: Optional[str] = None):
+        self.catalog = catalog if catalog is not None else BROWSER_CATALOG
+        self.root = root
+        self.config_dir = config_dir or self.default_config_dir()
+        super().__init__(state_file)
+        self._browser_keys = {}
+        for entry in self.catalog:
+            key_id = self._key_id(f"SOFTWARE\\{entry['reg_key']}", HKLM)
+            installed = any(os.path.isfile(self._rooted(path)) for path in entry.get('linux_paths', []))
+            self._browser_keys[key_id] = installed
+        # Dueño de los archivos por usuario cuando se ejecuta con sudo
+        self._owner = None
+        if os.environ.get('SUDO_UID') and os.environ.get('SUDO_GID'):
+            self._owner = (int(os.environ['SUDO_UID']), int(os.environ['SUDO_GID']))
+
+    @staticmethod
+    def default_config_dir() -> str:
+        sudo_user = os.environ.get('SUDO_USER')
+        if sudo_user:
+            return os.path.join(os.path.expanduser(f'~{sudo_user}'), '.config')
+        return os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+
+    def _rooted(self, path: str) -> str:
+        return os.path.join(self.root, path.lstrip('/'))
+
+    def key_exists(self, key_path: str, hive: str = HKLM, view: int = VIEW_64) -> bool:
+        key_id = self._key_id(key_path, hive, view)
+        if key_id in self._browser_keys:
+            return self._browser_keys[key_id]
+        return super().key_exists(key_path, hive, view)
+
+    def query_last_write(self, key_path: str, hive: str = HKLM,
+                         view: int = VIEW_64) -> Optional[int]:
+        key_id = self._key_id(key_path, hive, view)
+        if key_id in self._browser_keys and not self._browser_keys[key_id]:
+            return None
+        stamp = super().query_last_write(key_path, hive, view)
+        if stamp is None and self._browser_keys.get(key_id):
+            return 0
+        return stamp
+
+    def _browser_values(self, entry: Dict, uid: Optional[str] = None) -> Dict[str, Dict]:
+        """{clave completa: {nombre: dato}} de las optimizaciones del navegador.
+
+        Con ``uid`` los valores de la colmena del usuario reemplazan a los del equipo.
+        """
+        values = {}
+        for opt in OPTIMIZATIONS:
+            if not applies_to(opt, entry):
+                continue
+            key_path, _ = registry_location(opt, entry['reg_key'], entry)
+            if key_path not in values:
+                stored = dict(self.read_values(key_path) or {})
+                if uid is not None:
+                    stored.update(self.read_values(f"{uid}\\{key_path}", hive=HKU) or {})
+                values[key_path] = {name: value[0] for name, value in stored.items()}
+        return values
+
+    def _user_config_dirs(self) -> Dict[str, Tuple[str, Tuple[int, int]]]:
+        """{UID: (carpeta .config, (uid, gid))} de los usuarios con valores propios."""
+        import pwd
+
+        result = {}
+        for uid in self.subkeys('', hive=HKU):
+            try:
+                account = pwd.getpwuid(int(uid))
+            except (KeyError, ValueError):
+                logging.warning(f"Valores de usuario para un UID desconocido: {uid}")
+                continue
+            result[uid] = (os.path.join(self._rooted(account.pw_dir), '.config'),
+                           (account.pw_uid, account.pw_gid))
+        return result
+
+    def flush(self) -> None:
+        super().flush()
+        self.render()
+
+    def repair(self) -> List[str]:
+        # render solo reescribe los archivos cuyo contenido ya no coincide
+        return self.render()
+
+    def managed_files(self) -> List[str]:
+        """Archivo de estado y archivos de destino (existan o no todavía)."""
+        paths = [self.file_path]
+        config_dirs = [self.config_dir] + [config_dir for config_dir, _ in self._user_config_dirs().values()]
+        for entry in self.catalog:
+            if entry.get('linux_policy_dir'):
+                path = os.path.join(self._rooted(entry['linux_policy_dir']), POLICY_FILE)
+                if path not in paths:
+                    paths.append(path)
+            if entry.get('linux_flags_file'):
+                for config_dir in config_dirs:
+                    path = os.path.join(config_dir, entry['linux_flags_file'])
+                    if path not in paths:
+                        paths.append(path)
+        return paths
+
+    @traced('linux.render', 'registry')
+    def render(self) -> List[str]:
+        """Escribe todos los archivos de destino; retorna los que cambiaron.
+
+        Lanza OSError si alguno no se pudo escribir (tras intentar el resto).
+        """
+        policies_by_dir: Dict[str, Dict] = {}
+        # ruta -> (flags, dueño del archivo)
+        flags_by_path: Dict[str, Tuple[List[str], Optional[Tuple[int, int]]]] = {}
+        users = self._user_config_dirs()
+        with_values = {
+            key_id.split('\\')[1] for key_id, values in self._keys.items()
+            if values and key_id.startswith('hku\\')
+        }
+        for entry in self.catalog:
+            policies, flags = linux_settings(self._browser_values(entry), entry)
+            if entry.get('linux_policy_dir'):
+                policies_by_dir.setdefault(entry['linux_policy_dir'], {}).update(policies)
+            if entry.get('linux_flags_file'):
+                flags_by_path[os.path.join(self.config_dir, entry['linux_flags_file'])] = (flags, self._owner)
+                # El archivo de cada usuario con valores propios (aunque sea el
+                # mismo de arriba); sin valores (restaurado) se quita el bloque
+                for uid, (config_dir, owner) in users.items():
+                    path = os.path.join(config_dir, entry['linux_flags_file'])
+                    if uid in with_values:
+                        flags_by_path[path] = (linux_settings(self._browser_values(entry, uid), entry)[1],
+                                               owner)
+                    elif path not in flags_by_path:
+                        flags_by_path[path] = ([], owner)
+
+        changed, errors = [], []
+        for directory, policies in policies_by_dir.items():
+            path = os.path.join(self._rooted(directory), POLICY_FILE)
+            try:
+                if policies:
+                    if atomic_write(path, json.dumps(policies, indent=2, sort_keys=True) + '\n'):
+                        changed.append(path)
+                elif os.path.exists(path):
+                    os.remove(path)
+                    changed.append(path)
+            except OSError as e:
+                logging.error(f"No se pudo escribir la política {path}: {e}")
+                errors.append(path)
+        for path, (flags, owner) in flags_by_path.items():
+            try:
+                if owner is not None and owner[0] != os.geteuid():
+                    # Carpeta de otro usuario (con sudo o por usuario): sin seguir enlaces
+                    if write_owned_flags(path, flags, owner):
+                        changed.append(path)
+                    continue
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        existing = f.read()
+                except FileNotFoundError:
+                    existing = ''
+                # Sin flags y sin bloque previo no hay nada que tocar
+                if not flags and FLAGS_BEGIN not in existing:
+                    continue
+                if atomic_write(path, replace_flags_block(existing, flags)):
+                    changed.append(path)
+            except OSError as e:
+                logging.error(f"No se pudo escribir {path}: {e}")
+                errors.append(path)
+        for path in changed:
+            logging.info(f"Actualizado {path}")
+        if errors:
+            # Hace fallar el commit del lote, que revierte y vuelve a generar los archivos
+            raise OSError(f"No se pudieron escribir: {', '.join(errors)}")
+        return changed
@@ -1,32 +1,72 @@
+import time
+_START = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox
-import ctypes
+import sys
+import json
 import logging
-import psutil
+import os
 from datetime import datetime
 from browser_manager import BrowserManager
-from registry_utils import RegistryManager
+from registry_utils import is_admin
+from app_paths import get_data_dir
+from optimizations import OPTIMIZATIONS, OPTIMIZATIONS_BY_ID, default_options, on_platform, validate
+from ui_worker import TaskRunner, LogView
+import instrumentation
+
+# psutil, la telemetría y el gobernador se importan bajo demanda, después
+# de mostrar la ventana, para no retrasar el primer cuadro.
+
+class StartupProfile:
+    """Marcas de tiempo del arranque, en ms desde que se importó main.py"""
+
+    def __init__(self, start=_START):
+        self.start = start
+        self.marks = {}
+
+    def mark(self, name):
+        if name not in self.marks:
+            self.marks[name] = (time.perf_counter() - self.start) * 1000
+            instrumentation.mark(f'startup.{name}', 'ui')
+
+    def report(self):
+        return {name: round(value, 1) for name, value in self.marks.items()}
 
 class SpeedChromeGUI:
-    def __init__(self, root):
+    def __init__(self, root, profile=None, exit_when_ready=False):
         self.root = root
         self.root.title("SpeedChrome Optimizer")
         self.root.geometry("600x700")
+        self.profile = profile or StartupProfile()
+        self.exit_when_ready = exit_when_ready
         
         # Crear menú
         self.create_menu()
         
-        # Verificar configuración previa
-        self.has_previous_config, self.previous_config = BrowserManager.check_previous_config()
+        # La configuración previa y la detección se cargan en segundo plano
+        self.has_previous_config, self.previous_config = False, {}
+        self.sampler = None
+        self.governor = None
+        # Ventana de desglose por tipo de proceso (abierta bajo demanda)
+        self.attributor = None
+        self.breakdown_window = None
+        # Próxima actualización programada del desglose (id de ``after``)
+        self.breakdown_after = None
+        # Ventana de extensiones por costo (abierta bajo demanda)
+        self.extension_profiler = None
+        self.extensions_window = None
+        # Límites por navegador de la última recomendación (MB) y el valor en GB mostrado
+        self.recommended_limits = None
+        self.recommended_gb = None
         
-        self.setup_ui()
+        # El log se configura antes de construir la interfaz para no perder mensajes
         self.setup_logging()
-        self.check_browsers()
-        
-        # Cargar configuración previa si existe
-        if self.has_previous_config:
-            self.load_previous_config()
-            self.log_message("Configuración anterior cargada")
+        with instrumentation.span('ui.setup', 'ui'):
+            self.setup_ui()
+        self.runner = TaskRunner(self.root, self.handle_task_event)
+        self.profile.mark('ui_built')
+        self.root.bind('<Map>', self.on_first_frame, add='+')
 
     def create_menu(self):
         """Crea la barra de menú"""
@@ -58,33 +98,51 @@ class SpeedChromeGUI:
         ttk.Label(
             self.main_frame,
             text="Esta herramienta optimiza navegadores basados en Chromium.\n"
-                 "Compatible con Google Chrome, Microsoft Edge y Brave.",
+                 "Compatible con Chrome, Edge, Brave, Opera, Vivaldi y Chromium (todos sus canales).",
             wraplength=500,
             justify="center"
         ).pack(pady=5)
 
-        # Indicador de configuración previa
-        if self.has_previous_config:
-            self.config_label = ttk.Label(
-                self.main_frame,
-                text="✓ Configuración anterior detectada",
-                foreground='green'
-            )
-            self.config_label.pack(pady=5)
-
-        # Frame de navegadores
-        self.browsers_frame = ttk.LabelFrame(self.main_frame, text="Navegadores")
+        # Frame de navegadores (habilitados cuando termina la detección)
+        self.browsers_frame = ttk.LabelFrame(self.main_frame, text="Navegadores (detectando...)")
         self.browsers_frame.pack(fill=tk.X, pady=10)
         
         self.browser_vars = {}
+        self.browser_checks = {}
+        self.installed = {}
         for browser, info in BrowserManager.BROWSER_PATHS.items():
             var = tk.BooleanVar(value=False)
             self.browser_vars[browser] = var
-            ttk.Checkbutton(
+            self.browser_checks[browser] = ttk.Checkbutton(
                 self.browsers_frame,
                 text=info['friendly_name'],
-                variable=var
-            ).pack(anchor=tk.W, padx=5, pady=2)
+                variable=var,
+                state='disabled'
+            )
+        # El catálogo es largo: se muestran solo los navegadores detectados
+        self.no_browsers_label = ttk.Label(self.browsers_frame, text="Buscando navegadores instalados...")
+        self.no_browsers_label.pack(anchor=tk.W, padx=5, pady=2)
+
+        # Uso actual de memoria (alimentado por la telemetría)
+        usage_row = ttk.Frame(self.main_frame)
+        usage_row.pack(fill=tk.X, padx=5)
+        self.usage_var = tk.StringVar(value="Uso actual: midiendo...")
+        ttk.Label(
+            usage_row,
+            textvariable=self.usage_var,
+            justify="left",
+            wraplength=480
+        ).pack(side=tk.LEFT, anchor=tk.W)
+        ttk.Button(
+            usage_row,
+            text="Extensiones",
+            command=self.show_extensions
+        ).pack(side=tk.RIGHT)
+        ttk.Button(
+            usage_row,
+            text="Desglose",
+            command=self.show_breakdown
+        ).pack(side=tk.RIGHT)
 
         # Frame de opciones
         self.options_frame = ttk.LabelFrame(self.main_frame, text="Opciones de Optimización")
@@ -94,72 +152,96 @@ class SpeedChromeGUI:
         self.memory_frame = ttk.LabelFrame(self.options_frame, text="Configuración de Memoria")
         self.memory_frame.pack(fill=tk.X, padx=5, pady=5)
 
-        total_memory = psutil.virtual_memory().total // (1024 * 1024 * 1024)
-        self.memory_var = tk.BooleanVar(value=True)
-        self.memory_limit_var = tk.StringVar(value="4")
-        
-        ttk.Checkbutton(
-            self.memory_frame,
-            text="Limitar memoria",
-            variable=self.memory_var,
-            command=self.toggle_memory_options
-        ).pack(anchor=tk.W, padx=5, pady=2)
-
-        self.memory_options_frame = ttk.Frame(self.memory_frame)
-        self.memory_options_frame.pack(fill=tk.X, padx=20, pady=2)
+        # Casillas y valores generados desde el catálogo de optimizaciones
+        self.option_vars = {}
+        self.option_values = {}
+        self.option_spinboxes = {}
+        self.option_rows = {}
+        for opt in OPTIMIZATIONS:
+            if not on_platform(opt):
+                continue
+            parent = self.memory_frame if opt['group'] == 'memory' else self.options_frame
+            self.add_option_widgets(parent, opt)
 
-        ttk.Label(
-            self.memory_options_frame,
-            text="Límite de memoria (GB):"
-        ).pack(side=tk.LEFT, padx=5)
+        # Alias del límite de memoria (recomendación y gobernador)
+        self.memory_var = self.option_vars['memory_limit']
+        self.memory_limit_var = self.option_values['memory_limit']
+        self.memory_spinbox = self.option_spinboxes['memory_limit']
+        memory_row = self.option_rows['memory_limit']
 
-        self.memory_spinbox = ttk.Spinbox(
-            self.memory_options_frame,
-            from_=1,
-            to=total_memory,
-            textvariable=self.memory_limit_var,
-            width=5
+        # El máximo real se conoce al terminar la carga en segundo plano
+        self.memory_max_label = ttk.Label(
+            memory_row,
+            text="(Máximo disponible: calculando...)"
         )
-        self.memory_spinbox.pack(side=tk.LEFT, padx=5)
+        self.memory_max_label.pack(side=tk.LEFT, padx=5)
 
-        ttk.Label(
-            self.memory_options_frame,
-            text=f"(Máximo disponible: {total_memory} GB)"
+        ttk.Button(
+            memory_row,
+            text="Recomendar",
+            command=self.recommend_limits
         ).pack(side=tk.LEFT, padx=5)
 
-        # Otras opciones
-        self.preload_var = tk.BooleanVar(value=True)
-        self.hardware_var = tk.BooleanVar(value=True)
-        
+        self.governor = None
+        self.governor_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(
-            self.options_frame,
-            text="Deshabilitar precarga de páginas",
-            variable=self.preload_var
+            self.memory_frame,
+            text="Hacer cumplir el límite en tiempo real",
+            variable=self.governor_var,
+            command=self.toggle_governor
+        ).pack(anchor=tk.W, padx=5, pady=2, after=memory_row)
+
+        self.scheduler = None
+        self.scheduler_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.memory_frame,
+            text="Bajar la prioridad de CPU y disco de las pestañas en segundo plano",
+            variable=self.scheduler_var,
+            command=self.toggle_scheduler
         ).pack(anchor=tk.W, padx=5, pady=2)
-        
+
+        self.limiter = None
+        self.limiter_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(
-            self.options_frame,
-            text="Deshabilitar aceleración de hardware",
-            variable=self.hardware_var
+            self.memory_frame,
+            text="Límite estricto del sistema (cgroup / Job Object)",
+            variable=self.limiter_var,
+            command=self.toggle_limiter
         ).pack(anchor=tk.W, padx=5, pady=2)
 
+        # Caché de disco
+        cache_row = self.option_rows['disk_cache_size']
+        ttk.Button(
+            cache_row,
+            text="Analizar caché",
+            command=self.analyze_cache
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Button(
+            cache_row,
+            text="Vaciar caché",
+            command=self.purge_cache
+        ).pack(side=tk.LEFT, padx=5)
+
         # Botones
         self.buttons_frame = ttk.Frame(self.main_frame)
         self.buttons_frame.pack(pady=10)
 
-        if self.has_previous_config:
-            ttk.Button(
-                self.buttons_frame,
-                text="Restablecer valores por defecto",
-                command=self.reset_to_defaults
-            ).pack(side=tk.LEFT, padx=5)
-
         self.apply_button = ttk.Button(
             self.buttons_frame,
             text="Aplicar Cambios",
-            command=self.apply_changes
+            command=self.apply_changes,
+            state='disabled'
         )
         self.apply_button.pack(side=tk.LEFT, padx=5)
+
+        ttk.Button(
+            self.buttons_frame,
+            text="Vista previa",
+            command=self.preview_changes
+        ).pack(side=tk.LEFT, padx=5)
+
+        self.progress_bar = ttk.Progressbar(self.main_frame, mode='determinate')
+        self.progress_bar.pack(fill=tk.X, padx=5)
         
         # Área de log
         self.log_frame = ttk.LabelFrame(self.main_frame, text="Log")
@@ -167,6 +249,145 @@ class SpeedChromeGUI:
         
         self.log_text = tk.Text(self.log_frame, height=8, wrap=tk.WORD)
         self.log_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        # Solo se muestran las últimas líneas; el log completo va a archivo
+        self.log_view = LogView(self.root, self.log_text, max_lines=500)
+
+    def add_option_widgets(self, parent, opt):
+        """Casilla (y valor, si es numérica) de una optimización del catálogo"""
+        enabled = opt['default'] if opt['type'] == 'bool' else opt['enabled']
+        var = tk.BooleanVar(value=enabled)
+        self.option_vars[opt['id']] = var
+        ttk.Checkbutton(
+            parent,
+            text=opt['label'],
+            variable=var,
+            command=lambda: self.toggle_option(opt['id'])
+        ).pack(anchor=tk.W, padx=5, pady=2)
+        if opt['type'] != 'int':
+            return
+
+        row = ttk.Frame(parent)
+        row.pack(fill=tk.X, padx=20, pady=2)
+        self.option_rows[opt['id']] = row
+        ttk.Label(
+            row,
+            text=f"{opt['value_label']} ({opt['unit']}):"
+        ).pack(side=tk.LEFT, padx=5)
+        self.option_values[opt['id']] = tk.StringVar(value=str(opt['default']))
+        self.option_spinboxes[opt['id']] = ttk.Spinbox(
+            row,
+            from_=opt['min'],
+            to=opt['max'],
+            increment=opt.get('step', 1),
+            textvariable=self.option_values[opt['id']],
+            width=6,
+            state='normal' if enabled else 'disabled'
+        )
+        self.option_spinboxes[opt['id']].pack(side=tk.LEFT, padx=5)
+
+    def on_first_frame(self, event):
+        """Primer cuadro visible: arranca la carga en segundo plano"""
+        if event.widget is not self.root or 'first_frame' in self.profile.marks:
+            return
+        self.profile.mark('first_frame')
+        self.runner.submit('startup', self.load_startup_state)
+
+    def load_startup_state(self, progress=None):
+        """Detección y configuración previa (se ejecuta en el hilo de trabajo)"""
+        import psutil
+        self.attach_log_file()
+        has_previous_config, previous_config = BrowserManager.check_previous_config()
+        return {
+            'installed': BrowserManager.detect_installed_browsers(),
+            'has_previous_config': has_previous_config,
+            'previous_config': previous_config,
+            'total_memory': psutil.virtual_memory().total // (1024 * 1024 * 1024),
+        }
+
+    def finish_startup(self, state):
+        """Completa la interfaz con el resultado de la carga en segundo plano"""
+        total_memory = state['total_memory']
+        self.memory_spinbox.configure(to=total_memory)
+        self.memory_max_label.configure(text=f"(Máximo disponible: {total_memory} GB)")
+        self.browsers_frame.configure(text="Navegadores")
+        self.check_browsers(state['installed'])
+
+        self.has_previous_config = state['has_previous_config']
+        self.previous_config = state['previous_config']
+        if self.has_previous_config:
+            # Indicador de configuración previa
+            self.config_label = ttk.Label(
+                self.main_frame,
+                text="✓ Configuración anterior detectada",
+                foreground='green'
+            )
+            self.config_label.pack(pady=5, before=self.browsers_frame)
+            ttk.Button(
+                self.buttons_frame,
+                text="Restablecer valores por defecto",
+                command=self.reset_to_defaults
+            ).pack(side=tk.LEFT, padx=5, before=self.apply_button)
+            ttk.Button(
+                self.buttons_frame,
+                text="Restaurar valores originales",
+                command=self.restore_originals
+            ).pack(side=tk.LEFT, padx=5, before=self.apply_button)
+            self.load_previous_config()
+            self.log_message("Configuración anterior cargada")
+
+        self.apply_button.configure(state='normal')
+        self.start_telemetry()
+        self.profile.mark('interactive')
+        logging.info(f"Arranque: {self.profile.report()}")
+
+        if self.exit_when_ready:
+            print(json.dumps(self.profile.report()), flush=True)
+            self.root.after(0, self.root.quit)
+        elif self.has_previous_config:
+            # Mostrar mensaje informativo
+            messagebox.showinfo(
+                "Configuración Anterior",
+                "Se ha detectado una configuración anterior y se ha cargado.\n\n"
+                "Puede realizar cambios o aplicar la misma configuración nuevamente."
+            )
+
+    def start_telemetry(self):
+        """Inicia el muestreo de memoria en segundo plano"""
+        from telemetry import MemorySampler, HistoryStore
+        try:
+            store = HistoryStore(os.path.join(get_data_dir(), 'history.db'))
+        except Exception as e:
+            logging.error(f"No se pudo abrir el historial de telemetría: {e}")
+            store = None
+        self.sampler = MemorySampler(store=store)
+        self.sampler.start()
+        self.root.after(1000, self.refresh_usage)
+
+    def refresh_usage(self):
+        """Actualiza la etiqueta de uso con la última muestra de cada navegador"""
+        parts = []
+        for browser, sample in self.sampler.latest().items():
+            if sample and sample['processes']:
+                parts.append(
+                    f"{browser}: {sample['rss'] / (1024 * 1024):.0f} MB, "
+                    f"{sample['cpu_percent']:.0f}% CPU, {int(sample['processes'])} procesos"
+                )
+        self.usage_var.set("Uso actual: " + (" | ".join(parts) if parts else "sin navegadores en ejecución"))
+        self.root.after(int(self.sampler.effective_interval * 1000), self.refresh_usage)
+
+    def shutdown(self):
+        """Detiene los servicios en segundo plano"""
+        self.runner.shutdown(wait=True)
+        if self.governor is not None:
+            self.governor.stop()
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        if self.limiter is not None:
+            self.limiter.stop()
+        if self.sampler is not None:
+            self.sampler.stop()
+            if self.sampler.store is not None:
+                self.sampler.store.close()
 
     def setup_logging(self):
         logging.basicConfig(
@@ -175,15 +396,39 @@ class SpeedChromeGUI:
             datefmt='%Y-%m-%d %H:%M:%S'
         )
 
-    def check_browsers(self):
-        installed_browsers = BrowserManager.detect_installed_browsers()
+    def attach_log_file(self):
+        """Log completo en archivo rotativo (la vista de la ventana está acotada)"""
+        import logging.handlers
+        try:
+            file_handler = logging.handlers.RotatingFileHandler(
+                os.path.join(get_data_dir(), 'speedchrome.log'),
+                maxBytes=1024 * 1024, backupCount=3, encoding='utf-8'
+            )
+        except OSError as e:
+            logging.error(f"No se pudo abrir el archivo de log: {e}")
+            return
+        file_handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(levelname)s - %(message)s', '%Y-%m-%d %H:%M:%S'
+        ))
+        logging.getLogger().addHandler(file_handler)
+
+    def check_browsers(self, installed_browsers=None):
+        if installed_browsers is None:
+            installed_browsers = BrowserManager.detect_installed_browsers()
+        self.installed = installed_browsers
         for browser, installed in installed_browsers.items():
-            if browser in self.browser_vars:
-                for child in self.browsers_frame.winfo_children():
-                    if browser in child.cget('text'):
-                        child.configure(state='normal' if installed else 'disabled')
-                        if not installed:
-                            self.browser_vars[browser].set(False)
+            if browser in self.browser_checks:
+                check = self.browser_checks[browser]
+                check.configure(state='normal' if installed else 'disabled')
+                if installed:
+                    check.pack(anchor=tk.W, padx=5, pady=2)
+                else:
+                    check.pack_forget()
+                    self.browser_vars[browser].set(False)
+        if any(installed_browsers.values()):
+            self.no_browsers_label.pack_forget()
+        else:
+            self.no_browsers_label.configure(text="No se detectaron navegadores compatibles")
 
     def load_previous_config(self):
         """Carga la configuración anterior en la interfaz"""
@@ -195,42 +440,360 @@ class SpeedChromeGUI:
                     date_str = last_update.strftime("%d/%m/%Y %H:%M")
                     
                     # Verificar si el navegador está instalado
-                    browser_installed = any(
-                        child.cget('state') != 'disabled' 
-                        for child in self.browsers_frame.winfo_children() 
-                        if browser in child.cget('text')
-                    )
-                    
-                    if browser_installed:
+                    if self.installed.get(browser):
                         self.browser_vars[browser].set(True)
                         self.log_message(f"Configuración encontrada para {browser} (última modificación: {date_str})")
                         
-                        # Cargar configuración de memoria
-                        if 'memory_limit' in config:
-                            memory_gb = config['memory_limit'] // 1024  # Convertir MB a GB
-                            self.memory_var.set(True)
-                            self.memory_limit_var.set(str(memory_gb))
-                        
-                        # Cargar otras configuraciones
-                        if 'disable_preload' in config:
-                            self.preload_var.set(bool(config['disable_preload']))
-                        
-                        if 'disable_hardware' in config:
-                            self.hardware_var.set(bool(config['disable_hardware']))
-            
-            # Mostrar mensaje informativo
-            messagebox.showinfo(
-                "Configuración Anterior",
-                "Se ha detectado una configuración anterior y se ha cargado.\n\n"
-                "Puede realizar cambios o aplicar la misma configuración nuevamente."
-            )
-            
+                        for opt in OPTIMIZATIONS:
+                            if opt['id'] in config:
+                                self.set_option(opt, config[opt['id']])
+
         except Exception as e:
             self.log_message(f"Error al cargar configuración anterior: {e}")
 
-    def toggle_memory_options(self):
-        state = 'normal' if self.memory_var.get() else 'disabled'
-        self.memory_spinbox.configure(state=state)
+    def selected_or_installed(self):
+        """Navegadores marcados o, si no hay ninguno, todos los instalados"""
+        return [
+            browser for browser, var in self.browser_vars.items()
+            if var.get() and self.installed.get(browser)
+        ] or [browser for browser, installed in self.installed.items() if installed]
+
+    def recommend_limits(self):
+        """Calcula límites por navegador a partir del uso medido"""
+        selected = self.selected_or_installed()
+        if not selected:
+            messagebox.showwarning("Advertencia", "No se detectaron navegadores para recomendar límites.")
+            return
+        self.log_message("Calculando límites recomendados...")
+        self.runner.submit('recommend', self.run_recommend, selected)
+
+    def run_recommend(self, selected_browsers, progress=None):
+        """Recomendación de límites (se ejecuta en el hilo de trabajo)"""
+        from memory_sizing import recommend
+        store = self.sampler.store if self.sampler is not None else None
+        return recommend(selected_browsers, store=store, sampler=self.sampler)
+
+    def show_recommendation(self, result):
+        for reason in result['reasons']:
+            self.log_message(f"  {reason}")
+        limits = {browser: entry['limit_mb'] for browser, entry in result['browsers'].items()}
+        for browser, limit in limits.items():
+            self.log_message(f"✓ Límite recomendado para {browser}: {limit} MB")
+        self.recommended_limits = limits
+        self.recommended_gb = max(max(limits.values()) // 1024, 1)
+        self.memory_var.set(True)
+        self.toggle_option('memory_limit')
+        self.memory_limit_var.set(str(self.recommended_gb))
+        if len(set(limits.values())) > 1:
+            self.log_message(
+                "Se aplicará el límite recomendado de cada navegador; "
+                "cambie el valor para usar uno único"
+            )
+
+    def analyze_cache(self):
+        """Mide la caché de disco de los perfiles en segundo plano"""
+        self.log_message("Analizando caché de disco...")
+        self.runner.submit('cache', self.run_cache, self.selected_or_installed(), False)
+
+    def purge_cache(self):
+        """Vacía la caché de los navegadores marcados que estén cerrados"""
+        # Acción destructiva: solo sobre los navegadores marcados, nunca sobre todos por omisión
+        selected = [
+            browser for browser, var in self.browser_vars.items()
+            if var.get() and self.installed.get(browser)
+        ]
+        if not selected:
+            messagebox.showwarning("Advertencia", "Marque los navegadores cuya caché desea vaciar.")
+            return
+        names = "\n".join(
+            f"  - {BrowserManager.BROWSER_PATHS[browser]['friendly_name']}" for browser in selected
+        )
+        if not messagebox.askyesno(
+            "Vaciar caché",
+            f"Se borrará la caché de disco de estos navegadores si no están abiertos:\n\n{names}\n\n"
+            "¿Desea continuar?"
+        ):
+            return
+        self.runner.submit('cache', self.run_cache, selected, True)
+
+    def run_cache(self, browsers, purge_cache, progress=None):
+        """Análisis (y vaciado opcional) de la caché (se ejecuta en el hilo de trabajo)"""
+        from disk_cache import analyze, purge
+        analysis = analyze(browsers)
+        if not analysis['browsers']:
+            self.log_message("No se encontraron perfiles de los navegadores seleccionados")
+            return analysis
+        for browser, info in analysis['browsers'].items():
+            self.log_message(
+                f"{browser}: {info['bytes'] / (1024 * 1024):.0f} MB de caché en "
+                f"{len(info['profiles'])} perfil(es), {info['files']} archivos"
+            )
+        self.log_message(
+            f"Recorrido: {analysis['files']} archivos en {analysis['elapsed']:.2f}s "
+            f"({analysis['files_per_second']:.0f} archivos/s)"
+        )
+        if purge_cache:
+            for browser, result in purge(analysis).items():
+                if result['skipped']:
+                    self.log_message(f"- {browser} está abierto; ciérrelo para vaciar su caché")
+                else:
+                    self.log_message(f"✓ {browser}: {result['reclaimed'] / (1024 * 1024):.0f} MB liberados")
+        return analysis
+
+    def show_breakdown(self):
+        """Ventana con memoria y CPU por tipo de proceso, actualizada cada pocos segundos"""
+        if self.breakdown_window is not None:
+            self.breakdown_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Desglose por tipo de proceso")
+        window.geometry("560x480")
+        self.breakdown_window = window
+
+        frame = ttk.Frame(window, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+        self.breakdown_uss_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            frame,
+            text="Medir memoria exclusiva (USS, más lento)",
+            variable=self.breakdown_uss_var
+        ).pack(anchor=tk.W)
+
+        columns = ('processes', 'memory', 'cpu')
+        self.breakdown_tree = ttk.Treeview(frame, columns=columns, height=10)
+        self.breakdown_tree.heading('#0', text="Navegador / tipo")
+        self.breakdown_tree.heading('processes', text="Procesos")
+        self.breakdown_tree.heading('memory', text="Memoria (MB)")
+        self.breakdown_tree.heading('cpu', text="CPU (%)")
+        for column in columns:
+            self.breakdown_tree.column(column, width=90, anchor=tk.E)
+        self.breakdown_tree.pack(fill=tk.BOTH, expand=True, pady=5)
+
+        ttk.Label(frame, text="Procesos que más memoria usan:").pack(anchor=tk.W)
+        top_columns = ('pid', 'type', 'memory', 'cpu')
+        self.breakdown_top = ttk.Treeview(frame, columns=top_columns, show='headings', height=6)
+        for column, title in zip(top_columns, ("PID", "Tipo", "Memoria (MB)", "CPU (%)")):
+            self.breakdown_top.heading(column, text=title)
+            self.breakdown_top.column(column, width=110, anchor=tk.E if column != 'type' else tk.W)
+        self.breakdown_top.pack(fill=tk.BOTH, expand=True, pady=5)
+
+        def on_close():
+            self.breakdown_window = None
+            if self.breakdown_after is not None:
+                self.root.after_cancel(self.breakdown_after)
+                self.breakdown_after = None
+            window.destroy()
+
+        window.protocol("WM_DELETE_WINDOW", on_close)
+        self.refresh_breakdown()
+
+    def refresh_breakdown(self):
+        self.breakdown_after = None
+        if self.breakdown_window is None:
+            return
+        self.runner.submit('attribution', self.run_breakdown, self.breakdown_uss_var.get())
+
+    def schedule_breakdown(self):
+        """Programa la próxima actualización del desglose (una sola a la vez)"""
+        if self.breakdown_window is None or self.breakdown_after is not None:
+            return
+        self.breakdown_after = self.root.after(3000, self.refresh_breakdown)
+
+    def run_breakdown(self, uss, progress=None):
+        """Muestra del desglose (se ejecuta en el hilo de trabajo)"""
+        if self.attributor is None:
+            from process_attribution import ProcessAttributor
+            self.attributor = ProcessAttributor()
+        return self.attributor.sample(uss=uss)
+
+    def show_breakdown_result(self, result):
+        if self.breakdown_window is None:
+            return
+        measure = 'uss' if result['uss'] else 'rss'
+        tree, top = self.breakdown_tree, self.breakdown_top
+        tree.delete(*tree.get_children())
+        top.delete(*top.get_children())
+        offenders = []
+        for browser, info in result['browsers'].items():
+            node = tree.insert('', tk.END, text=browser, open=True, values=(
+                info['processes'], f"{info[measure] / (1024 * 1024):.0f}", f"{info['cpu_percent']:.1f}"))
+            for category, bucket in info['by_type'].items():
+                tree.insert(node, tk.END, text=category, values=(
+                    bucket['processes'], f"{bucket[measure] / (1024 * 1024):.0f}",
+                    f"{bucket['cpu_percent']:.1f}"))
+            offenders.extend(info['top'])
+        if not result['browsers']:
+            tree.insert('', tk.END, text="Sin navegadores en ejecución", values=('', '', ''))
+        offenders.sort(key=lambda record: record[measure] or 0, reverse=True)
+        for record in offenders[:10]:
+            kind = f"{record['type']} ({record['detail']})" if record['detail'] else record['type']
+            top.insert('', tk.END, values=(
+                record['pid'], kind, f"{(record[measure] or 0) / (1024 * 1024):.0f}",
+                f"{record['cpu_percent']:.1f}"))
+        self.schedule_breakdown()
+
+    def show_extensions(self):
+        """Ventana con las extensiones de todos los perfiles ordenadas por costo"""
+        if self.extensions_window is not None:
+            self.extensions_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Extensiones por costo")
+        window.geometry("900x420")
+        self.extensions_window = window
+
+        frame = ttk.Frame(window, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+        columns = ('id', 'profile', 'memory', 'cpu', 'notes')
+        self.extensions_tree = ttk.Treeview(frame, columns=columns, height=14)
+        self.extensions_tree.heading('#0', text="Extensión")
+        for column, title in zip(columns, ("ID", "Navegador / perfil", "Memoria (MB)", "CPU (%)", "Notas")):
+            self.extensions_tree.heading(column, text=title)
+        self.extensions_tree.column('#0', width=200)
+        self.extensions_tree.column('id', width=180)
+        self.extensions_tree.column('profile', width=140)
+        self.extensions_tree.column('memory', width=90, anchor=tk.E)
+        self.extensions_tree.column('cpu', width=70, anchor=tk.E)
+        self.extensions_tree.column('notes', width=200)
+        self.extensions_tree.pack(fill=tk.BOTH, expand=True, pady=5)
+
+        self.extensions_status = tk.StringVar(value="Leyendo perfiles...")
+        ttk.Label(frame, textvariable=self.extensions_status, wraplength=860).pack(anchor=tk.W)
+        ttk.Button(frame, text="Actualizar", command=self.refresh_extensions).pack(anchor=tk.E)
+
+        def on_close():
+            self.extensions_window = None
+            window.destroy()
+
+        window.protocol("WM_DELETE_WINDOW", on_close)
+        self.refresh_extensions()
+
+    def refresh_extensions(self):
+        if self.extensions_window is None:
+            return
+        self.extensions_status.set("Leyendo perfiles...")
+        self.runner.submit('extensions', self.run_extensions)
+
+    def run_extensions(self, progress=None):
+        """Perfil de extensiones (se ejecuta en el hilo de trabajo)"""
+        if self.extension_profiler is None:
+            from extension_profiler import ExtensionProfiler
+            self.extension_profiler = ExtensionProfiler()
+        return self.extension_profiler.profile()
+
+    def show_extensions_result(self, result):
+        if self.extensions_window is None:
+            return
+        tree = self.extensions_tree
+        tree.delete(*tree.get_children())
+        for ext in result['extensions']:
+            notes = [note for note, flag in (
+                ("deshabilitada", not ext['enabled']),
+                ("estimado", ext['attribution'] == 'shared'),
+                ("scripts en todas las páginas", ext['all_urls']),
+                ("fondo persistente", ext['background'] == 'persistent'),
+            ) if flag]
+            memory = f"{ext['rss'] / (1024 * 1024):.0f}" if ext['attribution'] else ''
+            cpu = f"{ext['cpu_percent']:.1f}" if ext['attribution'] else ''
+            tree.insert('', tk.END, text=ext['name'], values=(
+                ext['id'], f"{ext['browser']} / {ext['profile']}", memory, cpu, ", ".join(notes)))
+        shared = any(info['attribution'] == 'shared' for info in result['browsers'].values())
+        self.extensions_status.set(
+            f"{len(result['extensions'])} extensiones en "
+            f"{sum(info['profiles'] for info in result['browsers'].values())} perfiles. "
+            + ("Los procesos de extensión no indican a qué extensión pertenecen: con varias "
+               "extensiones con fondo su costo se reparte (estimado). " if shared else "")
+            + "El ID de cada extensión sirve para bloquearla con ExtensionInstallBlocklist."
+        )
+
+    def toggle_option(self, opt_id):
+        """Habilita el valor de una optimización numérica según su casilla"""
+        if opt_id in self.option_spinboxes:
+            state = 'normal' if self.option_vars[opt_id].get() else 'disabled'
+            self.option_spinboxes[opt_id].configure(state=state)
+
+    def set_option(self, opt, value):
+        """Muestra un valor guardado (unidad interna; 0 = desactivada)"""
+        if opt['id'] not in self.option_vars:
+            return
+        self.option_vars[opt['id']].set(bool(value))
+        if opt['type'] == 'int':
+            if value:
+                self.option_values[opt['id']].set(str(max(value // opt['scale'], opt['min'])))
+            self.toggle_option(opt['id'])
+
+    def toggle_governor(self):
+        """Inicia o detiene el gobernador de memoria"""
+        from memory_governor import MemoryGovernor
+        if self.governor_var.get():
+            budgets = MemoryGovernor.load_budgets()
+            if not budgets:
+                messagebox.showwarning(
+                    "Gobernador de memoria",
+                    "No hay límites de memoria guardados.\n"
+                    "Aplique una configuración con límite de memoria primero."
+                )
+                self.governor_var.set(False)
+                return
+            self.governor = MemoryGovernor(budgets)
+            self.governor.start()
+            self.log_message("Gobernador de memoria activado")
+        elif self.governor is not None:
+            self.governor.stop()
+            self.governor = None
+            self.log_message("Gobernador de memoria desactivado")
+
+    def toggle_scheduler(self):
+        """Inicia o detiene el planificador de prioridades"""
+        from priority_scheduler import PriorityScheduler, load_policy
+        if self.scheduler_var.get():
+            try:
+                policy = load_policy()
+            except ValueError as e:
+                messagebox.showerror("Planificador de prioridades", str(e))
+                self.scheduler_var.set(False)
+                return
+            self.scheduler = PriorityScheduler(policy)
+            self.scheduler.start()
+            self.log_message("Planificador de prioridades activado")
+        elif self.scheduler is not None:
+            self.scheduler.stop()
+            self.scheduler = None
+            self.log_message("Planificador de prioridades desactivado, prioridades restauradas")
+
+    def toggle_limiter(self):
+        """Mete cada navegador en un contenedor con el límite de memoria elegido"""
+        from resource_limits import ResourceLimiter
+        if self.limiter_var.get():
+            try:
+                gb = int(self.memory_limit_var.get())
+            except ValueError:
+                gb = 0
+            browsers = self.selected_or_installed()
+            if gb <= 0 or not browsers:
+                messagebox.showwarning("Límite estricto", "Elija un límite de memoria y un navegador instalado.")
+                self.limiter_var.set(False)
+                return
+            limits = {browser: {'memory_max': gb * 1024 ** 3, 'cpu_percent': None} for browser in browsers}
+            self.limiter = ResourceLimiter(limits, on_event=lambda event: self.log_message(
+                f"{event['browser']}: el contenedor llegó a memory.{event['event']} ({event['count']} veces)"))
+            active = [browser for browser, ok in self.limiter.setup().items() if ok]
+            if not active:
+                self.limiter.release()
+                self.limiter = None
+                messagebox.showerror(
+                    "Límite estricto",
+                    "No se pudo crear el contenedor de recursos.\n"
+                    "En Linux se necesita cgroup v2 con permisos de escritura."
+                )
+                self.limiter_var.set(False)
+                return
+            self.limiter.start()
+            self.log_message(f"Límite estricto de {gb} GB activado: {', '.join(active)}")
+        elif self.limiter is not None:
+            self.limiter.stop()
+            self.limiter = None
+            self.log_message("Límite estricto desactivado")
 
     def reset_to_defaults(self):
         """Restablece todos los valores a su configuración por defecto"""
@@ -242,13 +805,12 @@ class SpeedChromeGUI:
             for var in self.browser_vars.values():
                 var.set(False)
             
-            # Restablecer opciones de memoria
-            self.memory_var.set(True)
-            self.memory_limit_var.set("4")
-            
-            # Restablecer otras opciones
-            self.preload_var.set(True)
-            self.hardware_var.set(True)
+            # Restablecer las optimizaciones del catálogo
+            for opt_id, value in default_options().items():
+                opt = OPTIMIZATIONS_BY_ID[opt_id]
+                if opt['type'] == 'int' and opt_id in self.option_values:
+                    self.option_values[opt_id].set(str(opt['default']))
+                self.set_option(opt, value)
             
             self.log_message("Valores restablecidos a configuración por defecto")
 
@@ -332,9 +894,9 @@ class SpeedChromeGUI:
         about_window.geometry(f'{width}x{height}+{x}+{y}')
 
     def log_message(self, message):
+        # Seguro desde cualquier hilo: la vista vuelca las líneas en el hilo de Tk
         timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
+        self.log_view.append(f"[{timestamp}] {message}")
         logging.info(message)
 
     def apply_changes(self):
@@ -347,11 +909,7 @@ class SpeedChromeGUI:
 
         selected_browsers = [
             browser for browser, var in self.browser_vars.items() 
-            if var.get() and any(
-                child.cget('state') != 'disabled' 
-                for child in self.browsers_frame.winfo_children() 
-                if browser in child.cget('text')
-            )
+            if var.get() and self.installed.get(browser)
         ]
 
         if not selected_browsers:
@@ -370,69 +928,227 @@ class SpeedChromeGUI:
             ):
                 return
 
+        try:
+            options = self.collect_options()
+        except ValueError as e:
+            messagebox.showerror("Valor no válido", str(e))
+            return
+        self.apply_button.configure(state='disabled')
+        self.progress_bar.configure(maximum=len(selected_browsers), value=0)
         self.log_message("Iniciando optimización...")
-        
-        for browser in selected_browsers:
-            browser_path = BrowserManager.get_browser_path(browser)
-            if not browser_path:
-                self.log_message(f"⚠ No se pudo encontrar la ruta de registro para {browser}")
-                continue
-                
-            self.log_message(f"Configurando {browser}...")
+        self.runner.submit('apply', self.run_apply, selected_browsers, options)
 
-            if self.memory_var.get():
-                memory_limit = int(self.memory_limit_var.get()) * 1024  # Convertir a MB
-                success = RegistryManager.set_registry_value(
-                    browser_path, "Process", "MaxMemPerProcess", memory_limit
-                )
-                self.log_message(f"✓ Límite de memoria configurado a {memory_limit}MB: {success}")
+    def collect_options(self):
+        """Lee las opciones de la interfaz (en el hilo de Tk).
 
-            if self.preload_var.get():
-                success = RegistryManager.set_registry_value(
-                    browser_path, "Prefetch", "EnablePrefetch", 0
-                )
-                self.log_message(f"✓ Precarga deshabilitada: {success}")
+        Retorna {id de optimización: valor en la unidad guardada o None}.
+        """
+        options = {}
+        for opt in OPTIMIZATIONS:
+            if opt['id'] not in self.option_vars:
+                # Sin efecto en este sistema: no se muestra
+                options[opt['id']] = None
+                continue
+            value = self.option_vars[opt['id']].get()
+            if opt['type'] == 'int' and value:
+                text = self.option_values[opt['id']].get()
+                try:
+                    value = int(text) * opt['scale']  # Convertir a la unidad guardada
+                except ValueError:
+                    raise ValueError(f"{opt['label']}: '{text}' no es un número entero")
+            # Lanza ValueError si el valor está fuera de rango
+            options[opt['id']] = validate(opt, value)
+        # La recomendación vale mientras no se cambie el valor mostrado
+        if self.recommended_limits and self.memory_limit_var.get() == str(self.recommended_gb):
+            options['memory_limits'] = dict(self.recommended_limits)
+        return options
 
-            if self.hardware_var.get():
-                success = RegistryManager.set_registry_value(
-                    browser_path, "HardwareAcceleration", 
-                    "EnableHardwareAcceleration", 0
-                )
-                self.log_message(f"✓ Aceleración hardware deshabilitada: {success}")
-
-            # Guardar la configuración actual
-            config = {
-                'memory_limit': int(self.memory_limit_var.get()) * 1024,
-                'disable_preload': int(self.preload_var.get()),
-                'disable_hardware': int(self.hardware_var.get()),
-                'last_update': int(datetime.now().timestamp())
-            }
-            if BrowserManager.save_config(browser, config):
-                self.log_message(f"✓ Configuración guardada para {browser}")
+    def run_apply(self, selected_browsers, options, progress=None):
+        """Escribe solo las diferencias de cada navegador (se ejecuta en el hilo de trabajo).
+
+        Retorna los navegadores que necesitan reiniciarse.
+        """
+        from apply_planner import plan_browser, apply_plan, describe
+        restart = []
+        for index, browser in enumerate(selected_browsers, 1):
+            plan = plan_browser(browser, options)
+            if plan.get('error'):
+                self.log_message(f"⚠ No se pudo encontrar la ruta de registro para {browser}")
             else:
-                self.log_message(f"⚠ No se pudo guardar la configuración para {browser}")
+                result = apply_plan(plan)
+                if result is None:
+                    self.log_message(f"- {browser} ya tenía esta configuración")
+                elif result:
+                    for line in describe(plan):
+                        self.log_message(f"✓ {line}")
+                    if plan['restart']:
+                        restart.append(browser)
+                else:
+                    self.log_message(f"⚠ No se pudieron aplicar los cambios para {browser} (revertidos)")
 
-        if messagebox.askyesno(
-            "Reiniciar navegadores",
-            "¿Desea reiniciar los navegadores ahora?"
+            if progress:
+                progress('progress', (index, len(selected_browsers)))
+        return restart
+
+    def preview_changes(self):
+        """Muestra en el log lo que haría Aplicar, sin escribir nada"""
+        selected_browsers = [
+            browser for browser, var in self.browser_vars.items()
+            if var.get() and self.installed.get(browser)
+        ]
+        if not selected_browsers:
+            messagebox.showwarning("Advertencia", "Por favor seleccione al menos un navegador.")
+            return
+        try:
+            options = self.collect_options()
+        except ValueError as e:
+            messagebox.showerror("Valor no válido", str(e))
+            return
+        self.log_message("Vista previa de los cambios:")
+        self.runner.submit('preview', self.run_preview, selected_browsers, options)
+
+    def run_preview(self, selected_browsers, options, progress=None):
+        """Calcula el plan sin escribir (se ejecuta en el hilo de trabajo)"""
+        from apply_planner import plan_changes, describe
+        plans = plan_changes(selected_browsers, options)
+        for plan in plans:
+            for line in describe(plan):
+                self.log_message(f"  {line}")
+        return plans
+
+    def restore_originals(self):
+        """Devuelve los navegadores seleccionados a sus valores previos a SpeedChrome"""
+        selected = [browser for browser, var in self.browser_vars.items() if var.get()]
+        if not selected:
+            messagebox.showwarning("Advertencia", "Por favor, seleccione al menos un navegador")
+            return
+        if not messagebox.askyesno(
+            "Restaurar valores originales",
+            "Se restaurarán los valores de registro que había antes de usar SpeedChrome "
+            f"en: {', '.join(selected)}.\n\n¿Desea continuar?"
         ):
-            results = BrowserManager.kill_browsers(selected_browsers)
-            for browser, killed in results.items():
+            return
+        self.apply_button.configure(state='disabled')
+        self.progress_bar.configure(mode='determinate', value=0)
+        self.runner.submit('restore', self.run_restore, selected)
+
+    def run_restore(self, selected_browsers, progress=None):
+        """Restaura los valores originales (se ejecuta en el hilo de trabajo)"""
+        for index, browser in enumerate(selected_browsers, 1):
+            if BrowserManager.restore_original(browser):
+                self.log_message(f"✓ Valores originales restaurados para {browser}")
+            else:
+                self.log_message(f"⚠ No se pudieron restaurar los valores de {browser}")
+            if progress:
+                progress('progress', (index, len(selected_browsers)))
+        return selected_browsers
+
+    def run_restart(self, selected_browsers, progress=None):
+        """Cierra con normalidad y vuelve a abrir los navegadores (se ejecuta en el hilo de trabajo)"""
+        from sessions import interactive_user
+        # Solo los de este usuario: en un servidor de terminales hay otras sesiones
+        user = interactive_user()
+        results = BrowserManager.restart_browsers(selected_browsers, users=[user] if user else None)
+        for browser, result in results.items():
+            if result['kept']:
+                self.log_message(f"⚠ {browser}: {result['kept']} ventanas quedaron abiertas "
+                                 "porque no se podían volver a abrir")
+            if not result['found']:
+                if not result['kept']:
+                    self.log_message(f"- {browser} no estaba en ejecución")
+                continue
+            if result['remaining']:
                 self.log_message(
-                    f"{'✓' if killed else '✗'} {browser} "
-                    f"{'cerrado' if killed else 'no pudo ser cerrado'}"
+                    f"✗ {browser} no pudo ser cerrado "
+                    f"({result['remaining']} de {result['found']} procesos siguen activos)"
                 )
+                continue
+            forced = f", {result['forced']} forzados" if result['forced'] else ""
+            self.log_message(
+                f"✓ {browser} cerrado ({result['found']} procesos en "
+                f"{result['close_seconds']:.2f}s{forced})"
+            )
+            if result['other_sessions']:
+                self.log_message(f"- {browser}: {result['other_sessions']} ventanas de otros usuarios "
+                                 "no se reabren (las abre cada usuario)")
+            for launch in result['launches']:
+                if not launch['relaunched']:
+                    self.log_message(f"⚠ No se pudo volver a abrir {browser}: {launch['error']}")
+                elif launch.get('downtime_seconds') is None:
+                    self.log_message(f"⚠ {browser} se abrió pero no mostró una ventana a tiempo")
+                else:
+                    steady = (f"; memoria estable ({launch['steady_rss_mb']:.0f} MB) a los "
+                              f"{launch['steady_seconds']:.1f}s" if launch['steady_seconds'] is not None else "")
+                    self.log_message(
+                        f"✓ {browser} reabierto con la sesión anterior: "
+                        f"{launch['downtime_seconds']:.1f}s sin navegador{steady}"
+                    )
+        return results
 
-        self.log_message("¡Optimización completada!")
+    def handle_task_event(self, task, kind, payload):
+        """Recibe en el hilo de Tk los eventos de las tareas en segundo plano"""
+        if kind == 'progress':
+            done, total = payload
+            self.progress_bar.configure(maximum=total, value=done)
+        elif task == 'attribution':
+            if kind == 'error':
+                self.log_message(f"⚠ Error al medir procesos: {payload}")
+                self.schedule_breakdown()
+            else:
+                self.show_breakdown_result(payload)
+        elif task == 'extensions':
+            if kind == 'error':
+                self.log_message(f"⚠ Error al leer las extensiones: {payload}")
+            else:
+                self.show_extensions_result(payload)
+        elif task == 'startup':
+            if kind == 'error':
+                self.log_message(f"⚠ Error al detectar navegadores: {payload}")
+                payload = {'installed': {}, 'has_previous_config': False,
+                           'previous_config': {}, 'total_memory': 64}
+            self.finish_startup(payload)
+        elif kind == 'error':
+            self.log_message(f"⚠ Error durante la operación: {payload}")
+            self.finish_operation("Operación interrumpida")
+        elif task == 'preview':
+            pass
+        elif task == 'recommend':
+            self.show_recommendation(payload)
+        elif task == 'cache':
+            pass
+        elif task == 'apply':
+            self.has_previous_config, self.previous_config = BrowserManager.check_previous_config()
+            if not payload:
+                self.finish_operation("¡Optimización completada! No hace falta reiniciar ningún navegador.")
+            elif messagebox.askyesno(
+                "Reiniciar navegadores",
+                f"Los cambios requieren reiniciar: {', '.join(payload)}.\n\n"
+                "¿Desea reiniciar los navegadores ahora?"
+            ):
+                self.progress_bar.configure(mode='indeterminate')
+                self.progress_bar.start()
+                self.runner.submit('restart', self.run_restart, payload)
+            else:
+                self.finish_operation()
+        elif task == 'restart':
+            self.finish_operation()
+        elif task == 'restore':
+            self.has_previous_config, self.previous_config = BrowserManager.check_previous_config()
+            self.finish_operation("Restauración completada. Reinicie los navegadores para aplicarla.")
+
+    def finish_operation(self, message="¡Optimización completada!"):
+        self.progress_bar.stop()
+        self.progress_bar.configure(mode='determinate', value=0)
+        self.apply_button.configure(state='normal')
+        self.log_message(message)
 
     def is_admin(self):
-        try:
-            return ctypes.windll.shell32.IsUserAnAdmin()
-        except:
-            return False
+        return is_admin()
 
 def main():
-    if not ctypes.windll.shell32.IsUserAnAdmin():
+    # --startup-profile: imprime los tiempos de arranque en JSON y sale
+    startup_profile = '--startup-profile' in sys.argv[1:]
+    if not is_admin():
         messagebox.showerror(
             "Error",
             "Este programa requiere privilegios de administrador.\n"
@@ -440,9 +1156,11 @@ def main():
         )
         return
 
+    profile = StartupProfile()
     root = tk.Tk()
-    app = SpeedChromeGUI(root)
+    app = SpeedChromeGUI(root, profile=profile, exit_when_ready=startup_profile)
     root.mainloop()
+    app.shutdown()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,286 @@
+import os
+import time
+import logging
+import argparse
+import threading
+import psutil
+from typing import Callable, Dict, List, Optional
+from browser_manager import BrowserManager
+from process_utils import ProcessSnapshot, BACKGROUND_PRIORITY, process_category
+from priority_scheduler import foreground_window_pid, renderer_hidden
+from sessions import OwnerResolver, interactive_user, session_id
+from telemetry import private_bytes
+
+class MemoryGovernor:
+    """Mantiene la memoria de cada navegador dentro de su presupuesto.
+
+    El presupuesto es el ``memory_limit`` (MB) guardado por ``save_config``.
+    Cuando la memoria privada del navegador lo supera, se escala un nivel por
+    vez (como mucho cada ``cooldown`` segundos):
+
+    1. bajar la prioridad de las pestañas en segundo plano;
+    2. terminar las ``victims_per_step`` pestañas en segundo plano más grandes.
+
+    Suspender un proceso no libera su memoria, por eso no es un nivel.
+
+    Solo se tocan renderers de pestañas: nunca el proceso raíz, la GPU, las
+    extensiones ni las pestañas visibles. Igual que en ``PriorityScheduler``,
+    una pestaña está en segundo plano si su navegador no tiene la ventana en
+    primer plano (solo para los navegadores de esta sesión y si se puede
+    saber) o si el navegador la marcó como oculta. Si una pestaña vuelve a
+    verse se le restaura la prioridad enseguida; cuando la memoria baja de
+    ``low_watermark`` por el presupuesto se restauran todas.
+
+    Solo se cuentan los navegadores de ``user`` (por defecto quien ejecuta
+    SpeedChrome; con sudo, quien lo llamó): el presupuesto es de una sesión,
+    no de todas las de un servidor de terminales.
+    """
+
+    LEVELS = ('normal', 'lower_priority', 'terminate')
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, interval: float = 5.0,
+                 low_watermark: float = 0.9, cooldown: float = 15.0,
+                 victims_per_step: int = 2, max_terminations_per_hour: int = 20,
+                 dry_run: bool = False, process_iter: Callable = psutil.process_iter,
+                 foreground: Callable[[], Optional[int]] = foreground_window_pid,
+                 session: Callable[[int], Optional[int]] = session_id,
+                 user: Optional[str] = None):
+        self.budgets = budgets if budgets is not None else self.load_budgets()
+        self.interval = interval
+        self.low_watermark = low_watermark
+        self.cooldown = cooldown
+        self.victims_per_step = victims_per_step
+        self.max_terminations_per_hour = max_terminations_per_hour
+        self.dry_run = dry_run
+        self._process_iter = process_iter
+        self._foreground = foreground
+        self._session = session
+        self._own_session = session(os.getpid())
+        self.matcher = BrowserManager.get_matcher()
+        self.user = user or interactive_user()
+        self._owners = OwnerResolver()
+        self._level: Dict[str, int] = {browser: 0 for browser in self.budgets}
+        self._last_action: Dict[str, float] = {}
+        self._terminations: List[float] = []
+        self._reniced: Dict[int, tuple] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def load_budgets() -> Dict[str, int]:
+        """Presupuesto en bytes por navegador a partir de la configuración guardada."""
+        _, config = BrowserManager.check_previous_config()
+        return {
+            browser: values['memory_limit'] * 1024 * 1024
+            for browser, values in config.items() if values.get('memory_limit')
+        }
+
+    def level(self, browser: str) -> str:
+        return self.LEVELS[self._level.get(browser, 0)]
+
+    def check(self) -> List[Dict]:
+        """Revisa todos los navegadores una vez y retorna las acciones tomadas."""
+        browsers = [browser for browser in self.budgets if browser in BrowserManager.BROWSER_PATHS]
+        snapshot = ProcessSnapshot.capture(
+            self.matcher.names(browsers), attrs=['cmdline', 'memory_info', 'nice'],
+            process_iter=self._process_iter
+        )
+        now = time.monotonic()
+        foreground = self._foreground_pid()
+        users = [self.user] if self.user else None
+        actions = []
+
+        for browser in browsers:
+            procs = []
+            candidates = []
+            for root, _ in self._owners.owned(self.matcher.roots(snapshot, browser), users):
+                children = [snapshot.processes[pid] for pid in snapshot.descendants(root.pid)]
+                procs.append(root)
+                procs.extend(children)
+                window = self._window_visible(root, children, foreground)
+                for proc in children:
+                    info = proc.info
+                    if info.get('memory_info') is None:
+                        continue
+                    if process_category(info.get('cmdline'), info.get('name') or '')[0] != 'renderer':
+                        continue
+                    if window and not self._hidden(proc, root.info.get('nice')):
+                        # Volvió a verse: no se espera a que baje la memoria
+                        actions.extend(self._restore(browser, proc))
+                    else:
+                        candidates.append(proc)
+            usage = sum(private_bytes(proc.info['memory_info']) for proc in procs
+                        if proc.info.get('memory_info') is not None)
+            candidates.sort(key=lambda proc: proc.info['memory_info'].rss, reverse=True)
+
+            budget = self.budgets[browser]
+            if usage > budget:
+                if now - self._last_action.get(browser, float('-inf')) >= self.cooldown:
+                    actions.extend(self._escalate(browser, usage, budget, candidates))
+                    self._last_action[browser] = now
+            elif usage < budget * self.low_watermark and self._level[browser]:
+                actions.extend(self._relax(browser, procs))
+                self._last_action[browser] = now
+
+        self.matcher.retain(snapshot.processes)
+        self._owners.retain(set(snapshot.processes))
+        return actions
+
+    def _foreground_pid(self) -> Optional[int]:
+        """PID de la ventana en primer plano (0 si ninguna, None si no se puede saber)."""
+        try:
+            return self._foreground()
+        except Exception as e:
+            logging.debug(f"No se pudo leer la ventana en primer plano: {e}")
+            return None
+
+    def _window_visible(self, root: psutil.Process, children: List[psutil.Process],
+                        foreground: Optional[int]) -> bool:
+        """True si la ventana del navegador puede estar a la vista.
+
+        La ventana en primer plano es la de esta sesión: los navegadores de
+        otras sesiones solo se juzgan por la marca de pestaña oculta.
+        """
+        if foreground is None or self._session(root.pid) != self._own_session:
+            return True
+        return foreground == root.pid or any(proc.pid == foreground for proc in children)
+
+    def _hidden(self, proc: psutil.Process, root_priority: Optional[int]) -> bool:
+        """True si el navegador marcó el renderer como pestaña oculta."""
+        priority = proc.info.get('nice')
+        reniced = self._reniced.get(proc.pid)
+        if reniced is not None and priority == BACKGROUND_PRIORITY:
+            # Sigue la prioridad puesta aquí: cuenta la que tenía antes
+            priority = reniced[1]
+        return priority is not None and renderer_hidden(priority, root_priority)
+
+    def _restore(self, browser: str, proc: psutil.Process) -> List[Dict]:
+        """Restaura la prioridad de un renderer que había bajado el gobernador."""
+        reniced = self._reniced.pop(proc.pid, None)
+        if reniced is None:
+            return []
+        try:
+            if reniced[0].nice() != BACKGROUND_PRIORITY:
+                # El navegador ya le cambió la prioridad
+                return []
+            reniced[0].nice(reniced[1])
+        except psutil.Error:
+            return []
+        return [{'browser': browser, 'pid': proc.pid, 'action': 'restore_priority'}]
+
+    def _escalate(self, browser: str, usage: float, budget: float,
+                  candidates: List[psutil.Process]) -> List[Dict]:
+        level = min(self._level[browser] + 1, len(self.LEVELS) - 1)
+        self._level[browser] = level
+        action = self.LEVELS[level]
+        logging.info(
+            f"{browser}: {usage / 1048576:.0f} MB sobre el presupuesto de "
+            f"{budget / 1048576:.0f} MB, nivel {action}"
+        )
+        if action == 'lower_priority':
+            targets = candidates
+        else:
+            targets = candidates[:self.victims_per_step]
+        if action == 'terminate':
+            hour_ago = time.monotonic() - 3600
+            self._terminations = [t for t in self._terminations if t > hour_ago]
+            allowed = max(self.max_terminations_per_hour - len(self._terminations), 0)
+            targets = targets[:allowed]
+
+        actions = []
+        for proc in targets:
+            if self._apply(proc, action):
+                actions.append({
+                    'browser': browser, 'pid': proc.pid, 'action': action,
+                    'rss': proc.info['memory_info'].rss,
+                })
+        return actions
+
+    def _apply(self, proc: psutil.Process, action: str) -> bool:
+        if self.dry_run:
+            return True
+        try:
+            if action == 'lower_priority':
+                if proc.pid not in self._reniced:
+                    self._reniced[proc.pid] = (proc, proc.nice())
+                proc.nice(BACKGROUND_PRIORITY)
+            elif action == 'terminate':
+                proc.kill()
+                self._reniced.pop(proc.pid, None)
+                self._terminations.append(time.monotonic())
+            return True
+        except psutil.Error as e:
+            logging.debug(f"No se pudo aplicar {action} a PID {proc.pid}: {e}")
+            return False
+
+    def _relax(self, browser: str, procs: List[psutil.Process]) -> List[Dict]:
+        """Deshace las acciones sobre los procesos del navegador que siguen vivos."""
+        self._level[browser] = 0
+        logging.info(f"{browser}: memoria bajo el umbral, restaurando procesos")
+        actions = []
+        for proc in procs:
+            actions.extend(self._restore(browser, proc))
+        return actions
+
+    def release_all(self) -> None:
+        """Restaura las prioridades (al detenerse)."""
+        for proc, priority in self._reniced.values():
+            try:
+                proc.nice(priority)
+            except psutil.Error:
+                pass
+        self._reniced.clear()
+        self._level = {browser: 0 for browser in self.budgets}
+
+    def run(self, duration: Optional[float] = None) -> None:
+        """Revisa periódicamente hasta ``stop`` o hasta que pase ``duration``."""
+        deadline = time.monotonic() + duration if duration else None
+        try:
+            while not self._stop.is_set():
+                try:
+                    for action in self.check():
+                        logging.info(f"Gobernador: {action}")
+                except Exception as e:
+                    logging.error(f"Error en el gobernador de memoria: {e}")
+                if deadline and time.monotonic() >= deadline:
+                    break
+                self._stop.wait(self.interval)
+        finally:
+            self.release_all()
+
+    def start(self) -> None:
+        """Inicia el gobernador en un hilo en segundo plano."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='speedchrome-governor', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gobernador de memoria de navegadores")
+    parser.add_argument('--interval', type=float, default=5.0, help="Segundos entre revisiones")
+    parser.add_argument('--cooldown', type=float, default=15.0, help="Segundos mínimos entre acciones")
+    parser.add_argument('--low-watermark', type=float, default=0.9,
+                        help="Fracción del presupuesto bajo la cual se deshacen las acciones")
+    parser.add_argument('--dry-run', action='store_true', help="Solo informar, no actuar")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    governor = MemoryGovernor(interval=args.interval, cooldown=args.cooldown,
+                              low_watermark=args.low_watermark, dry_run=args.dry_run)
+    if not governor.budgets:
+        logging.error("No hay límites de memoria guardados; aplique una configuración primero")
+        return
+    try:
+        governor.run()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import os
+import json
+import math
+import time
+import logging
+import argparse
+from typing import Dict, List, Optional
+from app_paths import get_data_dir
+
+MB = 1024 * 1024
+
+# Límite por defecto (MB) para navegadores sin muestras, como el valor inicial de la interfaz
+DEFAULT_LIMIT_MB = 4096
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentil por interpolación lineal (``fraction`` entre 0 y 1)."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def size_budgets(working_sets: Dict[str, List[float]], total: float, committed: float,
+                 current: Optional[Dict[str, float]] = None, headroom: float = 0.25,
+                 growth: float = 1.2, min_limit_mb: int = 1024,
+                 min_samples: int = 5) -> Dict:
+    """Calcula un límite (MB) por navegador a partir de su uso observado.
+
+    ``working_sets`` tiene las muestras de memoria (bytes) de cada navegador
+    seleccionado; ``total`` y ``committed`` son la RAM total y en uso del
+    sistema y ``current`` el uso actual de cada navegador, que se descuenta
+    de ``committed`` para estimar el resto del sistema.
+
+    Se reserva para el resto del sistema lo mayor entre ``headroom`` por la
+    RAM total y su uso actual. Cada navegador pide su p95 por ``growth`` (o
+    una parte igual del resto si tiene menos de ``min_samples`` muestras);
+    si la suma no entra en lo disponible se reparte en proporción a lo
+    pedido, sin bajar de ``min_limit_mb``.
+    """
+    current = current or {}
+    reasons = []
+    browser_usage = sum(current.get(browser, 0.0) for browser in working_sets)
+    other = max(committed - browser_usage, 0.0)
+    reserve = max(total * headroom, other)
+    pool = max(total - reserve, min_limit_mb * MB * len(working_sets))
+    reasons.append(
+        f"RAM total {total / MB:.0f} MB; el resto del sistema usa {other / MB:.0f} MB. "
+        f"Se reservan {reserve / MB:.0f} MB (margen del {headroom:.0%}) y quedan "
+        f"{pool / MB:.0f} MB para {len(working_sets)} navegador(es)"
+    )
+
+    result: Dict[str, Dict] = {}
+    demand: Dict[str, float] = {}
+    unobserved = []
+    for browser, samples in working_sets.items():
+        samples = [value for value in samples if value > 0]
+        entry = result[browser] = {'samples': len(samples), 'p50_mb': None, 'p95_mb': None}
+        if len(samples) < min_samples:
+            unobserved.append(browser)
+            continue
+        p50, p95 = percentile(samples, 0.5), percentile(samples, 0.95)
+        entry.update(p50_mb=round(p50 / MB), p95_mb=round(p95 / MB))
+        demand[browser] = max(p95 * growth, min_limit_mb * MB)
+        reasons.append(
+            f"{browser}: p50 {p50 / MB:.0f} MB, p95 {p95 / MB:.0f} MB en {len(samples)} muestras; "
+            f"pide p95 x {growth:g} = {demand[browser] / MB:.0f} MB"
+        )
+
+    if unobserved:
+        observed_total = sum(demand.values())
+        share = max((pool - observed_total) / len(unobserved), min_limit_mb * MB)
+        share = min(share, DEFAULT_LIMIT_MB * MB)
+        for browser in unobserved:
+            demand[browser] = share
+            reasons.append(
+                f"{browser}: sin muestras suficientes ({result[browser]['samples']}); "
+                f"se le asigna una parte igual de lo disponible ({share / MB:.0f} MB)"
+            )
+
+    requested = sum(demand.values())
+    scale = 1.0
+    if requested > pool:
+        scale = pool / requested
+        reasons.append(
+            f"Lo pedido ({requested / MB:.0f} MB) supera lo disponible: "
+            f"se reparte en proporción ({scale:.0%} de cada pedido)"
+        )
+    for browser, wanted in demand.items():
+        limit = wanted * scale / MB
+        # Múltiplos de 256 MB: hacia arriba si entra todo lo pedido, hacia
+        # abajo si hubo que recortar (para no prometer más que lo disponible)
+        steps = math.floor(limit / 256) if scale < 1.0 else math.ceil(limit / 256)
+        result[browser]['limit_mb'] = max(steps * 256, min_limit_mb)
+
+    return {
+        'browsers': result,
+        'total_mb': round(total / MB),
+        'committed_mb': round(committed / MB),
+        'other_mb': round(other / MB),
+        'reserve_mb': round(reserve / MB),
+        'pool_mb': round(pool / MB),
+        'headroom': headroom,
+        'reasons': reasons,
+    }
+
+
+def collect_working_sets(browsers: List[str], window: float = 86400.0,
+                         store=None, sampler=None) -> Dict[str, List[float]]:
+    """Muestras de memoria de cada navegador en la ventana.
+
+    Usa los agregados por minuto del historial (``rss_max``) y, si se pasa,
+    el buffer en memoria del muestreador (que incluye los minutos aún no
+    escritos).
+    """
+    since = time.time() - window
+    working_sets: Dict[str, List[float]] = {browser: [] for browser in browsers}
+    for browser in browsers:
+        if store is not None:
+            try:
+                working_sets[browser].extend(
+                    row['rss_max'] for row in store.query(browser, 'minute', since)
+                )
+            except Exception as e:
+                logging.error(f"No se pudo leer el historial de {browser}: {e}")
+        if sampler is not None and browser in sampler.buffers:
+            buffer = sampler.buffers[browser]
+            for timestamp, rss in zip(buffer.column('timestamp'), buffer.column('rss')):
+                if timestamp >= since:
+                    working_sets[browser].append(rss)
+    return working_sets
+
+
+def recommend(browsers: List[str], window: float = 86400.0, headroom: float = 0.25,
+              store=None, sampler=None, **kwargs) -> Dict:
+    """Recomendación de límites para los navegadores indicados (API sin interfaz).
+
+    Si no se pasa ``store`` se abre el historial del directorio de datos.
+    """
+    import psutil
+    from telemetry import HistoryStore
+
+    own_store = None
+    if store is None:
+        path = os.path.join(get_data_dir(), 'history.db')
+        if os.path.exists(path):
+            store = own_store = HistoryStore(path)
+    try:
+        working_sets = collect_working_sets(browsers, window, store, sampler)
+    finally:
+        if own_store is not None:
+            own_store.close()
+
+    current = {}
+    if sampler is not None:
+        for browser, sample in sampler.latest().items():
+            if sample:
+                current[browser] = sample['rss']
+    vm = psutil.virtual_memory()
+    result = size_budgets(working_sets, vm.total, vm.total - vm.available, current,
+                          headroom=headroom, **kwargs)
+    result['window_hours'] = window / 3600
+    return result
+
+
+def main():
+    from browser_manager import BrowserManager
+
+    parser = argparse.ArgumentParser(description="Recomienda límites de memoria por navegador")
+    parser.add_argument('browsers', nargs='*', help="Navegadores (por defecto, los instalados)")
+    parser.add_argument('--window', type=float, default=24.0, help="Horas de historial a considerar")
+    parser.add_argument('--headroom', type=float, default=0.25,
+                        help="Fracción de la RAM reservada para el resto del sistema")
+    args = parser.parse_args()
+
+    browsers = args.browsers or [
+        browser for browser, installed in BrowserManager.detect_installed_browsers().items() if installed
+    ]
+    print(json.dumps(recommend(browsers, args.window * 3600, args.headroom), indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
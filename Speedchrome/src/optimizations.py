@@ -0,0 +1,227 @@
+import sys
+from typing import Dict, List, Optional, Tuple
+
+MB = 1024 * 1024
+
+# Catálogo de optimizaciones. La interfaz, la aplicación sin interfaz, la
+# configuración guardada y el backend de Linux se generan a partir de él.
+# Por entrada:
+#   id           nombre de la opción y del campo de la configuración guardada
+#   label        texto de la casilla en la interfaz
+#   group        'memory' (marco de memoria) u 'options'
+#   type         'bool' (casilla) o 'int' (casilla + valor)
+#   value_label  solo 'int': texto junto al valor
+#   min, max     rango válido del valor (en unidades de ``unit``); ``step`` el incremento
+#   unit         unidad mostrada; ``scale`` convierte a la unidad guardada
+#   default      'bool': si viene marcada; 'int': valor por defecto (en ``unit``)
+#   enabled      solo 'int': si viene activada
+#   scope        'browser': SOFTWARE\<ruta del navegador>\<key>
+#                'policy':  SOFTWARE\Policies\<policy_key del navegador>
+#   key, name    subclave (solo 'browser') y nombre del valor de registro
+#   value        dato a escribir cuando está activada (solo 'bool')
+#   factor       multiplicador del valor guardado al escribirlo (solo 'int')
+#   families     familias de navegador a las que se aplica (None: todas)
+#   platforms    sistemas donde tiene efecto, prefijos de sys.platform (None: todos)
+#   restart      True si el navegador debe reiniciarse para que surta efecto
+#   linux        en Linux: ('policy', nombre), ('flag', plantilla con {value}) o
+#                None si no tiene equivalente (solo queda en la configuración guardada)
+OPTIMIZATIONS = [
+    {'id': 'memory_limit', 'label': "Limitar memoria", 'group': 'memory',
+     'type': 'int', 'value_label': "Límite de memoria", 'min': 1, 'max': 64,
+     'unit': 'GB', 'scale': 1024,
+     'default': 4, 'enabled': True,
+     'scope': 'browser', 'key': 'Process', 'name': 'MaxMemPerProcess', 'factor': 1,
+     'families': None, 'platforms': None, 'restart': True,
+     # --max-old-space-size sería un tope por isolate y pisaría los --js-flags
+     # del usuario: en Linux el límite lo hace cumplir el cgroup de ``limit``
+     'linux': None},
+    {'id': 'renderer_process_limit', 'label': "Limitar procesos de renderizado", 'group': 'memory',
+     'type': 'int', 'value_label': "Máximo", 'min': 1, 'max': 64, 'unit': 'procesos', 'scale': 1,
+     'default': 8, 'enabled': False,
+     'scope': 'browser', 'key': 'Process', 'name': 'RendererProcessLimit', 'factor': 1,
+     # Chromium no lee este valor del registro en Windows: solo existe como flag
+     'families': None, 'platforms': ['linux'], 'restart': True,
+     'linux': ('flag', '--renderer-process-limit={value}')},
+    {'id': 'memory_saver', 'label': "Activar ahorro de memoria (pestañas inactivas)", 'group': 'memory',
+     'type': 'bool', 'default': True,
+     'scope': 'policy', 'name': 'HighEfficiencyModeEnabled', 'value': 1,
+     'families': ['chrome', 'chromium', 'brave'], 'platforms': None, 'restart': False,
+     'linux': ('policy', 'HighEfficiencyModeEnabled')},
+    {'id': 'sleeping_tabs', 'label': "Activar pestañas suspendidas (Edge)", 'group': 'memory',
+     'type': 'bool', 'default': True,
+     'scope': 'policy', 'name': 'SleepingTabsEnabled', 'value': 1,
+     'families': ['edge'], 'platforms': None, 'restart': False,
+     'linux': ('policy', 'SleepingTabsEnabled')},
+    {'id': 'disable_background_mode', 'label': "No seguir ejecutando en segundo plano al cerrar",
+     'group': 'options', 'type': 'bool', 'default': False,
+     'scope': 'policy', 'name': 'BackgroundModeEnabled', 'value': 0,
+     'families': None, 'platforms': None, 'restart': True,
+     'linux': ('policy', 'BackgroundModeEnabled')},
+    {'id': 'wakeup_throttling', 'label': "Limitar temporizadores de pestañas en segundo plano",
+     'group': 'options', 'type': 'bool', 'default': False,
+     'scope': 'policy', 'name': 'IntensiveWakeUpThrottlingEnabled', 'value': 1,
+     'families': None, 'platforms': None, 'restart': True,
+     'linux': ('policy', 'IntensiveWakeUpThrottlingEnabled')},
+    {'id': 'disable_preload', 'label': "Deshabilitar precarga de páginas", 'group': 'options',
+     'type': 'bool', 'default': True,
+     # 2 = no predecir acciones de red
+     'scope': 'policy', 'name': 'NetworkPredictionOptions', 'value': 2,
+     'families': None, 'platforms': None, 'restart': False,
+     'linux': ('policy', 'NetworkPredictionOptions')},
+    {'id': 'disable_hardware', 'label': "Deshabilitar aceleración de hardware", 'group': 'options',
+     'type': 'bool', 'default': True,
+     'scope': 'policy', 'name': 'HardwareAccelerationModeEnabled', 'value': 0,
+     'families': None, 'platforms': None, 'restart': True,
+     'linux': ('policy', 'HardwareAccelerationModeEnabled')},
+    {'id': 'disk_cache_size', 'label': "Limitar caché de disco", 'group': 'options',
+     # DWORD: el tamaño en bytes debe entrar en 32 bits
+     'type': 'int', 'value_label': "Tamaño máximo", 'min': 64, 'max': 4032, 'step': 64,
+     'unit': 'MB', 'scale': 1,
+     'default': 512, 'enabled': False,
+     'scope': 'policy', 'name': 'DiskCacheSize', 'factor': MB,
+     'families': None, 'platforms': None, 'restart': True,
+     'linux': ('policy', 'DiskCacheSize')},
+]
+
+OPTIMIZATIONS_BY_ID = {opt['id']: opt for opt in OPTIMIZATIONS}
+
+# Campos de la configuración guardada (además de last_update)
+SAVED_FIELDS = tuple(opt['id'] for opt in OPTIMIZATIONS)
+
+POLICIES_ROOT = r'SOFTWARE\Policies'
+
+
+def on_platform(opt: Dict) -> bool:
+    """True si la optimización tiene efecto en este sistema."""
+    return opt['platforms'] is None or sys.platform.startswith(tuple(opt['platforms']))
+
+
+def applies_to(opt: Dict, entry: Optional[Dict]) -> bool:
+    """True si la optimización se puede escribir para ese navegador del catálogo."""
+    if not on_platform(opt):
+        return False
+    if entry is None:
+        return opt['scope'] == 'browser'
+    if opt['families'] is not None and entry.get('family') not in opt['families']:
+        return False
+    return opt['scope'] == 'browser' or bool(entry.get('policy_key'))
+
+
+def registry_location(opt: Dict, browser_path: str, entry: Optional[Dict]) -> Tuple[str, str]:
+    """(clave completa, nombre del valor) donde se escribe la optimización."""
+    if opt['scope'] == 'policy':
+        return f"{POLICIES_ROOT}\\{entry['policy_key']}", opt['name']
+    return f"SOFTWARE\\{browser_path}\\{opt['key']}", opt['name']
+
+
+def default_options() -> Dict:
+    """Opciones por defecto, en el formato de ``collect_options``."""
+    options = {}
+    for opt in OPTIMIZATIONS:
+        if opt['type'] == 'bool':
+            options[opt['id']] = opt['default']
+        else:
+            options[opt['id']] = opt['default'] * opt['scale'] if opt['enabled'] else None
+    return options
+
+
+def validate(opt: Dict, value) -> Optional[int]:
+    """Valor guardado (unidad interna) de una opción; ValueError si está fuera de rango."""
+    if opt['type'] == 'bool':
+        return 1 if value else None
+    if value is None or value is False:
+        return None
+    value = int(value)
+    if not opt['min'] * opt['scale'] <= value <= opt['max'] * opt['scale']:
+        raise ValueError(
+            f"{opt['label']}: {value // opt['scale']} {opt['unit']} fuera de rango "
+            f"({opt['min']}-{opt['max']})"
+        )
+    return value
+
+
+def option_value(options: Dict, opt: Dict, browser: str) -> Optional[int]:
+    """Valor de la opción para un navegador (None si está desactivada).
+
+    ``memory_limits`` (de la recomendación) tiene prioridad sobre el límite
+    de memoria general.
+    """
+    value = options.get(opt['id'])
+    if opt['id'] == 'memory_limit' and value:
+        value = options.get('memory_limits', {}).get(browser, value)
+    return value or None
+
+
+def registry_data(opt: Dict, value: int) -> int:
+    """Dato de registro que corresponde a un valor activado."""
+    if opt['type'] == 'bool':
+        return opt['value']
+    return value * opt['factor']
+
+
+def saved_config(options: Dict, browser: str) -> Dict[str, int]:
+    """Configuración guardada de un navegador: 0 = desactivada."""
+    config = {}
+    for opt in OPTIMIZATIONS:
+        value = option_value(options, opt, browser)
+        config[opt['id']] = (1 if value else 0) if opt['type'] == 'bool' else int(value or 0)
+    return config
+
+
+def linux_settings(values: Dict[str, Dict], entry: Dict) -> Tuple[Dict, List[str]]:
+    """Políticas y flags de Linux para los datos de registro de un navegador.
+
+    ``values`` es {clave completa: {nombre: dato}}.
+    """
+    policies, flags = {}, []
+    for opt in OPTIMIZATIONS:
+        if not applies_to(opt, entry):
+            continue
+        key_path, name = registry_location(opt, entry['reg_key'], entry)
+        data = values.get(key_path, {}).get(name)
+        if data is None or opt['linux'] is None:
+            continue
+        kind, target = opt['linux']
+        if kind == 'flag':
+            flags.append(target.format(value=int(data)))
+        elif opt['type'] == 'bool':
+            # Las políticas booleanas se escriben como JSON true/false
+            policies[target] = bool(data) if opt['value'] in (0, 1) else int(data)
+        else:
+            policies[target] = int(data)
+    return policies, flags
+
+
+def parse_options(values: Dict) -> Dict:
+    """Opciones a partir de un perfil (valores en la unidad mostrada, p. ej. GB).
+
+    Las optimizaciones que el perfil no menciona toman su valor por defecto;
+    ``false``/``null``/0 desactivan una optimización. ``memory_limits``
+    ({navegador: MB}) se conserva tal cual. Lanza ValueError si hay nombres
+    desconocidos o valores fuera de rango.
+    """
+    options = default_options()
+    for opt_id, value in values.items():
+        if opt_id == 'memory_limits':
+            options['memory_limits'] = {browser: int(limit) for browser, limit in value.items()}
+            continue
+        opt = OPTIMIZATIONS_BY_ID.get(opt_id)
+        if opt is None:
+            raise ValueError(f"Optimización desconocida: {opt_id}")
+        if opt['type'] == 'int' and value is not True and value:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{opt_id}: se esperaba un número, no {value!r}")
+            value = int(value * opt['scale'])
+        elif opt['type'] == 'int' and value is True:
+            value = opt['default'] * opt['scale']
+        options[opt_id] = validate(opt, value)
+    return options
+
+
+def options_from_config(config: Dict) -> Dict:
+    """Opciones equivalentes a una configuración guardada (inversa de ``saved_config``)."""
+    options = {}
+    for opt in OPTIMIZATIONS:
+        value = config.get(opt['id'], 0)
+        options[opt['id']] = bool(value) if opt['type'] == 'bool' else (int(value) or None)
+    return options
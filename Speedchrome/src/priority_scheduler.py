@@ -0,0 +1,636 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import psutil
+from typing import Callable, Dict, List, Optional, Tuple
+from browser_manager import BrowserManager
+from process_utils import BrowserMatcher, PROCESS_CATEGORIES, process_category
+from sessions import session_id
+from instrumentation import traced, count
+
+# Niveles de una política: 'normal' deja el valor del proceso sin tocar
+LEVELS = ('normal', 'low', 'idle')
+
+# Prioridad de CPU por nivel: clase de Windows o valor de nice en POSIX
+CPU_LEVELS = {
+    'low': getattr(psutil, 'BELOW_NORMAL_PRIORITY_CLASS', 10),
+    'idle': getattr(psutil, 'IDLE_PRIORITY_CLASS', 19),
+}
+
+# Clases de Windows de menor a mayor prioridad (sus valores no están ordenados)
+_WINDOWS_CLASS_ORDER = [
+    getattr(psutil, name) for name in (
+        'IDLE_PRIORITY_CLASS', 'BELOW_NORMAL_PRIORITY_CLASS', 'NORMAL_PRIORITY_CLASS',
+        'ABOVE_NORMAL_PRIORITY_CLASS', 'HIGH_PRIORITY_CLASS', 'REALTIME_PRIORITY_CLASS',
+    ) if hasattr(psutil, name)
+]
+
+
+def _io_levels() -> Dict[str, tuple]:
+    """Argumentos de ``Process.ionice`` por nivel ({} si no hay prioridad de E/S)."""
+    if sys.platform == 'win32' and hasattr(psutil, 'IOPRIO_VERYLOW'):
+        return {'low': (psutil.IOPRIO_LOW,), 'idle': (psutil.IOPRIO_VERYLOW,)}
+    if hasattr(psutil, 'IOPRIO_CLASS_IDLE'):
+        # Linux: best-effort con la prioridad más baja, o solo cuando el disco está libre
+        return {'low': (psutil.IOPRIO_CLASS_BE, 7), 'idle': (psutil.IOPRIO_CLASS_IDLE,)}
+    return {}
+
+
+IO_LEVELS = _io_levels()
+
+POLICY_FILE = 'scheduler_policy.json'
+
+# Pestañas, extensiones y servicios utilitarios genéricos. Red, almacenamiento
+# y audio tienen categoría propia y no se tocan: el primer plano depende de
+# ellos (y el audio se corta con prioridad baja).
+DEFAULT_POLICY = {
+    'idle_grace': 10.0,
+    'categories': {
+        'renderer': {'cpu': 'low', 'io': 'low', 'affinity': None},
+        'extension': {'cpu': 'idle', 'io': 'idle', 'affinity': None},
+        'utility': {'cpu': 'low', 'io': 'low', 'affinity': None},
+    },
+}
+
+
+def parse_policy(data: Dict) -> Dict:
+    """Valida una política y completa los valores por defecto.
+
+    Formato::
+
+        {"idle_grace": 10,          # segundos en segundo plano antes de bajarlo
+         "categories": {"renderer": {"cpu": "low", "io": "low", "affinity": [2, 3]}}}
+
+    ``categories`` reemplaza a la lista por defecto; una categoría en
+    ``null`` no se toca. ``active_cpu_percent`` (de versiones anteriores,
+    cuando el segundo plano se medía por uso de CPU) se acepta y se ignora.
+    Lanza ValueError si la política no es válida.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("La política debe ser un objeto")
+    unknown = set(data) - set(DEFAULT_POLICY) - {'active_cpu_percent'}
+    if unknown:
+        raise ValueError(f"Campos desconocidos en la política: {', '.join(sorted(unknown))}")
+
+    policy = {}
+    value = data.get('idle_grace', DEFAULT_POLICY['idle_grace'])
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError("'idle_grace' debe ser un número no negativo")
+    policy['idle_grace'] = float(value)
+
+    categories = data.get('categories', DEFAULT_POLICY['categories'])
+    if not isinstance(categories, dict):
+        raise ValueError("'categories' debe ser un objeto")
+    cpus = psutil.cpu_count() or 1
+    policy['categories'] = {}
+    for category, rule in categories.items():
+        if category not in PROCESS_CATEGORIES or category == 'browser':
+            raise ValueError(f"Categoría de proceso inválida: {category}")
+        if rule is None:
+            continue
+        if not isinstance(rule, dict) or set(rule) - {'cpu', 'io', 'affinity'}:
+            raise ValueError(f"'{category}' debe tener solo 'cpu', 'io' y 'affinity'")
+        parsed = {'cpu': rule.get('cpu', 'normal'), 'io': rule.get('io', 'normal'),
+                  'affinity': rule.get('affinity')}
+        for field in ('cpu', 'io'):
+            if parsed[field] not in LEVELS:
+                raise ValueError(f"'{category}.{field}' debe ser uno de: {', '.join(LEVELS)}")
+        affinity = parsed['affinity']
+        if affinity is not None:
+            if (not isinstance(affinity, list) or not affinity
+                    or not all(isinstance(cpu, int) and 0 <= cpu < cpus for cpu in affinity)):
+                raise ValueError(f"'{category}.affinity' debe ser una lista de CPUs entre 0 y {cpus - 1}")
+            parsed['affinity'] = sorted(set(affinity))
+        policy['categories'][category] = parsed
+    return policy
+
+
+def load_policy(path: Optional[str] = None) -> Dict:
+    """Lee la política de un archivo JSON.
+
+    Sin ``path`` se usa ``scheduler_policy.json`` en el directorio de datos
+    y, si no existe, la política por defecto. Lanza ValueError si el
+    archivo no se puede leer o no es válido.
+    """
+    if path is None:
+        from app_paths import get_data_dir
+        path = os.path.join(get_data_dir(), POLICY_FILE)
+        if not os.path.exists(path):
+            return parse_policy({})
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except OSError as e:
+        raise ValueError(f"No se pudo leer la política {path}: {e}")
+    except ValueError as e:
+        raise ValueError(f"Política inválida {path}: {e}")
+    return parse_policy(data)
+
+
+def _priority_rank(value: int) -> int:
+    """Mayor es más prioritario, para comparar clases de Windows y nice."""
+    if sys.platform == 'win32':
+        return _WINDOWS_CLASS_ORDER.index(value) if value in _WINDOWS_CLASS_ORDER else 2
+    return -value
+
+
+def renderer_hidden(priority: int, root_priority: Optional[int]) -> bool:
+    """True si el navegador marcó el renderizador como pestaña oculta.
+
+    Chromium baja la prioridad de los renderizadores de pestañas no
+    visibles por debajo de la de su proceso principal.
+    """
+    return root_priority is not None and _priority_rank(priority) < _priority_rank(root_priority)
+
+
+def _set_ionice(proc: psutil.Process, value) -> None:
+    """Restaura el valor de ``Process.ionice()`` leído antes."""
+    if sys.platform == 'win32':
+        proc.ionice(value)
+    elif value.ioclass in (psutil.IOPRIO_CLASS_RT, psutil.IOPRIO_CLASS_BE):
+        proc.ionice(value.ioclass, value.value)
+    else:
+        proc.ionice(value.ioclass)
+
+
+def _can_restore_nice(value: int) -> bool:
+    """True si se podrá volver a poner ``value`` después de bajar la prioridad.
+
+    En Linux, bajar el nice (subir la prioridad) requiere CAP_SYS_NICE o
+    que ``RLIMIT_NICE`` lo permita; sin eso la prioridad de CPU no se baja.
+    """
+    if sys.platform == 'win32' or os.geteuid() == 0:
+        return True
+    try:
+        import resource
+        soft, _ = resource.getrlimit(resource.RLIMIT_NICE)
+    except (ImportError, AttributeError, ValueError, OSError):
+        return False
+    if soft == resource.RLIM_INFINITY:
+        return True
+    return value >= 20 - soft
+
+
+class _X11Foreground:
+    """Proceso dueño de la ventana activa en X11 (``_NET_ACTIVE_WINDOW``).
+
+    Chromium publica en ``_NET_WM_PID`` el PID de su proceso principal.
+    Lanza OSError si no hay servidor X o libX11.
+    """
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        path = ctypes.util.find_library('X11')
+        if not path or not os.environ.get('DISPLAY'):
+            raise OSError("No hay servidor X")
+        xlib = ctypes.cdll.LoadLibrary(path)
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xlib.XInternAtom.restype = ctypes.c_ulong
+        xlib.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+        xlib.XGetWindowProperty.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_long, ctypes.c_long,
+            ctypes.c_int, ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong),
+            ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_ulong),
+            ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_void_p),
+        ]
+        xlib.XFree.argtypes = [ctypes.c_void_p]
+        # Sin manejador propio, un error de X (ventana ya cerrada) termina el proceso
+        handler_type = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+        self._handler = handler_type(lambda display, event: 0)
+        xlib.XSetErrorHandler(self._handler)
+        display = xlib.XOpenDisplay(None)
+        if not display:
+            raise OSError("No se pudo abrir el servidor X")
+        self._ctypes = ctypes
+        self._xlib = xlib
+        self._display = display
+        self._root = xlib.XDefaultRootWindow(display)
+        self._active = xlib.XInternAtom(display, b'_NET_ACTIVE_WINDOW', 0)
+        self._pid = xlib.XInternAtom(display, b'_NET_WM_PID', 0)
+
+    def _cardinal(self, window: int, atom: int) -> Optional[int]:
+        ctypes = self._ctypes
+        actual, fmt = ctypes.c_ulong(), ctypes.c_int()
+        items, after, data = ctypes.c_ulong(), ctypes.c_ulong(), ctypes.c_void_p()
+        status = self._xlib.XGetWindowProperty(
+            self._display, window, atom, 0, 1, 0, 0, ctypes.byref(actual), ctypes.byref(fmt),
+            ctypes.byref(items), ctypes.byref(after), ctypes.byref(data))
+        if status != 0 or not data.value:
+            return None
+        try:
+            if fmt.value != 32 or items.value < 1:
+                return None
+            # Las propiedades de formato 32 llegan como long de C
+            return ctypes.cast(data, ctypes.POINTER(ctypes.c_ulong))[0]
+        finally:
+            self._xlib.XFree(data)
+
+    def __call__(self) -> int:
+        window = self._cardinal(self._root, self._active)
+        if not window:
+            return 0
+        return self._cardinal(window, self._pid) or 0
+
+
+_foreground_lock = threading.Lock()
+_x11: Optional[_X11Foreground] = None
+_x11_failed = False
+
+
+def foreground_window_pid() -> Optional[int]:
+    """PID del dueño de la ventana en primer plano.
+
+    0 si ninguna ventana tiene el foco y None si no se puede saber en este
+    sistema (Wayland sin X, sin escritorio): entonces ningún navegador se
+    considera en segundo plano por su ventana.
+    """
+    global _x11, _x11_failed
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        hwnd = user32.GetForegroundWindow()
+        if not hwnd:
+            return 0
+        pid = wintypes.DWORD()
+        user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        return pid.value
+    if os.environ.get('WAYLAND_DISPLAY'):
+        # Bajo Wayland la ventana activa de X es solo la de las apps de XWayland
+        return None
+    with _foreground_lock:
+        if _x11 is None and not _x11_failed:
+            try:
+                _x11 = _X11Foreground()
+            except OSError as e:
+                logging.debug(f"Sin ventana activa de X11: {e}")
+                _x11_failed = True
+        if _x11 is None:
+            return None
+        return _x11()
+
+
+class _Tracked:
+    __slots__ = ('proc', 'browser', 'category', 'created', 'root', 'local', 'last_active',
+                 'background', 'original', 'applied', 'hidden')
+
+    def __init__(self, proc, browser: str, category: str, created: float, root: int,
+                 local: bool, now: float):
+        self.proc = proc
+        self.browser = browser
+        self.category = category
+        self.created = created
+        # PID del proceso principal del navegador (dueño de sus ventanas)
+        self.root = root
+        # True si el navegador está en la sesión de SpeedChrome (la de la ventana activa)
+        self.local = local
+        # Un proceso nuevo cuenta como activo (suele ser la pestaña que se abre)
+        self.last_active = now
+        self.background = False
+        self.original: Optional[Dict] = None
+        # Prioridad de CPU que puso el planificador (None si no la cambió)
+        self.applied: Optional[int] = None
+        # Última señal del navegador: pestaña oculta (prioridad menor que la suya)
+        self.hidden = False
+
+
+class PriorityScheduler:
+    """Baja la prioridad de CPU y de E/S de los procesos en segundo plano.
+
+    Se aplica a los procesos de cada navegador (``BROWSER_PATHS``) cuya
+    categoría (``process_category``) tiene regla en la política. Un proceso
+    está en segundo plano según lo que ve el usuario, no según su uso de
+    CPU (una pestaña oculta que consume mucho es justo la que hay que
+    bajar):
+
+    - su navegador no tiene la ventana en primer plano
+      (``foreground_window_pid``: Windows o X11; si no se puede saber, esta
+      condición no se usa). La ventana activa es solo la de la sesión de
+      SpeedChrome: en un servidor de terminales los navegadores de las
+      demás sesiones no se comparan con ella, o
+    - es una pestaña que el propio navegador marcó como oculta: Chromium
+      baja la prioridad de los renderizadores de pestañas no visibles por
+      debajo de la de su proceso principal.
+
+    Tras ``idle_grace`` segundos en segundo plano pasa a la prioridad de
+    CPU, de E/S (ionice en Linux, prioridad de E/S muy baja en Windows) y,
+    opcionalmente, a la afinidad de la regla; en cuanto vuelve al primer
+    plano se restauran sus valores originales. Nunca se sube la prioridad
+    por encima de la que tenía el proceso, y en Linux la de CPU solo se
+    baja si después se puede restaurar (CAP_SYS_NICE o ``RLIMIT_NICE``).
+
+    La revisión es incremental: en cada ciclo solo se lista la tabla de
+    PIDs, se clasifican los PIDs nuevos (nombre, línea de comandos y
+    proceso principal una vez por proceso; el navegador sale de la carpeta
+    del ejecutable del principal, ver ``BrowserMatcher``) y se lee la
+    prioridad de los renderizadores seguidos. Solo se cambia un proceso
+    cuando cambia su estado. Los PIDs descartados se vuelven a revisar cada
+    ``rescan_every`` ciclos, por si Windows reutilizó alguno.
+    """
+
+    def __init__(self, policy: Optional[Dict] = None, browsers: Optional[List[str]] = None,
+                 interval: float = 2.0, rescan_every: int = 15, dry_run: bool = False,
+                 pids: Callable = psutil.pids, process: Callable = psutil.Process,
+                 matcher: Optional[BrowserMatcher] = None,
+                 foreground: Callable[[], Optional[int]] = foreground_window_pid,
+                 session: Callable[[int], Optional[int]] = session_id):
+        policy = policy if policy is not None else load_policy()
+        self.categories: Dict[str, Dict] = policy['categories']
+        self.idle_grace = policy['idle_grace']
+        names = browsers or list(BrowserManager.BROWSER_PATHS)
+        self.browsers = {browser for browser in names if browser in BrowserManager.BROWSER_PATHS}
+        self.matcher = matcher or BrowserManager.get_matcher()
+        self._names = set(self.matcher.names(self.browsers))
+        self._foreground = foreground
+        self._session = session
+        self._own_session = session(os.getpid())
+        # (PID en primer plano, su proceso principal) de la última consulta
+        self._last_foreground: Optional[Tuple[int, int]] = None
+        # Procesos principales de los navegadores seguidos, por PID, y si son de esta sesión
+        self._roots: Dict[int, psutil.Process] = {}
+        self._local: Dict[int, bool] = {}
+        # False tras el primer aviso de que no se puede restaurar la prioridad de CPU
+        self._lower_cpu = True
+        self.interval = interval
+        self.rescan_every = rescan_every
+        self.dry_run = dry_run
+        self._pids = pids
+        self._process = process
+        self._tracked: Dict[int, _Tracked] = {}
+        self._ignored: set = set()
+        self._ticks = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def status(self) -> Dict[str, int]:
+        """Procesos seguidos y cuántos están en segundo plano."""
+        return {'tracked': len(self._tracked),
+                'background': sum(1 for entry in self._tracked.values() if entry.background)}
+
+    def _find_root(self, proc: psutil.Process) -> psutil.Process:
+        """Proceso principal del árbol: el ancestro más alto con nombre de navegador."""
+        root = proc
+        # Pocos niveles (el zygote de Linux agrega dos); el tope evita ciclos de PIDs reutilizados
+        for _ in range(8):
+            try:
+                parent = self._process(root.ppid())
+                if parent.name().lower() not in self._names:
+                    break
+            except psutil.Error:
+                break
+            root = parent
+        return self._roots.setdefault(root.pid, root)
+
+    def _discover(self, pid: int, now: float) -> None:
+        """Clasifica un PID nuevo: lo sigue si es de un navegador y tiene regla."""
+        try:
+            proc = self._process(pid)
+            with proc.oneshot():
+                name = proc.name().lower()
+                if name not in self._names:
+                    self._ignored.add(pid)
+                    return
+                category, _ = process_category(proc.cmdline(), name)
+                if category not in self.categories:
+                    self._ignored.add(pid)
+                    return
+                created = proc.create_time()
+            root = self._find_root(proc)
+        except psutil.NoSuchProcess:
+            return
+        except psutil.Error as e:
+            logging.debug(f"No se pudo clasificar PID {pid}: {e}")
+            self._ignored.add(pid)
+            return
+        browser = self.matcher.owner(root)
+        if browser not in self.browsers:
+            self._ignored.add(pid)
+            return
+        if root.pid not in self._local:
+            self._local[root.pid] = self._session(root.pid) == self._own_session
+        self._tracked[pid] = _Tracked(proc, browser, category, created, root.pid,
+                                      self._local[root.pid], now)
+
+    def _foreground_root(self) -> Optional[int]:
+        """Proceso principal del navegador en primer plano.
+
+        0 si el primer plano es de otro programa o de nadie; None si no se
+        puede saber.
+        """
+        try:
+            pid = self._foreground()
+        except Exception as e:
+            logging.debug(f"No se pudo leer la ventana en primer plano: {e}")
+            return None
+        if not pid:
+            return pid
+        if self._last_foreground and self._last_foreground[0] == pid:
+            return self._last_foreground[1]
+        root = 0
+        try:
+            proc = self._process(pid)
+            if proc.name().lower() in self._names:
+                root = self._find_root(proc).pid
+        except psutil.Error:
+            pass
+        self._last_foreground = (pid, root)
+        return root
+
+    def _hidden(self, entry: _Tracked, priority: int, root_priority: Dict[int, Optional[int]]) -> bool:
+        """True si el navegador marcó el renderizador como pestaña oculta."""
+        if entry.applied is not None:
+            if priority == entry.applied:
+                # Sigue la prioridad que se puso aquí: no hay novedades del navegador
+                return entry.hidden
+            # El navegador la cambió después (p. ej. la pestaña se volvió visible)
+            entry.original['cpu'] = priority
+            entry.applied = None
+        if entry.root not in root_priority:
+            try:
+                root_priority[entry.root] = self._roots[entry.root].nice()
+            except (KeyError, psutil.Error):
+                root_priority[entry.root] = None
+        entry.hidden = renderer_hidden(priority, root_priority[entry.root])
+        return entry.hidden
+
+    @traced('scheduler.check', 'process')
+    def check(self) -> List[Dict]:
+        """Revisa los procesos una vez y retorna los cambios de prioridad."""
+        now = time.monotonic()
+        self._ticks += 1
+        if self.rescan_every and self._ticks % self.rescan_every == 0:
+            self._ignored.clear()
+            self._last_foreground = None
+
+        current = set(self._pids())
+        for pid in [pid for pid in self._tracked if pid not in current]:
+            # Terminó: no hay nada que restaurar
+            del self._tracked[pid]
+        for pid in [pid for pid in self._roots if pid not in current]:
+            del self._roots[pid]
+            self._local.pop(pid, None)
+        self._ignored &= current
+        for pid in current.difference(self._ignored, self._tracked):
+            self._discover(pid, now)
+        self.matcher.retain(current)
+
+        foreground = self._foreground_root()
+        root_priority: Dict[int, Optional[int]] = {}
+        changes = []
+        for pid, entry in list(self._tracked.items()):
+            try:
+                with entry.proc.oneshot():
+                    if entry.proc.create_time() != entry.created:
+                        raise psutil.NoSuchProcess(pid)
+                    priority = entry.proc.nice() if entry.category == 'renderer' else None
+            except psutil.Error:
+                del self._tracked[pid]
+                continue
+            # Otras sesiones: su ventana activa no se ve desde aquí, solo cuenta la marca del navegador
+            visible = foreground is None or not entry.local or foreground == entry.root
+            if visible and not (priority is not None and self._hidden(entry, priority, root_priority)):
+                entry.last_active = now
+                background = False
+            else:
+                background = now - entry.last_active >= self.idle_grace
+            if background == entry.background:
+                continue
+            if background:
+                change = self._lower(pid, entry)
+            else:
+                change = self._restore(pid, entry)
+            if change:
+                changes.append(change)
+        count('scheduler.tracked', len(self._tracked))
+        return changes
+
+    def _lower(self, pid: int, entry: _Tracked) -> Optional[Dict]:
+        rule = self.categories[entry.category]
+        proc = entry.proc
+        if not self.dry_run:
+            try:
+                if entry.original is None:
+                    entry.original = {
+                        'cpu': proc.nice(),
+                        'io': proc.ionice() if IO_LEVELS and rule['io'] != 'normal' else None,
+                        'affinity': proc.cpu_affinity() if rule['affinity'] else None,
+                    }
+                if rule['cpu'] != 'normal' and self._lower_cpu:
+                    target = CPU_LEVELS[rule['cpu']]
+                    if (_priority_rank(target) < _priority_rank(entry.original['cpu'])
+                            and self._restorable(entry.original['cpu'])):
+                        proc.nice(target)
+                        entry.applied = target
+                if entry.original['io'] is not None:
+                    proc.ionice(*IO_LEVELS[rule['io']])
+                if entry.original['affinity'] is not None:
+                    proc.cpu_affinity(rule['affinity'])
+            except psutil.NoSuchProcess:
+                del self._tracked[pid]
+                return None
+            except (psutil.Error, AttributeError, ValueError) as e:
+                # Sin permisos (proceso de otro usuario) o sin soporte en esta plataforma
+                logging.debug(f"No se pudo bajar la prioridad de PID {pid}: {e}")
+                self._restore(pid, entry)
+                self._tracked.pop(pid, None)
+                self._ignored.add(pid)
+                return None
+        entry.background = True
+        count('scheduler.lowered', category=entry.category)
+        return {'browser': entry.browser, 'pid': pid, 'type': entry.category,
+                'action': 'background'}
+
+    def _restorable(self, value: int) -> bool:
+        if _can_restore_nice(value):
+            return True
+        logging.info("Sin CAP_SYS_NICE no se podría restaurar la prioridad de CPU: "
+                     "solo se baja la de E/S y la afinidad")
+        self._lower_cpu = False
+        return False
+
+    def _restore(self, pid: int, entry: _Tracked) -> Optional[Dict]:
+        original = entry.original
+        entry.background = False
+        if not self.dry_run and original is not None:
+            proc = entry.proc
+            try:
+                if entry.applied is not None and proc.nice() == entry.applied:
+                    try:
+                        proc.nice(original['cpu'])
+                    except psutil.AccessDenied as e:
+                        # En Linux subir el nice de vuelta requiere CAP_SYS_NICE:
+                        # no se vuelve a bajar la de CPU de ningún proceso
+                        if self._lower_cpu:
+                            logging.warning(f"No se pudo restaurar la prioridad de CPU de PID {pid}: {e}; "
+                                            "desde ahora solo se baja la de E/S y la afinidad")
+                        self._lower_cpu = False
+                entry.applied = None
+                if original['io'] is not None:
+                    _set_ionice(proc, original['io'])
+                if original['affinity'] is not None:
+                    proc.cpu_affinity(original['affinity'])
+            except psutil.NoSuchProcess:
+                self._tracked.pop(pid, None)
+                return None
+            except psutil.Error as e:
+                logging.debug(f"No se pudo restaurar la prioridad de PID {pid}: {e}")
+                return None
+        count('scheduler.restored', category=entry.category)
+        return {'browser': entry.browser, 'pid': pid, 'type': entry.category,
+                'action': 'restore'}
+
+    def release_all(self) -> List[Dict]:
+        """Restaura todos los procesos en segundo plano (al detenerse)."""
+        changes = []
+        for pid, entry in list(self._tracked.items()):
+            if entry.background:
+                change = self._restore(pid, entry)
+                if change:
+                    changes.append(change)
+        self._tracked.clear()
+        self._ignored.clear()
+        self._roots.clear()
+        self._local.clear()
+        self._last_foreground = None
+        return changes
+
+    def run(self, duration: Optional[float] = None,
+            on_change: Optional[Callable[[Dict], None]] = None) -> None:
+        """Revisa periódicamente hasta ``stop`` o hasta que pase ``duration``."""
+        deadline = time.monotonic() + duration if duration else None
+        try:
+            while not self._stop.is_set():
+                try:
+                    for change in self.check():
+                        logging.debug(f"Planificador: {change}")
+                        if on_change:
+                            on_change(change)
+                except Exception as e:
+                    logging.error(f"Error en el planificador de prioridades: {e}")
+                if deadline and time.monotonic() >= deadline:
+                    break
+                self._stop.wait(self.interval)
+        finally:
+            for change in self.release_all():
+                if on_change:
+                    on_change(change)
+
+    def start(self) -> None:
+        """Inicia el planificador en un hilo en segundo plano."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='speedchrome-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
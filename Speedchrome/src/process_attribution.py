@@ -0,0 +1,170 @@
+import time
+import psutil
+from typing import Callable, Dict, List, Optional, Tuple
+from browser_manager import BrowserManager
+from process_utils import BrowserMatcher, ProcessSnapshot, PROCESS_CATEGORIES, process_category
+from sessions import OwnerResolver, UNKNOWN_USER
+from instrumentation import traced, count
+
+
+class ProcessAttributor:
+    """Memoria y CPU de cada navegador desglosadas por tipo de proceso.
+
+    Cada muestra usa una única foto de la tabla de procesos (solo PID,
+    nombre y padre) y recorre desde ahí el árbol de cada navegador, de modo
+    que también se cuentan los hijos con otro ejecutable (crashpad). Por
+    proceso se leen memoria y tiempos de CPU en un ``oneshot``; la línea de
+    comandos solo se lee la primera vez que se ve un proceso (se recuerda
+    su tipo por PID y hora de creación). El USS es caro y solo se mide con
+    ``uss=True``. El % de CPU es relativo a un núcleo desde la muestra
+    anterior (0 en la primera). El usuario y la sesión se leen solo de los
+    procesos raíz; el resto del árbol los hereda.
+
+    Cada árbol se cuenta en un solo navegador: el de la carpeta de su
+    ejecutable (``BrowserMatcher``), aunque varios canales compartan nombre.
+    """
+
+    def __init__(self, browsers: Optional[List[str]] = None, top: int = 10,
+                 process_iter: Callable = psutil.process_iter,
+                 matcher: Optional[BrowserMatcher] = None):
+        names = browsers or list(BrowserManager.BROWSER_PATHS)
+        self.browsers = [browser for browser in names if browser in BrowserManager.BROWSER_PATHS]
+        self.matcher = matcher or BrowserManager.get_matcher()
+        self.top = top
+        self._process_iter = process_iter
+        # (pid, hora de creación) -> (categoría, detalle) / segundos de CPU
+        self._categories: Dict[Tuple[int, float], Tuple[str, str]] = {}
+        self._cpu_prev: Dict[Tuple[int, float], float] = {}
+        self._last_wall: Optional[float] = None
+        self.owners = OwnerResolver()
+
+    def _read(self, proc: psutil.Process, uss: bool) -> Optional[Tuple]:
+        """(clave, categoría, detalle, rss, uss, segundos de CPU) o None si terminó."""
+        try:
+            with proc.oneshot():
+                key = (proc.pid, proc.create_time())
+                times = proc.cpu_times()
+                mem = None
+                if uss:
+                    try:
+                        mem = proc.memory_full_info()
+                    except psutil.AccessDenied:
+                        # Procesos de otro usuario: solo RSS
+                        pass
+                if mem is None:
+                    mem = proc.memory_info()
+                category = self._categories.get(key)
+                if category is None:
+                    category = self._categories[key] = process_category(
+                        proc.cmdline(), proc.info.get('name') or '')
+        except psutil.Error:
+            return None
+        return key, category[0], category[1], mem.rss, getattr(mem, 'uss', None), times.user + times.system
+
+    @traced('attribution.sample', 'process')
+    def sample(self, uss: bool = False, snapshot: Optional[ProcessSnapshot] = None,
+               records: bool = False) -> Dict:
+        """Desglose de todos los navegadores en ejecución.
+
+        Retorna ``browsers`` con, por navegador, los totales (``processes``,
+        ``rss``, ``uss``, ``cpu_percent``), ``by_type`` con los mismos
+        campos por categoría, ``by_user`` por usuario (más las sesiones en
+        que tiene el navegador abierto) y ``top`` con los ``top`` procesos
+        que más memoria usan (pid, ppid, raíz, usuario, sesión, tipo,
+        detalle, rss, uss y % de CPU). Con ``records`` se agregan todos los
+        procesos en ``records``.
+        """
+        start = time.perf_counter()
+        now = time.time()
+        if snapshot is None:
+            snapshot = ProcessSnapshot.capture(process_iter=self._process_iter)
+        elapsed = now - self._last_wall if self._last_wall else None
+        cpu_now: Dict[Tuple[int, float], float] = {}
+        browsers = {}
+        scanned = 0
+
+        for browser in self.browsers:
+            roots = self.matcher.roots(snapshot, browser)
+            if not roots:
+                continue
+            pids = []
+            owners = {}
+            for root in roots:
+                owners[root.pid] = self.owners.owner(root)
+                pids.append((root.pid, root.pid))
+                pids.extend((pid, root.pid) for pid in snapshot.descendants(root.pid))
+            found = []
+            for pid, root_pid in pids:
+                proc = snapshot.processes.get(pid)
+                data = self._read(proc, uss) if proc is not None else None
+                if data is None:
+                    continue
+                key, category, detail, rss, uss_bytes, cpu_seconds = data
+                cpu_now[key] = cpu_seconds
+                previous = self._cpu_prev.get(key)
+                cpu_percent = 0.0
+                if elapsed and previous is not None and cpu_seconds >= previous:
+                    cpu_percent = (cpu_seconds - previous) / elapsed * 100
+                user, session = owners[root_pid]
+                found.append({'pid': pid, 'ppid': proc.info.get('ppid'), 'root': root_pid,
+                              'user': user, 'session': session, 'type': category, 'detail': detail,
+                              'rss': rss, 'uss': uss_bytes, 'cpu_percent': cpu_percent})
+            scanned += len(found)
+            browsers[browser] = self._aggregate(found, uss)
+            if records:
+                browsers[browser]['records'] = found
+
+        # Olvidar los procesos que ya terminaron
+        self._categories = {key: self._categories[key] for key in cpu_now if key in self._categories}
+        self._cpu_prev = cpu_now
+        self.owners.retain({key[0] for key in cpu_now})
+        self.matcher.retain(snapshot.processes)
+        self._last_wall = now
+        count('attribution.processes', scanned)
+        return {'timestamp': now, 'uss': uss, 'elapsed': time.perf_counter() - start,
+                'browsers': browsers}
+
+    def _aggregate(self, records: List[Dict], uss: bool) -> Dict:
+        def empty():
+            return {'processes': 0, 'rss': 0, 'uss': 0 if uss else None, 'cpu_percent': 0.0}
+
+        totals = empty()
+        by_type: Dict[str, Dict] = {}
+        by_user: Dict[str, Dict] = {}
+        for record in records:
+            user = by_user.setdefault(record['user'] or UNKNOWN_USER, dict(empty(), sessions=set()))
+            if record['session'] is not None:
+                user['sessions'].add(record['session'])
+            for bucket in (totals, by_type.setdefault(record['type'], empty()), user):
+                bucket['processes'] += 1
+                bucket['rss'] += record['rss']
+                bucket['cpu_percent'] += record['cpu_percent']
+                if uss and record['uss'] is not None:
+                    bucket['uss'] += record['uss']
+        measure = 'uss' if uss else 'rss'
+        top = sorted(records, key=lambda record: record[measure] or 0, reverse=True)[:self.top]
+        totals['by_type'] = {
+            category: by_type[category] for category in PROCESS_CATEGORIES if category in by_type
+        }
+        for bucket in by_user.values():
+            bucket['sessions'] = sorted(bucket['sessions'])
+        totals['by_user'] = by_user
+        totals['top'] = top
+        return totals
+
+
+def format_breakdown(result: Dict) -> List[str]:
+    """Líneas legibles de una muestra, para el log o la consola."""
+    measure = 'uss' if result['uss'] else 'rss'
+    lines = []
+    for browser, info in result['browsers'].items():
+        lines.append(
+            f"{browser}: {info[measure] / (1024 * 1024):.0f} MB {measure.upper()}, "
+            f"{info['cpu_percent']:.0f}% CPU, {info['processes']} procesos"
+        )
+        for category, bucket in info['by_type'].items():
+            lines.append(
+                f"  {category}: {bucket[measure] / (1024 * 1024):.0f} MB, "
+                f"{bucket['cpu_percent']:.0f}% CPU ({bucket['processes']})"
+            )
+    return lines
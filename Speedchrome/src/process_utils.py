@@ -0,0 +1,283 @@
+import os
+import time
+import logging
+import psutil
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from instrumentation import traced, count
+
+class ProcessSnapshot:
+    """Foto única de la tabla de procesos, indexada por nombre y PID padre.
+
+    Se recorre ``psutil.process_iter`` una sola vez y todas las consultas
+    posteriores (por navegador, por árbol) se resuelven sobre los índices.
+    """
+
+    ATTRS = ['pid', 'name', 'ppid']
+
+    def __init__(self, processes: Iterable[psutil.Process]):
+        self.processes: Dict[int, psutil.Process] = {}
+        self.by_name: Dict[str, List[psutil.Process]] = {}
+        self.children: Dict[int, List[int]] = {}
+        self.timestamp = time.time()
+
+        for proc in processes:
+            info = proc.info
+            pid = info['pid']
+            self.processes[pid] = proc
+            self.by_name.setdefault((info['name'] or '').lower(), []).append(proc)
+            ppid = info.get('ppid')
+            if ppid is not None:
+                self.children.setdefault(ppid, []).append(pid)
+
+    @classmethod
+    @traced('process.snapshot', 'process')
+    def capture(cls, process_names: Optional[Iterable[str]] = None,
+                attrs: Optional[List[str]] = None,
+                process_iter: Callable = psutil.process_iter) -> 'ProcessSnapshot':
+        """Recorre la tabla de procesos una vez.
+
+        Si se indican ``process_names`` solo se indexan esos ejecutables;
+        ``attrs`` permite pedir atributos extra (p.ej. 'memory_info') en la
+        misma pasada. ``process_iter`` se puede reemplazar por una tabla
+        simulada.
+        """
+        wanted = {name.lower() for name in process_names} if process_names is not None else None
+        fields = list(cls.ATTRS)
+        for attr in attrs or []:
+            if attr not in fields:
+                fields.append(attr)
+
+        def matching():
+            for proc in process_iter(fields):
+                name = proc.info.get('name')
+                if wanted is None or (name and name.lower() in wanted):
+                    yield proc
+
+        snapshot = cls(matching())
+        count('process.scanned', len(snapshot.processes))
+        return snapshot
+
+    def find(self, process_name: str) -> List[psutil.Process]:
+        """Procesos con el nombre de ejecutable indicado."""
+        return self.by_name.get(process_name.lower(), [])
+
+    def roots(self, process_name: str) -> List[psutil.Process]:
+        """Procesos raíz de un navegador: aquellos cuyo padre no es el mismo ejecutable."""
+        procs = self.find(process_name)
+        pids = {proc.info['pid'] for proc in procs}
+        return [proc for proc in procs if proc.info.get('ppid') not in pids]
+
+    def root_first(self, process_name: str) -> List[psutil.Process]:
+        """Procesos de un navegador ordenados desde las raíces hacia las hojas."""
+        procs = self.find(process_name)
+        by_pid = {proc.info['pid']: proc for proc in procs}
+        ordered = []
+        seen = set()
+        queue = deque(proc.info['pid'] for proc in self.roots(process_name))
+        while queue:
+            pid = queue.popleft()
+            if pid in seen:
+                continue
+            seen.add(pid)
+            ordered.append(by_pid[pid])
+            queue.extend(child for child in self.children.get(pid, []) if child in by_pid)
+        # Procesos en ciclos de PID reutilizados quedan al final
+        ordered.extend(proc for pid, proc in by_pid.items() if pid not in seen)
+        return ordered
+
+    def descendants(self, pid: int) -> List[int]:
+        """PIDs de todos los descendientes de un proceso."""
+        result = []
+        seen = set()
+        stack = list(self.children.get(pid, []))
+        while stack:
+            child = stack.pop()
+            if child in seen:
+                continue
+            seen.add(child)
+            result.append(child)
+            stack.extend(self.children.get(child, []))
+        return result
+
+
+def _dir_key(path: str) -> str:
+    """Carpeta normalizada y entre separadores, para buscarla dentro de otra."""
+    path = os.path.normcase(os.path.normpath(path)).strip(os.sep)
+    return f"{os.sep}{path}{os.sep}"
+
+
+class BrowserMatcher:
+    """Asigna cada proceso de navegador a una sola entrada del catálogo.
+
+    Varios canales comparten nombre de proceso (``chrome.exe`` es Chrome,
+    Beta, Dev, Canary y Chromium). Un proceso es de un navegador si su
+    ejecutable está en una de sus carpetas: la instalada
+    (``install_location`` del inventario) o las del catálogo
+    (``install_dirs``, que en Windows valen para la carpeta de cualquier
+    usuario). Si la ruta no se puede leer, se asigna por nombre solo cuando
+    ese nombre es de un único navegador instalado; si se lee y no está en
+    ninguna carpeta conocida, el proceso no se asigna.
+
+    La ruta se lee una vez por proceso (se recuerda por PID y hora de
+    creación); para un árbol basta con leer la de su raíz.
+    """
+
+    def __init__(self, browsers: Dict[str, Dict], installed: Optional[Dict[str, Dict]] = None):
+        """``browsers`` con el formato de ``BROWSER_PATHS``; ``installed``, las
+        entradas del inventario de los navegadores instalados (None: todos)."""
+        if installed is None:
+            installed = {browser: {} for browser in browsers}
+        self._names: Dict[str, List[str]] = {}
+        self._by_name: Dict[str, List[str]] = {}
+        self._installed: Dict[str, List[str]] = {}
+        self._dirs: Dict[str, List[str]] = {}
+        for browser, info in browsers.items():
+            names = [name.lower() for name in info.get('processes') or [info['process']]]
+            self._names[browser] = names
+            dirs = list(info.get('install_dirs') or [])
+            location = (installed.get(browser) or {}).get('install_location')
+            if location:
+                dirs.insert(0, location)
+            # Las carpetas absolutas se resuelven (p. ej. /snap/chromium/current)
+            self._dirs[browser] = [_dir_key(os.path.realpath(d) if os.path.isabs(d) else d)
+                                   for d in dirs]
+            for name in names:
+                self._by_name.setdefault(name, []).append(browser)
+                if browser in installed:
+                    self._installed.setdefault(name, []).append(browser)
+        self._owners: Dict[Tuple[int, float], Optional[str]] = {}
+
+    def names(self, browsers: Optional[Iterable[str]] = None) -> List[str]:
+        """Nombres de proceso de los navegadores (para ``ProcessSnapshot.capture``)."""
+        result = []
+        for browser in browsers if browsers is not None else self._names:
+            for name in self._names.get(browser, []):
+                if name not in result:
+                    result.append(name)
+        return result
+
+    def _resolve(self, proc: psutil.Process, name: str) -> Optional[str]:
+        candidates = self._by_name.get(name)
+        if not candidates:
+            return None
+        try:
+            exe = proc.exe()
+        except psutil.Error:
+            exe = None
+        if exe:
+            directory = _dir_key(os.path.dirname(exe))
+            best, best_length = None, 0
+            for browser in candidates:
+                for location in self._dirs[browser]:
+                    if location in directory and len(location) > best_length:
+                        best, best_length = browser, len(location)
+            if best is not None:
+                return best
+        installed = self._installed.get(name, [])
+        if len(installed) == 1 and (not exe or not self._dirs[installed[0]]):
+            return installed[0]
+        return None
+
+    def owner(self, proc: psutil.Process) -> Optional[str]:
+        """Navegador al que pertenece el proceso (None si no es de ninguno)."""
+        try:
+            key = (proc.pid, proc.create_time())
+            if key in self._owners:
+                return self._owners[key]
+            info = getattr(proc, 'info', None) or {}
+            name = (info.get('name') or proc.name() or '').lower()
+        except psutil.Error:
+            return None
+        browser = self._owners[key] = self._resolve(proc, name)
+        count('process.exe_lookups')
+        return browser
+
+    def roots(self, snapshot: ProcessSnapshot, browser: str) -> List[psutil.Process]:
+        """Procesos raíz de los árboles del navegador en la foto."""
+        return [root for name in self._names.get(browser, []) for root in snapshot.roots(name)
+                if self.owner(root) == browser]
+
+    def retain(self, pids: Iterable[int]) -> None:
+        """Olvida los procesos que ya no están en ``pids``."""
+        pids = set(pids)
+        self._owners = {key: value for key, value in self._owners.items() if key[0] in pids}
+
+
+@traced('process.kill', 'process')
+def kill_processes(procs: List[psutil.Process],
+                   on_gone: Optional[Callable[[psutil.Process], None]] = None) -> List[psutil.Process]:
+    """Envía kill a cada proceso y retorna los que recibieron la señal.
+
+    Los procesos que ya no existen se reportan directamente por ``on_gone``.
+    """
+    signaled = []
+    for proc in procs:
+        try:
+            proc.kill()
+            signaled.append(proc)
+            count('process.killed')
+        except psutil.NoSuchProcess:
+            if on_gone:
+                on_gone(proc)
+        except psutil.AccessDenied as e:
+            logging.error(f"Acceso denegado al cerrar PID {proc.pid}: {e}")
+    return signaled
+
+
+# Prioridad "baja" portable: clase BELOW_NORMAL en Windows, nice 10 en POSIX
+BACKGROUND_PRIORITY = getattr(psutil, 'BELOW_NORMAL_PRIORITY_CLASS', 10)
+
+
+def get_process_type(cmdline: Optional[List[str]]) -> str:
+    """Tipo de proceso Chromium según ``--type=`` (``browser`` si no tiene)."""
+    for arg in cmdline or []:
+        if arg.startswith('--type='):
+            return arg[len('--type='):]
+    return 'browser'
+
+
+# Servicios utilitarios de Chromium (--utility-sub-type=) con categoría propia
+UTILITY_CATEGORIES = {
+    'network.mojom.NetworkService': 'network',
+    'storage.mojom.StorageService': 'storage',
+    'audio.mojom.AudioService': 'audio',
+}
+
+# Categorías de ``process_category``, en el orden en que se muestran
+PROCESS_CATEGORIES = ('browser', 'renderer', 'extension', 'gpu', 'network', 'storage',
+                      'audio', 'utility', 'crashpad', 'zygote', 'other')
+
+
+def process_category(cmdline: Optional[List[str]], name: str = '') -> Tuple[str, str]:
+    """(categoría, detalle) de un proceso Chromium para atribuir su consumo.
+
+    Distingue las extensiones (``--type=renderer --extension-process``) de
+    los renderers de pestañas y los servicios utilitarios por
+    ``--utility-sub-type=``. El detalle es el subtipo o el ``--type`` original.
+    """
+    process_type = sub_type = None
+    extension = False
+    for arg in cmdline or []:
+        if arg.startswith('--type='):
+            process_type = arg[len('--type='):]
+        elif arg.startswith('--utility-sub-type='):
+            sub_type = arg[len('--utility-sub-type='):]
+        elif arg == '--extension-process':
+            extension = True
+    if process_type is None:
+        # chrome_crashpad_handler es un ejecutable aparte en Linux y macOS
+        if 'crashpad' in name.lower():
+            return 'crashpad', 'crashpad-handler'
+        return 'browser', ''
+    if process_type == 'renderer':
+        return ('extension' if extension else 'renderer'), ''
+    if process_type == 'gpu-process':
+        return 'gpu', ''
+    if process_type == 'utility':
+        return UTILITY_CATEGORIES.get(sub_type, 'utility'), sub_type or ''
+    if process_type == 'crashpad-handler':
+        return 'crashpad', process_type
+    if process_type == 'zygote':
+        return 'zygote', ''
+    return 'other', process_type
@@ -1,32 +1,559 @@
-import winreg
+import os
+import sys
+import json
 import logging
-from typing import Optional, Any
+from typing import Optional, Any, Callable, Dict, Iterable, List, Tuple
+from instrumentation import traced, count
+
+try:
+    import winreg
+except ImportError:  # Linux/macOS: se usa el backend en memoria o en archivo
+    winreg = None
+
+# Tipos de valor (mismos códigos que winreg)
+REG_SZ = 1
+REG_DWORD = 4
+
+# Colmenas soportadas
+HKLM = 'HKLM'
+HKCU = 'HKCU'
+HKU = 'HKU'
+
+# Vistas del registro en Windows de 64 bits
+VIEW_64 = 64
+VIEW_32 = 32
+
+# Valor tipado tal como lo guarda el registro: (dato, tipo)
+RegValue = Tuple[Any, int]
+
+
+def normalize_key_path(key_path: str) -> str:
+    """Normaliza una ruta de clave (separadores y barras sobrantes)."""
+    return '\\'.join(part for part in key_path.replace('/', '\\').split('\\') if part)
+
+
+def redirect_32bit_view(key_path: str, hive: str) -> str:
+    """Ruta que ve un proceso de 32 bits (redirección de WOW64 en HKLM\\SOFTWARE)."""
+    parts = key_path.split('\\')
+    if (hive == HKLM and len(parts) > 1 and parts[0].lower() == 'software'
+            and parts[1].lower() != 'wow6432node'):
+        return '\\'.join([parts[0], 'Wow6432Node'] + parts[1:])
+    return key_path
+
+
+class RegistryBackend:
+    """Interfaz común de los backends de registro.
+
+    Cada operación trabaja sobre una clave completa (p.ej.
+    ``SOFTWARE\\Google\\Chrome\\Process``) y la abre una sola vez.
+    """
+
+    # Indica si escribir en este backend requiere privilegios de administrador
+    requires_admin = False
+
+    def key_exists(self, key_path: str, hive: str = HKLM, view: int = VIEW_64) -> bool:
+        raise NotImplementedError
+
+    def read_values(self, key_path: str, value_names: Optional[Iterable[str]] = None,
+                    hive: str = HKLM, view: int = VIEW_64) -> Optional[Dict[str, RegValue]]:
+        """Lee varios valores de una clave. Retorna None si la clave no existe;
+        los valores ausentes simplemente no aparecen en el resultado.
+
+        ``view`` elige la vista de 64 o 32 bits (en la de 32 bits
+        HKLM\\SOFTWARE se redirige a SOFTWARE\\Wow6432Node)."""
+        raise NotImplementedError
+
+    def write_values(self, key_path: str, values: Dict[str, Optional[RegValue]],
+                     hive: str = HKLM,
+                     previous: Optional[Dict[str, Optional[RegValue]]] = None) -> None:
+        """Escribe varios valores en una clave (None borra el valor).
+
+        Si se pasa ``previous``, se va completando con el valor anterior de
+        cada nombre *antes* de escribirlo, para poder deshacer incluso si la
+        escritura falla a mitad de camino.
+        """
+        raise NotImplementedError
+
+    def subkeys(self, key_path: str, hive: str = HKLM, view: int = VIEW_64) -> List[str]:
+        """Nombres de las subclaves directas ([] si la clave no existe).
+
+        ``key_path`` vacío lista la raíz de la colmena (p. ej. las colmenas
+        de usuario cargadas en HKU).
+        """
+        return []
+
+    def query_last_write(self, key_path: str, hive: str = HKLM,
+                         view: int = VIEW_64) -> Optional[int]:
+        """Hora de última escritura de la clave (None si no existe).
+
+        Solo se compara por igualdad: sirve para saber si una clave cambió
+        sin volver a leer sus valores.
+        """
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Persiste los cambios pendientes (si el backend lo necesita)."""
+
+    def reload(self) -> bool:
+        """Vuelve a leer los datos si otro proceso los cambió (backends en archivo).
+
+        Retorna True si se recargaron.
+        """
+        return False
+
+    def repair(self) -> List[str]:
+        """Regenera los archivos derivados que se modificaron desde fuera.
+
+        Retorna los archivos corregidos (ninguno si el backend no genera archivos).
+        """
+        return []
+
+
+class WinRegBackend(RegistryBackend):
+    """Backend sobre el registro real de Windows (vista de 64 bits)."""
+
+    requires_admin = True
+
+    HIVES = {
+        HKLM: 'HKEY_LOCAL_MACHINE',
+        HKCU: 'HKEY_CURRENT_USER',
+        HKU: 'HKEY_USERS',
+    }
+
+    def _root(self, hive: str):
+        return getattr(winreg, self.HIVES[hive])
 
-class RegistryManager:
     @staticmethod
-    def set_registry_value(browser_path: str, key_path: str, 
-                          value_name: str, value: int) -> bool:
-        """Establece un valor en el registro de Windows."""
+    def _read_access(view: int) -> int:
+        return winreg.KEY_READ | (winreg.KEY_WOW64_32KEY if view == VIEW_32 else winreg.KEY_WOW64_64KEY)
+
+    @traced('registry.key_exists', 'registry', arg_index=1)
+    def key_exists(self, key_path: str, hive: str = HKLM, view: int = VIEW_64) -> bool:
+        try:
+            with winreg.OpenKey(self._root(hive), key_path, 0, self._read_access(view)):
+                return True
+        except OSError:
+            return False
+
+    @traced('registry.subkeys', 'registry', arg_index=1)
+    def subkeys(self, key_path: str, hive: str = HKLM, view: int = VIEW_64) -> List[str]:
+        names = []
+        try:
+            with winreg.OpenKey(self._root(hive), key_path, 0, self._read_access(view)) as key:
+                while True:
+                    try:
+                        names.append(winreg.EnumKey(key, len(names)))
+                    except OSError:
+                        break
+        except OSError:
+            pass
+        return names
+
+    @traced('registry.query_last_write', 'registry', arg_index=1)
+    def query_last_write(self, key_path: str, hive: str = HKLM,
+                         view: int = VIEW_64) -> Optional[int]:
+        try:
+            with winreg.OpenKey(self._root(hive), key_path, 0, self._read_access(view)) as key:
+                return winreg.QueryInfoKey(key)[2]
+        except OSError:
+            return None
+
+    @traced('registry.read_values', 'registry', arg_index=1)
+    def read_values(self, key_path: str, value_names: Optional[Iterable[str]] = None,
+                    hive: str = HKLM, view: int = VIEW_64) -> Optional[Dict[str, RegValue]]:
         try:
-            full_path = f"SOFTWARE\\{browser_path}\\{key_path}"
-            with winreg.CreateKeyEx(winreg.HKEY_LOCAL_MACHINE, full_path, 
-                                  0, winreg.KEY_WRITE | winreg.KEY_WOW64_64KEY) as key:
-                winreg.SetValueEx(key, value_name, 0, winreg.REG_DWORD, value)
-            return True
+            with winreg.OpenKey(self._root(hive), key_path, 0, self._read_access(view)) as key:
+                result = {}
+                if value_names is None:
+                    index = 0
+                    while True:
+                        try:
+                            name, data, value_type = winreg.EnumValue(key, index)
+                        except OSError:
+                            break
+                        result[name] = (data, value_type)
+                        index += 1
+                    return result
+                for name in value_names:
+                    try:
+                        result[name] = winreg.QueryValueEx(key, name)
+                    except OSError:
+                        continue
+                return result
+        except OSError:
+            return None
+
+    @traced('registry.write_values', 'registry', arg_index=1)
+    def write_values(self, key_path: str, values: Dict[str, Optional[RegValue]],
+                     hive: str = HKLM,
+                     previous: Optional[Dict[str, Optional[RegValue]]] = None) -> None:
+        if previous is None:
+            previous = {}
+        with winreg.CreateKeyEx(self._root(hive), key_path, 0,
+                                winreg.KEY_READ | winreg.KEY_WRITE | winreg.KEY_WOW64_64KEY) as key:
+            for name, new in values.items():
+                try:
+                    previous[name] = winreg.QueryValueEx(key, name)
+                except OSError:
+                    previous[name] = None
+                if new is None:
+                    if previous[name] is not None:
+                        winreg.DeleteValue(key, name)
+                else:
+                    winreg.SetValueEx(key, name, 0, new[1], new[0])
+
+
+class MemoryRegistryBackend(RegistryBackend):
+    """Registro simulado en memoria (insensible a mayúsculas en las rutas)."""
+
+    def __init__(self):
+        # id normalizado -> valores; las rutas originales se guardan aparte
+        self._keys: Dict[str, Dict[str, RegValue]] = {}
+        self._paths: Dict[str, str] = {}
+        # Reloj lógico de escrituras, equivalente a la hora de última escritura
+        self._stamps: Dict[str, int] = {}
+        self._clock = 0
+        # Equivalente simulado de RegNotifyChangeKeyValue: (colmena, ruta) tras cada escritura
+        self._listeners: List[Callable[[str, str], None]] = []
+
+    def add_listener(self, callback: Callable[[str, str], None]) -> None:
+        """Llama a ``callback(colmena, ruta)`` después de cada escritura en una clave."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[str, str], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _touch(self, key_id: str) -> None:
+        self._clock += 1
+        self._stamps[key_id] = self._clock
+
+    @staticmethod
+    def _key_id(key_path: str, hive: str, view: int = VIEW_64) -> str:
+        path = normalize_key_path(key_path)
+        if view == VIEW_32:
+            path = redirect_32bit_view(path, hive)
+        return f"{hive}\\{path}".lower()
+
+    def create_key(self, key_path: str, hive: str = HKLM) -> Dict[str, RegValue]:
+        """Crea la clave (y sus padres, como CreateKeyEx) y retorna sus valores."""
+        parts = normalize_key_path(key_path).split('\\')
+        values = None
+        for depth in range(1, len(parts) + 1):
+            partial = '\\'.join(parts[:depth])
+            key_id = self._key_id(partial, hive)
+            values = self._keys.get(key_id)
+            if values is None:
+                values = self._keys[key_id] = {}
+                self._paths[key_id] = f"{hive}\\{partial}"
+                # Crear una subclave también modifica la clave padre
+                self._touch(key_id)
+                if depth > 1:
+                    self._touch(self._key_id('\\'.join(parts[:depth - 1]), hive))
+        return values
+
+    @traced('registry.key_exists', 'registry', arg_index=1)
+    def key_exists(self, key_path: str, hive: str = HKLM, view: int = VIEW_64) -> bool:
+        return self._key_id(key_path, hive, view) in self._keys
+
+    @traced('registry.subkeys', 'registry', arg_index=1)
+    def subkeys(self, key_path: str, hive: str = HKLM, view: int = VIEW_64) -> List[str]:
+        parent = self._key_id(key_path, hive, view).rstrip('\\') + '\\'
+        return [
+            self._paths[key_id].rsplit('\\', 1)[-1] for key_id in self._keys
+            if key_id.startswith(parent) and '\\' not in key_id[len(parent):]
+        ]
+
+    @traced('registry.query_last_write', 'registry', arg_index=1)
+    def query_last_write(self, key_path: str, hive: str = HKLM,
+                         view: int = VIEW_64) -> Optional[int]:
+        return self._stamps.get(self._key_id(key_path, hive, view))
+
+    @traced('registry.read_values', 'registry', arg_index=1)
+    def read_values(self, key_path: str, value_names: Optional[Iterable[str]] = None,
+                    hive: str = HKLM, view: int = VIEW_64) -> Optional[Dict[str, RegValue]]:
+        values = self._keys.get(self._key_id(key_path, hive, view))
+        if values is None:
+            return None
+        if value_names is None:
+            return dict(values)
+        return {name: values[name] for name in value_names if name in values}
+
+    @traced('registry.write_values', 'registry', arg_index=1)
+    def write_values(self, key_path: str, values: Dict[str, Optional[RegValue]],
+                     hive: str = HKLM,
+                     previous: Optional[Dict[str, Optional[RegValue]]] = None) -> None:
+        if previous is None:
+            previous = {}
+        stored = self.create_key(key_path, hive)
+        self._touch(self._key_id(key_path, hive))
+        for name, new in values.items():
+            previous[name] = stored.get(name)
+            if new is None:
+                stored.pop(name, None)
+            else:
+                stored[name] = (new[0], new[1])
+        for listener in list(self._listeners):
+            listener(hive, normalize_key_path(key_path))
+
+    def dump(self) -> Dict[str, Dict[str, List]]:
+        """Retorna el contenido como dict serializable a JSON."""
+        return {
+            self._paths[key_id]: {name: [data, value_type] for name, (data, value_type) in values.items()}
+            for key_id, values in self._keys.items()
+        }
+
+    def load(self, data: Dict[str, Dict[str, List]]) -> None:
+        """Reemplaza el contenido con el de un dict generado por ``dump``."""
+        self._keys.clear()
+        self._paths.clear()
+        self._stamps.clear()
+        for full_path, values in data.items():
+            hive, _, key_path = full_path.partition('\\')
+            stored = self.create_key(key_path, hive)
+            for name, (data_value, value_type) in values.items():
+                stored[name] = (data_value, value_type)
+
+
+class JsonFileRegistryBackend(MemoryRegistryBackend):
+    """Registro simulado persistido en un archivo JSON.
+
+    Los cambios se guardan en ``flush`` escribiendo un archivo temporal y
+    renombrándolo, de modo que el archivo nunca queda a medio escribir.
+    """
+
+    def __init__(self, file_path: str):
+        super().__init__()
+        self.file_path = file_path
+        self._mtime: Optional[int] = None
+        if os.path.exists(file_path):
+            self.reload()
+
+    def reload(self) -> bool:
+        try:
+            mtime = os.stat(self.file_path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                self.load(json.load(f))
+        except (OSError, ValueError) as e:
+            logging.error(f"No se pudo leer el registro simulado {self.file_path}: {e}")
+            return False
+        self._mtime = mtime
+        return True
+
+    @traced('registry.flush', 'registry')
+    def flush(self) -> None:
+        import tempfile
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.registry-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.dump(), f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.file_path)
+            # Lo escrito por este proceso no cuenta como cambio externo
+            self._mtime = os.stat(self.file_path).st_mtime_ns
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class RegistryTransaction:
+    """Agrupa escrituras por clave y las confirma o revierte como una unidad.
+
+    Uso::
+
+        with RegistryManager.transaction() as tx:
+            tx.set_value(r"SOFTWARE\\Google\\Chrome\\Process", "MaxMemPerProcess", 4096)
+
+    Al salir del bloque sin excepción se llama a ``commit``; si hay una
+    excepción se descartan las escrituras pendientes. Si ``commit`` falla a
+    mitad de camino se restauran los valores anteriores de las claves ya
+    escritas (los valores, no las claves que se hayan creado).
+    """
+
+    def __init__(self, backend: RegistryBackend, hive: str = HKLM):
+        self.backend = backend
+        self.hive = hive
+        self.committed = False
+        # (colmena, ruta normalizada) -> {nombre: (dato, tipo) | None}
+        self._pending: Dict[Tuple[str, str], Dict[str, Optional[RegValue]]] = {}
+        # Tras un commit: (colmena, ruta, nombre, antes, después) de cada valor escrito
+        self.changes: List[Tuple[str, str, str, Optional[RegValue], Optional[RegValue]]] = []
+
+    def set_value(self, key_path: str, value_name: str, value: Any,
+                  value_type: int = REG_DWORD, hive: Optional[str] = None) -> None:
+        key = (hive or self.hive, normalize_key_path(key_path))
+        self._pending.setdefault(key, {})[value_name] = (value, value_type)
+
+    def delete_value(self, key_path: str, value_name: str, hive: Optional[str] = None) -> None:
+        key = (hive or self.hive, normalize_key_path(key_path))
+        self._pending.setdefault(key, {})[value_name] = None
+
+    def __len__(self) -> int:
+        return sum(len(values) for values in self._pending.values())
+
+    @property
+    def key_count(self) -> int:
+        return len(self._pending)
+
+    @traced('registry.commit', 'registry')
+    def commit(self) -> bool:
+        """Escribe todas las claves pendientes (una apertura por clave)."""
+        applied: List[Tuple[str, str, Dict[str, Optional[RegValue]]]] = []
+        try:
+            for (hive, key_path), values in self._pending.items():
+                previous: Dict[str, Optional[RegValue]] = {}
+                applied.append((hive, key_path, previous))
+                self.backend.write_values(key_path, values, hive=hive, previous=previous)
+            self.backend.flush()
         except Exception as e:
-            logging.error(f"Error al establecer registro {full_path}\\{value_name}: {e}")
+            hive, key_path, _ = applied[-1] if applied else (self.hive, '', None)
+            logging.error(f"Error al escribir {hive}\\{key_path}, revirtiendo lote: {e}")
+            self._undo(applied)
+            self._pending.clear()
             return False
+        self.changes = [
+            (hive, key_path, name, previous.get(name), after)
+            for hive, key_path, previous in applied
+            for name, after in self._pending[(hive, key_path)].items()
+        ]
+        count('registry.values_written', len(self.changes))
+        count('registry.keys_written', len(applied))
+        self._pending.clear()
+        self.committed = True
+        return True
+
+    def _undo(self, applied: List[Tuple[str, str, Dict[str, Optional[RegValue]]]]) -> None:
+        for hive, key_path, previous in reversed(applied):
+            if not previous:
+                continue
+            try:
+                self.backend.write_values(key_path, previous, hive=hive)
+            except Exception as e:
+                logging.error(f"No se pudo revertir {hive}\\{key_path}: {e}")
+        try:
+            self.backend.flush()
+        except Exception as e:
+            logging.error(f"No se pudo persistir la reversión: {e}")
+
+    def rollback(self) -> None:
+        """Descarta las escrituras pendientes."""
+        self._pending.clear()
+
+    def __enter__(self) -> 'RegistryTransaction':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+def is_admin() -> bool:
+    """True si se puede escribir con el backend actual (administrador o root)."""
+    # El registro simulado (pruebas) no necesita privilegios
+    if not RegistryManager.get_backend().requires_admin:
+        return True
+    if sys.platform != 'win32':
+        return os.geteuid() == 0
+    try:
+        import ctypes
+        return bool(ctypes.windll.shell32.IsUserAnAdmin())
+    except Exception:
+        return False
+
+
+class RegistryManager:
+    _backend: Optional[RegistryBackend] = None
+
+    @staticmethod
+    def get_backend() -> RegistryBackend:
+        """Retorna el backend activo, creándolo la primera vez.
+
+        En Windows se usa el registro real. En otros sistemas se usa un
+        registro simulado en el archivo JSON indicado por la variable de
+        entorno SPEEDCHROME_REGISTRY_FILE; si no está definida, en Linux se
+        usa el backend de políticas (linux_backend.py) y en el resto un
+        registro en memoria.
+        """
+        if RegistryManager._backend is None:
+            if winreg is not None:
+                RegistryManager._backend = WinRegBackend()
+            elif os.environ.get('SPEEDCHROME_REGISTRY_FILE'):
+                RegistryManager._backend = JsonFileRegistryBackend(
+                    os.environ['SPEEDCHROME_REGISTRY_FILE'])
+            elif sys.platform.startswith('linux'):
+                from linux_backend import LinuxPolicyBackend
+                from app_paths import get_data_dir
+                RegistryManager._backend = LinuxPolicyBackend(
+                    os.path.join(get_data_dir(), 'policies.json'))
+            else:
+                RegistryManager._backend = MemoryRegistryBackend()
+        return RegistryManager._backend
+
+    @staticmethod
+    def set_backend(backend: Optional[RegistryBackend]) -> None:
+        """Reemplaza el backend activo (None vuelve a la detección automática)."""
+        RegistryManager._backend = backend
+
+    @staticmethod
+    def transaction(hive: str = HKLM) -> RegistryTransaction:
+        """Crea un lote de escrituras sobre el backend activo."""
+        return RegistryTransaction(RegistryManager.get_backend(), hive)
+
+    @staticmethod
+    def build_path(browser_path: str, key_path: str) -> str:
+        """Construye la ruta completa de una clave de navegador."""
+        return f"SOFTWARE\\{browser_path}\\{key_path}"
+
+    @staticmethod
+    def set_registry_value(browser_path: str, key_path: str,
+                          value_name: str, value: int) -> bool:
+        """Establece un valor en el registro de Windows."""
+        tx = RegistryManager.transaction()
+        tx.set_value(RegistryManager.build_path(browser_path, key_path), value_name, value)
+        return tx.commit()
+
+    @staticmethod
+    def get_registry_values(browser_path: str,
+                            wanted: Dict[str, Iterable[str]]) -> Dict[Tuple[str, str], Any]:
+        """Lee en lote varios valores de un navegador (una apertura por clave).
+
+        ``wanted`` es {subclave: [nombres]}; retorna {(subclave, nombre): dato}
+        solo con los valores que existen.
+        """
+        backend = RegistryManager.get_backend()
+        result = {}
+        for key_path, names in wanted.items():
+            full_path = RegistryManager.build_path(browser_path, key_path)
+            try:
+                values = backend.read_values(full_path, list(names))
+            except Exception as e:
+                logging.debug(f"No se pudo leer registro {full_path}: {e}")
+                continue
+            for name, value in (values or {}).items():
+                result[(key_path, name)] = value[0]
+        return result
 
     @staticmethod
-    def get_registry_value(browser_path: str, key_path: str, 
+    def get_registry_value(browser_path: str, key_path: str,
                           value_name: str) -> Optional[Any]:
         """Obtiene un valor del registro de Windows."""
+        full_path = RegistryManager.build_path(browser_path, key_path)
         try:
-            full_path = f"SOFTWARE\\{browser_path}\\{key_path}"
-            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, full_path, 
-                              0, winreg.KEY_READ | winreg.KEY_WOW64_64KEY) as key:
-                value, _ = winreg.QueryValueEx(key, value_name)
-                return value
+            values = RegistryManager.get_backend().read_values(full_path, [value_name])
         except Exception as e:
             logging.debug(f"No se pudo leer registro {full_path}\\{value_name}: {e}")
-            return None 
\ No newline at end of file
+            return None
+        if not values or value_name not in values:
+            logging.debug(f"No se pudo leer registro {full_path}\\{value_name}")
+            return None
+        return values[value_name][0]
@@ -0,0 +1,628 @@
+import os
+import re
+import sys
+import time
+import errno
+import logging
+import threading
+import psutil
+from typing import Callable, Dict, List, Optional, Set
+from browser_manager import BrowserManager
+from process_utils import BrowserMatcher, ProcessSnapshot
+from sessions import OwnerResolver, interactive_user, user_key
+from telemetry import private_bytes
+from instrumentation import traced, count
+
+# ``MaxMemPerProcess`` es solo una preferencia que Chromium no hace cumplir.
+# Aquí el árbol de procesos de cada navegador se mete en un contenedor del
+# sistema con límites reales: un cgroup v2 en Linux (memory.high,
+# memory.max, cpu.max) o un Job Object en Windows (memoria del trabajo y
+# tope de CPU). Los hijos nuevos quedan dentro solos: heredan el cgroup o el
+# trabajo de su padre.
+
+# Eventos de memoria que se informan (contadores acumulados del contenedor)
+MEMORY_EVENTS = ('high', 'max', 'oom', 'oom_kill', 'abnormal_exit')
+
+CPU_PERIOD_US = 100000
+
+
+class ResourceContainer:
+    """Contenedor de procesos con límites de memoria y CPU."""
+
+    name = ''
+
+    def apply_limits(self, memory_max: Optional[int], memory_high: Optional[int],
+                     cpu_percent: Optional[float]) -> List[str]:
+        """Aplica los límites (None: sin límite); retorna los que no se pudieron aplicar."""
+        raise NotImplementedError
+
+    def add(self, pid: int) -> bool:
+        raise NotImplementedError
+
+    def members(self) -> Set[int]:
+        raise NotImplementedError
+
+    def events(self) -> Dict[str, int]:
+        """Contadores acumulados de ``MEMORY_EVENTS``."""
+        return {}
+
+    def usage(self) -> Optional[int]:
+        """Memoria del contenedor en bytes (None si no se conoce)."""
+        return None
+
+    def release(self) -> None:
+        """Quita los límites y, si se puede, saca los procesos del contenedor."""
+        raise NotImplementedError
+
+
+def cgroup2_mount() -> Optional[str]:
+    """Punto de montaje de la jerarquía cgroup v2 (None si no hay)."""
+    try:
+        with open('/proc/self/mounts', 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 2 and fields[2] == 'cgroup2':
+                    return fields[1]
+    except OSError:
+        pass
+    return None
+
+
+def cgroup_of(pid: int) -> Optional[str]:
+    """Ruta del cgroup v2 de un proceso, relativa al montaje ('/user.slice/...')."""
+    try:
+        with open(f'/proc/{pid}/cgroup', 'r') as f:
+            for line in f:
+                if line.startswith('0::'):
+                    return line[3:].strip()
+    except OSError:
+        pass
+    return None
+
+
+def default_cgroup_base() -> Optional[str]:
+    """Cgroup bajo el que se crean los contenedores.
+
+    Como root, ``speedchrome.slice`` en la raíz de la jerarquía; como usuario,
+    dentro del subárbol que systemd le delega (``user@UID.service``). Se
+    puede forzar con SPEEDCHROME_CGROUP_BASE (p. ej. un directorio de prueba).
+    """
+    override = os.environ.get('SPEEDCHROME_CGROUP_BASE')
+    if override:
+        return override
+    mount = cgroup2_mount()
+    if mount is None:
+        return None
+    if os.geteuid() == 0:
+        return os.path.join(mount, 'speedchrome.slice')
+    parts = [part for part in (cgroup_of(os.getpid()) or '').split('/') if part]
+    for index, part in enumerate(parts):
+        if part.startswith('user@') and part.endswith('.service'):
+            return os.path.join(mount, *parts[:index + 1], 'speedchrome.slice')
+    return None
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _controllers(path: str) -> Set[str]:
+    """Controladores listados en cgroup.controllers o cgroup.subtree_control."""
+    return set(re.findall(r'[a-z_]+', _read(path) or ''))
+
+
+def _write(path: str, value: str, append: bool = False) -> None:
+    # Cada write en un archivo de cgroup es una operación. En cgroup.procs y
+    # cgroup.subtree_control se abre para agregar, así un directorio de
+    # prueba acumula lo escrito como lo listaría el kernel
+    with open(path, 'a' if append else 'w') as f:
+        f.write(value + '\n')
+
+
+class CgroupContainer(ResourceContainer):
+    """Cgroup v2 hoja: ``<base>/<nombre>.scope``."""
+
+    CONTROLLERS = ('memory', 'cpu')
+
+    def __init__(self, path: str, controllers: Set[str]):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.controllers = controllers
+        self._origin: Optional[str] = None
+
+    @classmethod
+    def create(cls, base: str, name: str) -> Optional['CgroupContainer']:
+        """Crea el cgroup y habilita memory y cpu para él (None si no se puede)."""
+        # El padre tiene que delegar los controladores a la base y la base
+        # (que no tiene procesos propios) a sus hojas
+        parent = os.path.dirname(base.rstrip('/'))
+        try:
+            os.makedirs(base, exist_ok=True)
+            for controller in cls.CONTROLLERS:
+                if controller not in _controllers(os.path.join(base, 'cgroup.controllers')):
+                    try:
+                        _write(os.path.join(parent, 'cgroup.subtree_control'), f'+{controller}', append=True)
+                    except OSError as e:
+                        logging.debug(f"No se pudo habilitar {controller} en {parent}: {e}")
+                if controller in _controllers(os.path.join(base, 'cgroup.controllers')):
+                    try:
+                        _write(os.path.join(base, 'cgroup.subtree_control'), f'+{controller}', append=True)
+                    except OSError as e:
+                        logging.debug(f"No se pudo habilitar {controller} en {base}: {e}")
+            path = os.path.join(base, f'{name}.scope')
+            os.makedirs(path, exist_ok=True)
+        except OSError as e:
+            logging.error(f"No se pudo crear el cgroup {name} en {base}: {e}")
+            return None
+        return cls(path, _controllers(os.path.join(base, 'cgroup.subtree_control')))
+
+    def apply_limits(self, memory_max, memory_high, cpu_percent) -> List[str]:
+        values = [
+            ('memory.max', 'memory', str(memory_max) if memory_max else None),
+            ('memory.high', 'memory', str(memory_high) if memory_high else None),
+            ('cpu.max', 'cpu',
+             f'{max(int(cpu_percent / 100 * CPU_PERIOD_US), 1000)} {CPU_PERIOD_US}' if cpu_percent else None),
+        ]
+        failed = []
+        for name, controller, value in values:
+            if controller not in self.controllers:
+                if value:
+                    failed.append(name)
+                continue
+            value = value or ('max' if name != 'cpu.max' else f'max {CPU_PERIOD_US}')
+            try:
+                _write(os.path.join(self.path, name), value)
+            except OSError as e:
+                logging.error(f"No se pudo escribir {name}={value} en {self.path}: {e}")
+                failed.append(name)
+        return failed
+
+    def add(self, pid: int) -> bool:
+        if self._origin is None:
+            self._origin = cgroup_of(pid)
+        try:
+            _write(os.path.join(self.path, 'cgroup.procs'), str(pid), append=True)
+            return True
+        except OSError as e:
+            if e.errno != errno.ESRCH:
+                logging.error(f"No se pudo mover PID {pid} a {self.path}: {e}")
+            return False
+
+    def members(self) -> Set[int]:
+        return {int(line) for line in (_read(os.path.join(self.path, 'cgroup.procs')) or '').split()}
+
+    def events(self) -> Dict[str, int]:
+        counters = {}
+        for line in (_read(os.path.join(self.path, 'memory.events')) or '').splitlines():
+            fields = line.split()
+            if len(fields) == 2 and fields[0] in MEMORY_EVENTS:
+                counters[fields[0]] = int(fields[1])
+        return counters
+
+    def usage(self) -> Optional[int]:
+        current = _read(os.path.join(self.path, 'memory.current'))
+        return int(current) if current and current.strip().isdigit() else None
+
+    def release(self) -> None:
+        self.apply_limits(None, None, None)
+        mount = cgroup2_mount()
+        if self._origin is not None and mount is not None:
+            origin = os.path.join(mount, self._origin.lstrip('/'))
+            for pid in self.members():
+                try:
+                    _write(os.path.join(origin, 'cgroup.procs'), str(pid), append=True)
+                except OSError as e:
+                    logging.debug(f"No se pudo devolver PID {pid} a {origin}: {e}")
+                    break
+        try:
+            os.rmdir(self.path)
+        except OSError as e:
+            # Quedan procesos: el cgroup sigue, pero sin límites
+            logging.debug(f"No se pudo eliminar {self.path}: {e}")
+
+
+class JobObjectContainer(ResourceContainer):
+    """Job Object con nombre, con límite de memoria del trabajo y tope de CPU.
+
+    ``memory_high`` se arma como límite de notificación (Windows 10+): al
+    superarlo el trabajo avisa pero no falla ninguna asignación. Los avisos
+    llegan por un puerto de finalización que se consulta en ``events``.
+    """
+
+    JobObjectBasicProcessIdList = 3
+    JobObjectAssociateCompletionPortInformation = 7
+    JobObjectExtendedLimitInformation = 9
+    JobObjectNotificationLimitInformation = 12
+    JobObjectCpuRateControlInformation = 15
+    JOB_OBJECT_LIMIT_JOB_MEMORY = 0x00000200
+    JOB_OBJECT_CPU_RATE_CONTROL_ENABLE = 0x1
+    JOB_OBJECT_CPU_RATE_CONTROL_HARD_CAP = 0x4
+    TOLERANCE_LOW = 1
+    PROCESS_SET_QUOTA = 0x0100
+    PROCESS_TERMINATE = 0x0001
+    # Mensajes del puerto de finalización
+    MESSAGES = {8: 'abnormal_exit', 9: 'max', 10: 'max', 11: 'high'}
+    MAX_PIDS = 4096
+
+    def __init__(self, name: str):
+        import ctypes
+        from ctypes import wintypes
+
+        class IoCounters(ctypes.Structure):
+            _fields_ = [(field, ctypes.c_ulonglong) for field in (
+                'ReadOperationCount', 'WriteOperationCount', 'OtherOperationCount',
+                'ReadTransferCount', 'WriteTransferCount', 'OtherTransferCount')]
+
+        class BasicLimits(ctypes.Structure):
+            _fields_ = [('PerProcessUserTimeLimit', ctypes.c_int64), ('PerJobUserTimeLimit', ctypes.c_int64),
+                        ('LimitFlags', wintypes.DWORD), ('MinimumWorkingSetSize', ctypes.c_size_t),
+                        ('MaximumWorkingSetSize', ctypes.c_size_t), ('ActiveProcessLimit', wintypes.DWORD),
+                        ('Affinity', ctypes.c_size_t), ('PriorityClass', wintypes.DWORD),
+                        ('SchedulingClass', wintypes.DWORD)]
+
+        class ExtendedLimits(ctypes.Structure):
+            _fields_ = [('BasicLimitInformation', BasicLimits), ('IoInfo', IoCounters),
+                        ('ProcessMemoryLimit', ctypes.c_size_t), ('JobMemoryLimit', ctypes.c_size_t),
+                        ('PeakProcessMemoryUsed', ctypes.c_size_t), ('PeakJobMemoryUsed', ctypes.c_size_t)]
+
+        class NotificationLimits(ctypes.Structure):
+            _fields_ = [('IoReadBytesLimit', ctypes.c_uint64), ('IoWriteBytesLimit', ctypes.c_uint64),
+                        ('PerJobUserTimeLimit', ctypes.c_int64), ('JobMemoryLimit', ctypes.c_uint64),
+                        ('RateControlTolerance', ctypes.c_int), ('RateControlToleranceInterval', ctypes.c_int),
+                        ('LimitFlags', wintypes.DWORD)]
+
+        class CpuRateControl(ctypes.Structure):
+            _fields_ = [('ControlFlags', wintypes.DWORD), ('CpuRate', wintypes.DWORD)]
+
+        class CompletionPort(ctypes.Structure):
+            _fields_ = [('CompletionKey', ctypes.c_void_p), ('CompletionPort', wintypes.HANDLE)]
+
+        class ProcessIdList(ctypes.Structure):
+            _fields_ = [('NumberOfAssignedProcesses', wintypes.DWORD),
+                        ('NumberOfProcessIdsInList', wintypes.DWORD),
+                        ('ProcessIdList', ctypes.c_size_t * self.MAX_PIDS)]
+
+        self._ctypes = ctypes
+        self._structs = {'extended': ExtendedLimits, 'notification': NotificationLimits,
+                         'cpu': CpuRateControl, 'pids': ProcessIdList}
+        self.name = name
+        kernel32 = self._kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+        kernel32.CreateJobObjectW.argtypes = [wintypes.LPVOID, wintypes.LPCWSTR]
+        kernel32.SetInformationJobObject.argtypes = [wintypes.HANDLE, ctypes.c_int, wintypes.LPVOID,
+                                                     wintypes.DWORD]
+        kernel32.QueryInformationJobObject.argtypes = [wintypes.HANDLE, ctypes.c_int, wintypes.LPVOID,
+                                                       wintypes.DWORD, wintypes.LPDWORD]
+        kernel32.AssignProcessToJobObject.argtypes = [wintypes.HANDLE, wintypes.HANDLE]
+        kernel32.OpenProcess.restype = wintypes.HANDLE
+        kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+        kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+        kernel32.CreateIoCompletionPort.restype = wintypes.HANDLE
+        kernel32.CreateIoCompletionPort.argtypes = [wintypes.HANDLE, wintypes.HANDLE, ctypes.c_void_p,
+                                                    wintypes.DWORD]
+        kernel32.GetQueuedCompletionStatus.argtypes = [
+            wintypes.HANDLE, wintypes.LPDWORD, ctypes.POINTER(ctypes.c_void_p),
+            ctypes.POINTER(ctypes.c_void_p), wintypes.DWORD]
+
+        self._job = kernel32.CreateJobObjectW(None, name)
+        if not self._job:
+            raise ctypes.WinError(ctypes.get_last_error())
+        # Puerto para los avisos de memoria (INVALID_HANDLE_VALUE: puerto nuevo)
+        self._port = kernel32.CreateIoCompletionPort(wintypes.HANDLE(-1), None, None, 1)
+        port = CompletionPort(None, self._port)
+        if not kernel32.SetInformationJobObject(self._job, self.JobObjectAssociateCompletionPortInformation,
+                                                ctypes.byref(port), ctypes.sizeof(port)):
+            logging.warning(f"El trabajo {name} no informará eventos de memoria: "
+                            f"{ctypes.WinError(ctypes.get_last_error())}")
+        self._counters = {event: 0 for event in MEMORY_EVENTS}
+
+    def _set(self, info_class: int, struct) -> bool:
+        ctypes = self._ctypes
+        if self._kernel32.SetInformationJobObject(self._job, info_class, ctypes.byref(struct),
+                                                  ctypes.sizeof(struct)):
+            return True
+        logging.error(f"SetInformationJobObject({info_class}) falló en {self.name}: "
+                      f"{ctypes.WinError(ctypes.get_last_error())}")
+        return False
+
+    def apply_limits(self, memory_max, memory_high, cpu_percent) -> List[str]:
+        failed = []
+        limits = self._structs['extended']()
+        if memory_max:
+            limits.BasicLimitInformation.LimitFlags = self.JOB_OBJECT_LIMIT_JOB_MEMORY
+            limits.JobMemoryLimit = memory_max
+        if not self._set(self.JobObjectExtendedLimitInformation, limits) and memory_max:
+            failed.append('memory.max')
+
+        notification = self._structs['notification']()
+        notification.RateControlTolerance = self.TOLERANCE_LOW
+        notification.RateControlToleranceInterval = self.TOLERANCE_LOW
+        if memory_high:
+            notification.LimitFlags = self.JOB_OBJECT_LIMIT_JOB_MEMORY
+            notification.JobMemoryLimit = memory_high
+        if not self._set(self.JobObjectNotificationLimitInformation, notification) and memory_high:
+            failed.append('memory.high')
+
+        rate = self._structs['cpu']()
+        if cpu_percent:
+            # CpuRate es en centésimas de porcentaje de todas las CPUs
+            cpus = psutil.cpu_count() or 1
+            rate.ControlFlags = self.JOB_OBJECT_CPU_RATE_CONTROL_ENABLE | self.JOB_OBJECT_CPU_RATE_CONTROL_HARD_CAP
+            rate.CpuRate = max(min(int(cpu_percent / cpus * 100), 10000), 1)
+        if not self._set(self.JobObjectCpuRateControlInformation, rate) and cpu_percent:
+            failed.append('cpu.max')
+        return failed
+
+    def add(self, pid: int) -> bool:
+        ctypes = self._ctypes
+        handle = self._kernel32.OpenProcess(self.PROCESS_SET_QUOTA | self.PROCESS_TERMINATE, False, pid)
+        if not handle:
+            logging.debug(f"No se pudo abrir PID {pid}: {ctypes.WinError(ctypes.get_last_error())}")
+            return False
+        try:
+            if self._kernel32.AssignProcessToJobObject(self._job, handle):
+                return True
+            logging.error(f"No se pudo asignar PID {pid} al trabajo {self.name}: "
+                          f"{ctypes.WinError(ctypes.get_last_error())}")
+            return False
+        finally:
+            self._kernel32.CloseHandle(handle)
+
+    def members(self) -> Set[int]:
+        ctypes = self._ctypes
+        pids = self._structs['pids']()
+        if not self._kernel32.QueryInformationJobObject(self._job, self.JobObjectBasicProcessIdList,
+                                                        ctypes.byref(pids), ctypes.sizeof(pids), None):
+            return set()
+        return set(pids.ProcessIdList[:pids.NumberOfProcessIdsInList])
+
+    def events(self) -> Dict[str, int]:
+        ctypes = self._ctypes
+        from ctypes import wintypes
+
+        message = wintypes.DWORD()
+        key = ctypes.c_void_p()
+        overlapped = ctypes.c_void_p()
+        # Vaciar el puerto sin esperar
+        while self._kernel32.GetQueuedCompletionStatus(self._port, ctypes.byref(message), ctypes.byref(key),
+                                                       ctypes.byref(overlapped), 0):
+            event = self.MESSAGES.get(message.value)
+            if event:
+                self._counters[event] += 1
+        return dict(self._counters)
+
+    def usage(self) -> Optional[int]:
+        total = 0
+        for pid in self.members():
+            try:
+                total += private_bytes(psutil.Process(pid).memory_info())
+            except psutil.Error:
+                continue
+        return int(total)
+
+    def release(self) -> None:
+        # Un proceso no puede salir de un trabajo: se quitan los límites y el
+        # trabajo desaparece cuando terminan sus procesos
+        self.apply_limits(None, None, None)
+        self._kernel32.CloseHandle(self._port)
+        self._kernel32.CloseHandle(self._job)
+
+
+class MemoryContainer(ResourceContainer):
+    """Contenedor simulado: registra límites y miembros sin tocar el sistema."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.limits: Dict[str, Optional[float]] = {}
+        self.pids: Set[int] = set()
+        self.counters: Dict[str, int] = {}
+
+    def apply_limits(self, memory_max, memory_high, cpu_percent) -> List[str]:
+        self.limits = {'memory_max': memory_max, 'memory_high': memory_high, 'cpu_percent': cpu_percent}
+        return []
+
+    def add(self, pid: int) -> bool:
+        self.pids.add(pid)
+        return True
+
+    def members(self) -> Set[int]:
+        return set(self.pids)
+
+    def events(self) -> Dict[str, int]:
+        return dict(self.counters)
+
+    def release(self) -> None:
+        self.limits = {}
+        self.pids.clear()
+
+
+def container_name(browser: str, user: Optional[str]) -> str:
+    """Nombre del contenedor de un navegador de un usuario (uno por sesión)."""
+    if not user:
+        return browser
+    return f"{browser}-{re.sub(r'[^A-Za-z0-9_.-]', '_', user_key(user))}"
+
+
+def create_container(name: str) -> Optional[ResourceContainer]:
+    """Contenedor de la plataforma con ese nombre (None si no hay soporte)."""
+    if sys.platform == 'win32':
+        try:
+            return JobObjectContainer(f'SpeedChrome-{name}')
+        except OSError as e:
+            logging.error(f"No se pudo crear el Job Object de {name}: {e}")
+            return None
+    if sys.platform.startswith('linux'):
+        base = default_cgroup_base()
+        if base is None:
+            logging.error("No hay un cgroup v2 con permisos de escritura para los contenedores")
+            return None
+        return CgroupContainer.create(base, name.lower())
+    logging.error(f"Los contenedores de recursos no están soportados en {sys.platform}")
+    return None
+
+
+class ResourceLimiter:
+    """Hace cumplir límites de memoria y CPU por navegador con un contenedor.
+
+    ``limits`` es {navegador: {'memory_max': bytes, 'cpu_percent': % de un
+    núcleo}} (None: sin límite). ``memory_high`` es ``high_ratio`` del
+    máximo: al pasarlo el kernel reclama memoria y frena al navegador antes
+    de llegar al máximo.
+
+    Cada ``interval`` segundos se buscan los procesos del navegador y se
+    mueven al contenedor los que no están (navegadores iniciados después,
+    procesos creados antes de empezar); los hijos de los que ya están entran
+    solos. También se leen los contadores de eventos de memoria del
+    contenedor y se informan los que aumentaron.
+
+    Los procesos se buscan por los nombres de la plataforma (``chrome`` y
+    ``msedge`` en Linux, ``chrome.exe`` en Windows) y cada árbol va al
+    contenedor del navegador cuya carpeta tiene su ejecutable
+    (``BrowserMatcher``): los canales que comparten ejecutable tienen cada
+    uno su contenedor y su límite.
+
+    Solo se limitan los navegadores de ``user`` (por defecto quien ejecuta
+    SpeedChrome; con sudo, quien lo llamó): en un servidor de terminales un
+    mismo límite no debe repartirse entre las sesiones de todos los
+    usuarios. El nombre del contenedor lleva el usuario.
+    """
+
+    def __init__(self, limits: Dict[str, Dict], interval: float = 2.0, high_ratio: float = 0.9,
+                 container_factory: Callable[[str], Optional[ResourceContainer]] = create_container,
+                 process_iter: Callable = psutil.process_iter,
+                 on_event: Optional[Callable[[Dict], None]] = None,
+                 matcher: Optional[BrowserMatcher] = None, user: Optional[str] = None):
+        self.limits = limits
+        self.interval = interval
+        self.high_ratio = high_ratio
+        self.on_event = on_event
+        self._factory = container_factory
+        self._process_iter = process_iter
+        self.matcher = matcher or BrowserManager.get_matcher()
+        self.user = user or interactive_user()
+        self._owners = OwnerResolver()
+        self.containers: Dict[str, ResourceContainer] = {}
+        self._events: Dict[str, Dict[str, int]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def load_limits(cpu_percent: Optional[float] = None) -> Dict[str, Dict]:
+        """Límites a partir del ``memory_limit`` (MB) guardado por ``save_config``."""
+        _, config = BrowserManager.check_previous_config()
+        return {
+            browser: {'memory_max': values['memory_limit'] * 1024 * 1024, 'cpu_percent': cpu_percent}
+            for browser, values in config.items() if values.get('memory_limit')
+        }
+
+    def setup(self) -> Dict[str, bool]:
+        """Crea los contenedores y aplica los límites; retorna si cada uno quedó activo."""
+        result = {}
+        for browser, limit in self.limits.items():
+            if browser not in BrowserManager.BROWSER_PATHS:
+                result[browser] = False
+                continue
+            container = self._factory(container_name(browser, self.user))
+            if container is None:
+                result[browser] = False
+                continue
+            memory_max = limit.get('memory_max')
+            memory_high = int(memory_max * self.high_ratio) if memory_max else None
+            failed = container.apply_limits(memory_max, memory_high, limit.get('cpu_percent'))
+            if failed:
+                logging.warning(f"{browser}: límites no aplicados ({', '.join(failed)}): "
+                                "el controlador no está disponible")
+            self.containers[browser] = container
+            self._events[browser] = container.events()
+            result[browser] = True
+            logging.info(f"{browser}: contenedor {container.name} con "
+                         f"{memory_max / 1024 ** 3 if memory_max else 0:.1f} GB")
+        return result
+
+    @traced('limits.check', 'process')
+    def check(self) -> List[Dict]:
+        """Mueve al contenedor los procesos nuevos y retorna los eventos de memoria."""
+        snapshot = ProcessSnapshot.capture(self.matcher.names(self.containers),
+                                           process_iter=self._process_iter)
+        users = [self.user] if self.user else None
+        events = []
+        for browser, container in self.containers.items():
+            pids = []
+            for root, _ in self._owners.owned(self.matcher.roots(snapshot, browser), users):
+                pids.append(root.pid)
+                pids.extend(snapshot.descendants(root.pid))
+            members = container.members() if pids else set()
+            missing = [pid for pid in pids if pid not in members]
+            adopted = sum(1 for pid in missing if container.add(pid))
+            if adopted:
+                count('limits.adopted', adopted, browser=browser)
+                logging.info(f"{browser}: {adopted} procesos movidos al contenedor")
+
+            counters = container.events()
+            previous = self._events.get(browser, {})
+            for event in MEMORY_EVENTS:
+                delta = counters.get(event, 0) - previous.get(event, 0)
+                if delta > 0:
+                    usage = container.usage()
+                    logging.warning(f"{browser}: el contenedor llegó a memory.{event} ({delta} veces)")
+                    count('limits.events', delta, browser=browser, event=event)
+                    events.append({'browser': browser, 'event': event, 'count': delta,
+                                   'total': counters[event], 'usage': usage})
+            self._events[browser] = counters
+        self.matcher.retain(snapshot.processes)
+        self._owners.retain(set(snapshot.processes))
+        return events
+
+    def status(self) -> Dict[str, Dict]:
+        """Por navegador: contenedor, procesos, memoria usada, límites y eventos."""
+        return {
+            browser: {'container': container.name, 'processes': len(container.members()),
+                      'usage': container.usage(), 'limits': self.limits[browser],
+                      'events': self._events.get(browser, {})}
+            for browser, container in self.containers.items()
+        }
+
+    def release(self) -> None:
+        """Quita los límites de todos los contenedores."""
+        for browser, container in self.containers.items():
+            try:
+                container.release()
+            except OSError as e:
+                logging.error(f"No se pudo liberar el contenedor de {browser}: {e}")
+        self.containers.clear()
+
+    def run(self, duration: Optional[float] = None) -> None:
+        """Revisa periódicamente hasta ``stop`` o hasta que pase ``duration``."""
+        deadline = time.monotonic() + duration if duration else None
+        if not self.containers:
+            self.setup()
+        try:
+            while not self._stop.is_set():
+                try:
+                    for event in self.check():
+                        if self.on_event:
+                            self.on_event(event)
+                except Exception as e:
+                    logging.error(f"Error en los límites de recursos: {e}")
+                if deadline and time.monotonic() >= deadline:
+                    break
+                self._stop.wait(self.interval)
+        finally:
+            self.release()
+
+    def start(self) -> None:
+        """Inicia el control en un hilo en segundo plano."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='speedchrome-limits', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
@@ -0,0 +1,268 @@
+import os
+import re
+import sys
+import ntpath
+import logging
+import psutil
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from registry_utils import RegistryBackend, RegistryManager, HKU
+from instrumentation import traced, count
+
+# En un servidor de terminales (RDS) hay decenas de usuarios con sesión a la
+# vez. Cada uno tiene su colmena cargada en HKEY_USERS\<SID>, donde se
+# pueden escribir valores y políticas de usuario sin tocar HKLM. En Linux la
+# "colmena" de un usuario es su UID: el backend de políticas traduce
+# HKU\<UID> a los archivos de flags de su carpeta personal.
+#
+# Los procesos se agrupan por el usuario (y la sesión) de cada proceso raíz
+# del navegador; sus hijos pertenecen al mismo árbol. Así se consulta el
+# dueño de una sola vez por navegador abierto, no por proceso.
+
+# Colmenas de cuentas reales: no las de servicio (S-1-5-18/19/20) ni las _Classes
+USER_SID = re.compile(r'^S-1-5-21(-\d+)+$', re.IGNORECASE)
+PROFILE_LIST = r'SOFTWARE\Microsoft\Windows NT\CurrentVersion\ProfileList'
+
+# Dueño de los procesos cuyo usuario no se puede leer
+UNKNOWN_USER = '?'
+
+# Sesión de auditoría sin asignar en /proc/<pid>/sessionid
+_NO_SESSION = 4294967295
+
+
+def user_key(name: Optional[str]) -> str:
+    """Nombre para comparar usuarios: sin dominio y en minúsculas.
+
+    psutil da 'EQUIPO\\usuario' en Windows y 'usuario' en Linux; las
+    sesiones y los filtros de la línea de comandos, solo el nombre.
+    """
+    return (name or '').rsplit('\\', 1)[-1].lower()
+
+
+def user_key_path(user: Dict, key_path: str) -> str:
+    """Ruta de una clave dentro de la colmena del usuario (bajo HKU)."""
+    return f"{user['hive']}\\{key_path}"
+
+
+def _account_name(sid: str) -> Optional[str]:
+    """'DOMINIO\\usuario' de un SID (solo Windows; None si no se resuelve)."""
+    if sys.platform != 'win32':
+        return None
+    import ctypes
+    from ctypes import wintypes
+
+    advapi32 = ctypes.WinDLL('advapi32', use_last_error=True)
+    psid = ctypes.c_void_p()
+    if not advapi32.ConvertStringSidToSidW(wintypes.LPCWSTR(sid), ctypes.byref(psid)):
+        return None
+    try:
+        name = ctypes.create_unicode_buffer(256)
+        domain = ctypes.create_unicode_buffer(256)
+        name_size, domain_size = wintypes.DWORD(256), wintypes.DWORD(256)
+        use = wintypes.DWORD()
+        if not advapi32.LookupAccountSidW(None, psid, name, ctypes.byref(name_size), domain,
+                                          ctypes.byref(domain_size), ctypes.byref(use)):
+            return None
+        return f"{domain.value}\\{name.value}" if domain.value else name.value
+    finally:
+        ctypes.windll.kernel32.LocalFree(psid)
+
+
+def _sessions_by_user(sessions: Callable) -> Dict[str, List[Dict]]:
+    result: Dict[str, List[Dict]] = {}
+    try:
+        entries = sessions()
+    except (OSError, psutil.Error) as e:
+        logging.warning(f"No se pudieron enumerar las sesiones: {e}")
+        entries = []
+    for entry in entries:
+        result.setdefault(user_key(entry.name), []).append(
+            {'terminal': entry.terminal, 'host': entry.host, 'started': entry.started})
+    return result
+
+
+def registry_users(backend: RegistryBackend, sessions: Callable = psutil.users) -> List[Dict]:
+    """Usuarios con la colmena cargada en HKU y sus sesiones (Windows)."""
+    by_user = _sessions_by_user(sessions)
+    users = []
+    for sid in backend.subkeys('', hive=HKU):
+        if not USER_SID.match(sid):
+            continue
+        profile = (backend.read_values(f"{PROFILE_LIST}\\{sid}", ['ProfileImagePath']) or {}).get(
+            'ProfileImagePath', (None,))[0]
+        name = _account_name(sid) or (ntpath.basename(profile) if profile else sid)
+        users.append({'user': name, 'hive': sid, 'home': profile, 'hive_loaded': True,
+                      'sessions': by_user.pop(user_key(name), [])})
+    # Sesiones sin colmena a la vista (p. ej. sin permisos para leer HKU)
+    for key, entries in by_user.items():
+        users.append({'user': key, 'hive': None, 'home': None, 'hive_loaded': False,
+                      'sessions': entries})
+    return users
+
+
+def posix_users(sessions: Callable = psutil.users) -> List[Dict]:
+    """Usuarios con sesión (utmp); su colmena es su UID (Linux)."""
+    import pwd
+
+    users = []
+    for key, entries in _sessions_by_user(sessions).items():
+        try:
+            account = pwd.getpwnam(key)
+        except KeyError:
+            logging.debug(f"Usuario con sesión sin cuenta local: {key}")
+            continue
+        users.append({'user': account.pw_name, 'hive': str(account.pw_uid), 'home': account.pw_dir,
+                      'hive_loaded': os.path.isdir(account.pw_dir), 'sessions': entries})
+    return users
+
+
+@traced('sessions.users', 'sessions')
+def logged_on_users(sessions: Callable = psutil.users) -> List[Dict]:
+    """Usuarios con sesión abierta en el equipo.
+
+    Por usuario: ``user``, ``hive`` (SID en Windows, UID en Linux; None si
+    no se puede escribir en su colmena), ``home``, ``hive_loaded`` y
+    ``sessions`` (terminal, host y hora de inicio de cada una).
+    """
+    if sys.platform == 'win32':
+        users = registry_users(RegistryManager.get_backend(), sessions)
+    else:
+        users = posix_users(sessions)
+    count('sessions.users', len(users))
+    return users
+
+
+def select_users(users: List[Dict], names: Optional[Iterable[str]]) -> List[Dict]:
+    """Usuarios con colmena cargada, opcionalmente solo los nombrados.
+
+    Lanza ValueError si se nombra un usuario que no tiene sesión.
+    """
+    loaded = [user for user in users if user['hive_loaded'] and user['hive']]
+    if names is None:
+        return loaded
+    wanted = {user_key(name) for name in names}
+    found = {user_key(user['user']) for user in loaded}
+    missing = sorted(wanted - found)
+    if missing:
+        raise ValueError(f"Usuarios sin sesión o sin colmena cargada: {', '.join(missing)}")
+    return [user for user in loaded if user_key(user['user']) in wanted]
+
+
+def session_id(pid: int) -> Optional[int]:
+    """Sesión de un proceso (Terminal Services en Windows, auditoría en Linux)."""
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        session = wintypes.DWORD()
+        if ctypes.windll.kernel32.ProcessIdToSessionId(wintypes.DWORD(pid), ctypes.byref(session)):
+            return session.value
+        return None
+    try:
+        with open(f'/proc/{pid}/sessionid', 'r') as f:
+            value = int(f.read())
+    except (OSError, ValueError):
+        return None
+    return None if value == _NO_SESSION else value
+
+
+class OwnerResolver:
+    """Usuario y sesión de los procesos raíz, recordados por PID y hora de creación.
+
+    ``username`` abre el token del proceso: se consulta una vez por raíz y
+    no por cada proceso del árbol, que hereda el dueño de su raíz.
+    """
+
+    def __init__(self):
+        self._owners: Dict[Tuple[int, float], Tuple[Optional[str], Optional[int]]] = {}
+
+    def owner(self, proc: psutil.Process) -> Tuple[Optional[str], Optional[int]]:
+        """(usuario, sesión); usuario None si no se puede leer (otra sesión sin permisos)."""
+        try:
+            key = (proc.pid, proc.create_time())
+        except psutil.Error:
+            return None, None
+        cached = self._owners.get(key)
+        if cached is None:
+            try:
+                name = proc.username()
+            except psutil.Error:
+                name = None
+            cached = self._owners[key] = (name, session_id(proc.pid))
+            count('sessions.owner_lookups')
+        return cached
+
+    def owned(self, roots: Iterable[psutil.Process],
+              users: Optional[Iterable[str]] = None) -> List[Tuple[psutil.Process, Optional[str]]]:
+        """(raíz, usuario) de cada raíz, solo de ``users`` si se indican."""
+        wanted = {user_key(name) for name in users} if users is not None else None
+        result = []
+        for root in roots:
+            name, _ = self.owner(root)
+            if wanted is None or user_key(name) in wanted:
+                result.append((root, name))
+        return result
+
+    def retain(self, pids: Set[int]) -> None:
+        """Olvida los procesos que ya no están en ``pids``."""
+        self._owners = {key: value for key, value in self._owners.items() if key[0] in pids}
+
+
+def current_user() -> Optional[str]:
+    try:
+        return psutil.Process().username()
+    except psutil.Error:
+        return None
+
+
+def interactive_user() -> Optional[str]:
+    """Usuario de la sesión que ejecuta SpeedChrome (quien llamó a sudo, si corresponde)."""
+    return os.environ.get('SUDO_USER') or current_user()
+
+
+def user_summary(sample: Dict) -> List[Dict]:
+    """Memoria y CPU de navegadores por usuario en todo el equipo.
+
+    Combina los procesos de cada navegador de una muestra de
+    ``ProcessAttributor.sample``; ordenado de mayor a menor memoria. Con
+    ``records`` en la muestra cada PID se suma una sola vez aunque aparezca
+    en más de un navegador; sin ellos se usan los ``by_user``.
+    """
+    measure = 'uss' if sample['uss'] else 'rss'
+    totals: Dict[str, Dict] = {}
+
+    def total_for(name: str) -> Dict:
+        return totals.setdefault(name, {
+            'user': name, 'processes': 0, 'rss': 0, 'uss': 0 if sample['uss'] else None,
+            'cpu_percent': 0.0, 'sessions': set(), 'browsers': {}})
+
+    seen = set()
+    for browser, info in sample['browsers'].items():
+        records = info.get('records')
+        if records is None:
+            for name, bucket in info.get('by_user', {}).items():
+                total = total_for(name)
+                total['processes'] += bucket['processes']
+                total['rss'] += bucket['rss']
+                total['cpu_percent'] += bucket['cpu_percent']
+                if sample['uss']:
+                    total['uss'] += bucket['uss'] or 0
+                total['sessions'].update(bucket['sessions'])
+                total['browsers'][browser] = bucket[measure]
+            continue
+        for record in records:
+            if record['pid'] in seen:
+                continue
+            seen.add(record['pid'])
+            total = total_for(record['user'] or UNKNOWN_USER)
+            total['processes'] += 1
+            total['rss'] += record['rss']
+            total['cpu_percent'] += record['cpu_percent']
+            if sample['uss']:
+                total['uss'] += record['uss'] or 0
+            if record['session'] is not None:
+                total['sessions'].add(record['session'])
+            total['browsers'][browser] = total['browsers'].get(browser, 0) + (record[measure] or 0)
+    summary = sorted(totals.values(), key=lambda total: total[measure] or 0, reverse=True)
+    for total in summary:
+        total['sessions'] = sorted(total['sessions'])
+    return summary
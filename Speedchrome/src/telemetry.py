@@ -0,0 +1,346 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import argparse
+import threading
+import psutil
+from array import array
+from typing import Callable, Dict, List, Optional
+from browser_manager import BrowserManager
+from process_utils import ProcessSnapshot
+from app_paths import get_data_dir
+
+# Presupuesto de CPU del muestreo: fracción de un núcleo (1%)
+DEFAULT_CPU_BUDGET = 0.01
+
+class RingBuffer:
+    """Buffer circular de tamaño fijo con una columna ``array('d')`` por campo.
+
+    No crea objetos por muestra: cada ``append`` sobrescribe una posición de
+    las columnas preasignadas.
+    """
+
+    FIELDS = ('timestamp', 'rss', 'uss', 'private', 'cpu_percent', 'processes')
+
+    def __init__(self, capacity: int = 720):
+        self.capacity = capacity
+        self._columns = {field: array('d', [0.0]) * capacity for field in self.FIELDS}
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, sample: Dict[str, float]) -> None:
+        with self._lock:
+            for field in self.FIELDS:
+                self._columns[field][self._next] = sample.get(field, 0.0)
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        """Última muestra registrada (o None si está vacío)."""
+        with self._lock:
+            if not self._count:
+                return None
+            index = (self._next - 1) % self.capacity
+            return {field: self._columns[field][index] for field in self.FIELDS}
+
+    def column(self, field: str) -> List[float]:
+        """Valores de un campo en orden cronológico."""
+        with self._lock:
+            data = self._columns[field]
+            if self._count < self.capacity:
+                return data[:self._count].tolist()
+            return (data[self._next:] + data[:self._next]).tolist()
+
+
+class HistoryStore:
+    """Historial compacto en SQLite con agregados por minuto y por hora.
+
+    Las muestras se acumulan en memoria y solo se escribe una fila por
+    navegador cuando se cierra cada intervalo. Las filas antiguas se
+    descartan según ``RETENTION``.
+    """
+
+    RESOLUTIONS = {'minute': 60, 'hour': 3600}
+    RETENTION = {'minute': 2 * 86400, 'hour': 90 * 86400}
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rollups ("
+            " resolution INTEGER NOT NULL, browser TEXT NOT NULL, bucket INTEGER NOT NULL,"
+            " samples INTEGER NOT NULL, rss_avg REAL, rss_max REAL, uss_avg REAL,"
+            " private_avg REAL, cpu_avg REAL, processes_max INTEGER,"
+            " PRIMARY KEY (resolution, browser, bucket)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        # (resolución, navegador) -> [bucket, n, rss, rss_max, uss, private, cpu, procesos_max]
+        self._open: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def add(self, browser: str, sample: Dict[str, float]) -> None:
+        """Acumula una muestra; escribe los intervalos que se hayan cerrado."""
+        closed = []
+        with self._lock:
+            for resolution, seconds in self.RESOLUTIONS.items():
+                bucket = int(sample['timestamp']) // seconds * seconds
+                key = (seconds, browser)
+                acc = self._open.get(key)
+                if acc is not None and acc[0] != bucket:
+                    closed.append((key, acc))
+                    acc = None
+                if acc is None:
+                    acc = self._open[key] = [bucket, 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0]
+                acc[1] += 1
+                acc[2] += sample['rss']
+                acc[3] = max(acc[3], sample['rss'])
+                acc[4] += sample['uss']
+                acc[5] += sample['private']
+                acc[6] += sample['cpu_percent']
+                acc[7] = max(acc[7], int(sample['processes']))
+            if closed:
+                self._write(closed)
+
+    def flush(self) -> None:
+        """Escribe los intervalos abiertos (se combinan si se reanudan luego)."""
+        with self._lock:
+            self._write(list(self._open.items()))
+            self._open.clear()
+            self._prune()
+
+    def _write(self, rows) -> None:
+        self._conn.executemany(
+            "INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (resolution, browser, bucket) DO UPDATE SET "
+            " rss_avg = (rss_avg * samples + excluded.rss_avg * excluded.samples) / (samples + excluded.samples),"
+            " uss_avg = (uss_avg * samples + excluded.uss_avg * excluded.samples) / (samples + excluded.samples),"
+            " private_avg = (private_avg * samples + excluded.private_avg * excluded.samples) / (samples + excluded.samples),"
+            " cpu_avg = (cpu_avg * samples + excluded.cpu_avg * excluded.samples) / (samples + excluded.samples),"
+            " rss_max = max(rss_max, excluded.rss_max),"
+            " processes_max = max(processes_max, excluded.processes_max),"
+            " samples = samples + excluded.samples",
+            [
+                (seconds, browser, acc[0], acc[1], acc[2] / acc[1], acc[3], acc[4] / acc[1],
+                 acc[5] / acc[1], acc[6] / acc[1], acc[7])
+                for (seconds, browser), acc in rows if acc[1]
+            ]
+        )
+        self._conn.commit()
+
+    def _prune(self) -> None:
+        now = int(time.time())
+        for resolution, seconds in self.RESOLUTIONS.items():
+            self._conn.execute(
+                "DELETE FROM rollups WHERE resolution = ? AND bucket < ?",
+                (seconds, now - self.RETENTION[resolution])
+            )
+        self._conn.commit()
+
+    def query(self, browser: str, resolution: str = 'minute',
+              since: Optional[float] = None) -> List[Dict]:
+        """Agregados de un navegador desde ``since`` (timestamp)."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT bucket, samples, rss_avg, rss_max, uss_avg, private_avg, cpu_avg, processes_max "
+                "FROM rollups WHERE resolution = ? AND browser = ? AND bucket >= ? ORDER BY bucket",
+                (self.RESOLUTIONS[resolution], browser, int(since or 0))
+            )
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+
+def private_bytes(mem) -> float:
+    """Bytes privados: ``private`` en Windows, ``rss - shared`` en Linux."""
+    private = getattr(mem, 'private', None)
+    if private is not None:
+        return float(private)
+    return float(max(mem.rss - getattr(mem, 'shared', 0), 0))
+
+
+class MemorySampler:
+    """Muestrea memoria y CPU de cada navegador recorriendo su árbol de procesos.
+
+    Cada muestra usa una única foto de la tabla de procesos; cada árbol
+    cuenta para un solo navegador (``BrowserManager.get_matcher``). El USS
+    (``memory_full_info``) es caro, así que solo se mide cada ``uss_every``
+    muestras. Si el costo de CPU del muestreo supera ``cpu_budget`` (fracción
+    de un núcleo) primero se espacian las lecturas de USS y luego se alarga
+    el intervalo; cuando el costo baja se vuelve a lo configurado.
+    """
+
+    MAX_USS_EVERY = 60
+
+    def __init__(self, browsers: Optional[List[str]] = None, interval: float = 5.0,
+                 capacity: int = 720, cpu_budget: float = DEFAULT_CPU_BUDGET,
+                 store: Optional[HistoryStore] = None, uss_every: int = 6,
+                 process_iter: Callable = psutil.process_iter):
+        names = browsers or list(BrowserManager.BROWSER_PATHS)
+        self.browsers = [browser for browser in names if browser in BrowserManager.BROWSER_PATHS]
+        self.matcher = BrowserManager.get_matcher()
+        self.interval = interval
+        self.effective_interval = interval
+        self.cpu_budget = cpu_budget
+        self.store = store
+        self.uss_every = self.base_uss_every = max(1, uss_every)
+        self.buffers = {browser: RingBuffer(capacity) for browser in self.browsers}
+        self.last_cost = 0.0
+        self._process_iter = process_iter
+        self._cpu_prev: Dict[int, float] = {}
+        self._last_uss: Dict[str, float] = {}
+        self._last_wall: Optional[float] = None
+        self._tick = 0
+        self._callbacks: List[Callable[[Dict[str, Dict[str, float]]], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, callback: Callable[[Dict[str, Dict[str, float]]], None]) -> None:
+        """Registra una función que recibe cada muestra (desde el hilo del muestreo)."""
+        self._callbacks.append(callback)
+
+    def sample_once(self) -> Dict[str, Dict[str, float]]:
+        """Toma una muestra de todos los navegadores."""
+        cpu_start = time.thread_time()
+        now = time.time()
+        snapshot = ProcessSnapshot.capture(process_iter=self._process_iter)
+        full = self._tick % self.uss_every == 0
+        elapsed = now - self._last_wall if self._last_wall else None
+        cpu_now: Dict[int, float] = {}
+        samples = {}
+
+        for browser in self.browsers:
+            pids = set()
+            for root in self.matcher.roots(snapshot, browser):
+                pids.add(root.pid)
+                pids.update(snapshot.descendants(root.pid))
+
+            rss = uss = private = cpu_delta = 0.0
+            for pid in pids:
+                proc = snapshot.processes[pid]
+                try:
+                    with proc.oneshot():
+                        mem = proc.memory_full_info() if full else proc.memory_info()
+                        times = proc.cpu_times()
+                except psutil.Error:
+                    continue
+                rss += mem.rss
+                uss += getattr(mem, 'uss', 0)
+                private += private_bytes(mem)
+                total = times.user + times.system
+                cpu_now[pid] = total
+                previous = self._cpu_prev.get(pid)
+                if previous is not None and total >= previous:
+                    cpu_delta += total - previous
+                elif previous is None and elapsed:
+                    cpu_delta += total
+
+            if full:
+                self._last_uss[browser] = uss
+            sample = {
+                'timestamp': now,
+                'rss': rss,
+                'uss': self._last_uss.get(browser, 0.0),
+                'private': private,
+                'cpu_percent': cpu_delta / elapsed * 100 if elapsed else 0.0,
+                'processes': float(len(pids)),
+            }
+            self.buffers[browser].append(sample)
+            if self.store is not None:
+                self.store.add(browser, sample)
+            samples[browser] = sample
+
+        self._cpu_prev = cpu_now
+        self.matcher.retain(snapshot.processes)
+        self._last_wall = now
+        self._tick += 1
+        self.last_cost = time.thread_time() - cpu_start
+        self._adjust_budget()
+
+        for callback in self._callbacks:
+            try:
+                callback(samples)
+            except Exception as e:
+                logging.error(f"Error en suscriptor de telemetría: {e}")
+        return samples
+
+    def _adjust_budget(self) -> None:
+        ratio = self.last_cost / self.effective_interval
+        if ratio > self.cpu_budget:
+            if self.uss_every < self.MAX_USS_EVERY:
+                self.uss_every = min(self.uss_every * 2, self.MAX_USS_EVERY)
+            else:
+                self.effective_interval = max(self.interval, self.last_cost / self.cpu_budget)
+            logging.debug(
+                f"Telemetría sobre presupuesto ({ratio:.2%}): USS cada {self.uss_every} "
+                f"muestras, intervalo {self.effective_interval:.1f}s"
+            )
+        elif ratio < self.cpu_budget / 4:
+            self.effective_interval = max(self.interval, self.effective_interval / 2)
+            if self.effective_interval == self.interval:
+                self.uss_every = max(self.base_uss_every, self.uss_every // 2)
+
+    def run(self, duration: Optional[float] = None) -> None:
+        """Muestrea hasta ``stop`` o hasta que pase ``duration`` segundos."""
+        deadline = time.monotonic() + duration if duration else None
+        while not self._stop.is_set():
+            try:
+                self.sample_once()
+            except Exception as e:
+                logging.error(f"Error al muestrear procesos: {e}")
+            if deadline and time.monotonic() >= deadline:
+                break
+            self._stop.wait(self.effective_interval)
+        if self.store is not None:
+            self.store.flush()
+
+    def start(self) -> None:
+        """Inicia el muestreo en un hilo en segundo plano."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='speedchrome-telemetry', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def latest(self) -> Dict[str, Optional[Dict[str, float]]]:
+        """Última muestra de cada navegador."""
+        return {browser: buffer.latest() for browser, buffer in self.buffers.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telemetría de memoria de navegadores")
+    parser.add_argument('--interval', type=float, default=5.0, help="Segundos entre muestras")
+    parser.add_argument('--duration', type=float, default=None, help="Segundos a muestrear")
+    parser.add_argument('--cpu-budget', type=float, default=DEFAULT_CPU_BUDGET,
+                        help="Fracción máxima de un núcleo para el muestreo")
+    parser.add_argument('--history', default=os.path.join(get_data_dir(), 'history.db'),
+                        help="Archivo SQLite del historial")
+    parser.add_argument('--no-history', action='store_true', help="No guardar historial en disco")
+    args = parser.parse_args()
+
+    store = None if args.no_history else HistoryStore(args.history)
+    sampler = MemorySampler(interval=args.interval, cpu_budget=args.cpu_budget, store=store)
+    sampler.subscribe(lambda samples: print(json.dumps(samples), flush=True))
+    try:
+        sampler.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store is not None:
+            store.close()
+
+if __name__ == "__main__":
+    main()
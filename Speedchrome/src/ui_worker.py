@@ -0,0 +1,104 @@
+import queue
+import logging
+import tkinter as tk
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+from instrumentation import span
+
+class TaskRunner:
+    """Ejecuta tareas fuera del hilo de Tk y entrega sus eventos en él.
+
+    Cada tarea recibe una función ``progress(kind, payload)`` que encola
+    eventos; la cola se vacía con ``root.after`` cada ``poll_ms`` y cada
+    evento se entrega a ``on_event(task, kind, payload)`` ya en el hilo de Tk.
+    Al terminar se entrega ``('done', resultado)`` o ``('error', excepción)``.
+    Las tareas se ejecutan de a una, en orden.
+    """
+
+    def __init__(self, root: tk.Misc, on_event: Callable[[str, str, Any], None],
+                 poll_ms: int = 50):
+        self.root = root
+        self.on_event = on_event
+        self.poll_ms = poll_ms
+        self.events: queue.Queue = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='speedchrome-worker')
+        self.busy = 0
+        self._closed = False
+        self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, task: str, func: Callable, *args, **kwargs):
+        """Encola ``func(*args, progress=..., **kwargs)`` en el hilo de trabajo."""
+        def progress(kind: str, payload: Any = None):
+            self.events.put((task, kind, payload))
+
+        def run():
+            try:
+                with span(f'task.{task}', 'ui'):
+                    result = func(*args, progress=progress, **kwargs)
+            except Exception as e:
+                logging.exception(f"Error en la tarea {task}")
+                progress('error', e)
+            else:
+                progress('done', result)
+
+        self.busy += 1
+        return self.executor.submit(run)
+
+    def _poll(self):
+        try:
+            while True:
+                task, kind, payload = self.events.get_nowait()
+                if kind in ('done', 'error'):
+                    self.busy -= 1
+                try:
+                    with span('ui.event', 'ui', task=task, kind=kind):
+                        self.on_event(task, kind, payload)
+                except Exception as e:
+                    logging.error(f"Error al procesar evento {kind} de {task}: {e}")
+        except queue.Empty:
+            pass
+        if not self._closed:
+            self.root.after(self.poll_ms, self._poll)
+
+    def shutdown(self, wait: bool = True):
+        self._closed = True
+        self.executor.shutdown(wait=wait)
+
+
+class LogView:
+    """Vista de log acotada sobre un ``tk.Text``.
+
+    ``append`` puede llamarse desde cualquier hilo: solo agrega a una cola.
+    Las líneas se vuelcan al widget en bloque ``fps`` veces por segundo, con
+    un único ``see(END)``, y se conservan solo las últimas ``max_lines``.
+    """
+
+    def __init__(self, root: tk.Misc, text: tk.Text, max_lines: int = 500, fps: int = 10):
+        self.root = root
+        self.text = text
+        self.max_lines = max_lines
+        self.interval_ms = max(1000 // fps, 1)
+        self._pending: deque = deque()
+        self._lines = 0
+        self.root.after(self.interval_ms, self._flush)
+
+    def append(self, line: str) -> None:
+        self._pending.append(line)
+
+    def _flush(self) -> None:
+        if self._pending:
+            lines = []
+            while self._pending:
+                lines.append(self._pending.popleft())
+            # Si llegaron más líneas de las que se muestran, solo interesan las últimas
+            lines = lines[-self.max_lines:]
+            self.text.insert(tk.END, "\n".join(lines) + "\n")
+            self._lines += len(lines)
+            excess = self._lines - self.max_lines
+            if excess > 0:
+                self.text.delete('1.0', f'{excess + 1}.0')
+                self._lines = self.max_lines
+            self.text.see(tk.END)
+        self.root.after(self.interval_ms, self._flush)
+